@@ -153,7 +153,7 @@ resource "aws_launch_template" "fw_asg_launch_tmpl" {
 
 # Create ASG
 resource "aws_autoscaling_group" "fw_asg" {
-  name                      = "${var.name_prefix}-asg-${random_id.deployment_id.hex}"
+  name                      = local.asg_name
   max_size                  = 3
   min_size                  = 1
   health_check_grace_period = 1200
@@ -53,6 +53,7 @@ resource "aws_iam_role_policy" "lambda_iam_policy_default" {
       "Sid": "EC2CreateAndAddressOps",
       "Action": [
         "ec2:DescribeAddresses",
+        "ec2:DescribeTags",
         "ec2:AllocateAddress",
         "ec2:AssociateAddress",
         "ec2:CreateNetworkInterface",
@@ -69,6 +70,8 @@ resource "aws_iam_role_policy" "lambda_iam_policy_default" {
         "ec2:DetachNetworkInterface",
         "ec2:DeleteNetworkInterface",
         "ec2:ModifyNetworkInterfaceAttribute",
+        "ec2:CreateTags",
+        "ec2:DeleteTags",
         "ec2:DescribeInstances",
         "ec2:DescribeNetworkInterfaces",
         "ec2:DescribeSubnets"
@@ -84,13 +87,29 @@ resource "aws_iam_role_policy" "lambda_iam_policy_default" {
       "Sid": "AutoScalingAccess",
       "Action": [
         "autoscaling:CompleteLifecycleAction",
-        "autoscaling:DescribeAutoScalingGroups"
+        "autoscaling:RecordLifecycleActionHeartbeat"
       ],
       "Effect": "Allow",
       "Resource": [
         "${aws_autoscaling_group.fw_asg.arn}"
       ]
     },
+    {
+      "Sid": "AutoScalingDescribe",
+      "Action": [
+        "autoscaling:DescribeAutoScalingGroups"
+      ],
+      "Effect": "Allow",
+      "Resource": "*"
+    },
+    {
+      "Sid": "ResumeLifecycleFlow",
+      "Action": [
+        "lambda:InvokeFunction"
+      ],
+      "Effect": "Allow",
+      "Resource": "arn:aws:lambda:${var.region}:${data.aws_caller_identity.pa_caller.account_id}:function:${var.name_prefix}-asg-actions-${random_id.deployment_id.hex}"
+    },
     {
       "Sid": "KMSAccess",
       "Effect": "Allow",
@@ -106,6 +125,57 @@ resource "aws_iam_role_policy" "lambda_iam_policy_default" {
 EOF
 }
 
+resource "aws_iam_role_policy" "lambda_iam_policy_asg_profiles" {
+  count  = length(var.asg_profiles) > 0 ? 1 : 0
+  name   = "${var.name_prefix}-lambda-policy-asg-profiles-${random_id.deployment_id.hex}"
+  role   = aws_iam_role.pa_lambda_iam_role.id
+  policy = <<-EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Sid": "EC2ModifyAndDescribeProfiles",
+      "Action": [
+        "ec2:AttachNetworkInterface",
+        "ec2:DetachNetworkInterface",
+        "ec2:DeleteNetworkInterface",
+        "ec2:ModifyNetworkInterfaceAttribute",
+        "ec2:CreateTags",
+        "ec2:DeleteTags",
+        "ec2:DescribeInstances",
+        "ec2:DescribeNetworkInterfaces",
+        "ec2:DescribeSubnets"
+      ],
+      "Effect": "Allow",
+      "Resource": [
+        "arn:aws:ec2:*:${data.aws_caller_identity.pa_caller.account_id}:instance/*",
+        "arn:aws:ec2:*:${data.aws_caller_identity.pa_caller.account_id}:network-interface/*",
+        "arn:aws:ec2:*:${data.aws_caller_identity.pa_caller.account_id}:subnet/*"
+      ]
+    },
+    {
+      "Sid": "AutoScalingAccessProfiles",
+      "Action": [
+        "autoscaling:CompleteLifecycleAction",
+        "autoscaling:RecordLifecycleActionHeartbeat"
+      ],
+      "Effect": "Allow",
+      "Resource": ${jsonencode([for name in local.profile_asg_names : "arn:aws:autoscaling:*:${data.aws_caller_identity.pa_caller.account_id}:autoScalingGroup:*:autoScalingGroupName/${name}"])}
+    },
+    {
+      "Sid": "SecretsManagerReadProfiles",
+      "Effect": "Allow",
+      "Action": [
+        "secretsmanager:GetSecretValue",
+        "secretsmanager:DescribeSecret"
+      ],
+      "Resource": ${jsonencode(distinct(concat([aws_secretsmanager_secret.panorama_config_secret.arn], [for profile in values(var.asg_profiles) : profile.panorama_config if can(profile.panorama_config)])))}
+    }
+  ]
+}
+EOF
+}
+
 resource "aws_iam_role_policy" "lambda_iam_policy_delicense" {
   count  = var.delicense_enabled ? 1 : 0
   name   = "${var.name_prefix}-lambda-policy-delicense-${random_id.deployment_id.hex}"
@@ -143,26 +213,63 @@ resource "null_resource" "python_requirements" {
   }
 }
 
+# Optimized package (optional): only runtime dependencies not provided by Lambda and precompiled bytecode
+resource "null_resource" "python_optimized_package" {
+  count = var.lambda_optimized_package ? 1 : 0
+
+  triggers = {
+    lambda_source = sha256(join("", [for module in sort(fileset("${path.module}/scripts", "*.py")) : filesha256("${path.module}/scripts/${module}")]))
+    requirements  = filesha256("${path.module}/scripts/requirements.txt")
+    build_script  = filesha256("${path.module}/tools/build_lambda_package.py")
+    runtime       = local.lambda_runtime
+  }
+
+  # Dependencies and bytecode are built for Lambda runtime version and x86_64 platform, not for local python3
+  provisioner "local-exec" {
+    command = join(" ", [
+      "python3 ${path.module}/tools/build_lambda_package.py",
+      "--source ${path.module}/scripts --output ${path.module}/build/lambda",
+      "--python-version ${local.lambda_python_version} --platform manylinux2014_x86_64",
+      "--python python${local.lambda_python_version}",
+    ])
+  }
+}
+
 data "archive_file" "lambda_archive" {
   type = "zip"
 
-  source_dir  = "${path.module}/scripts"
+  source_dir  = var.lambda_optimized_package ? "${path.module}/build/lambda" : "${path.module}/scripts"
   output_path = "${path.module}/lambda_payload.zip"
 
   depends_on = [
-    null_resource.python_requirements
+    null_resource.python_requirements,
+    null_resource.python_optimized_package
   ]
 }
 
+locals {
+  # Lambda runtime, the optimized package is built for its Python version
+  lambda_runtime        = "python3.12"
+  lambda_python_version = trimprefix(local.lambda_runtime, "python")
+  # Reserved concurrency, API rate limits of the function are split between this many containers
+  lambda_concurrency = 100
+  # Subnet of the management interface (device index 1) in each availability zone
+  mgmt_interface_subnets = { for subnet in data.aws_subnet.mgmt_subnet_data : subnet.availability_zone => subnet.id }
+  # Name of Auto Scaling group, known before the group exists (the group depends on Lambda event targets)
+  asg_name = "${var.name_prefix}-asg-${random_id.deployment_id.hex}"
+  # Names of additional Auto Scaling groups served by the Lambda (profile keys are "name" or "region/name")
+  profile_asg_names = distinct([for key in keys(var.asg_profiles) : reverse(split("/", key))[0]])
+}
+
 resource "aws_lambda_function" "pa_lambda" {
   filename                       = data.archive_file.lambda_archive.output_path
   function_name                  = "${var.name_prefix}-asg-actions-${random_id.deployment_id.hex}"
   role                           = aws_iam_role.pa_lambda_iam_role.arn
   handler                        = "lambda.lambda_handler"
   source_code_hash               = data.archive_file.lambda_archive.output_base64sha256
-  runtime                        = "python3.8"
+  runtime                        = local.lambda_runtime
   timeout                        = "30"
-  reserved_concurrent_executions = "100"
+  reserved_concurrent_executions = local.lambda_concurrency
 
   tracing_config {
     mode = "Active"
@@ -175,10 +282,27 @@ resource "aws_lambda_function" "pa_lambda" {
 
   environment {
     variables = {
-      interfaces_config = jsonencode({ for subnet in data.aws_subnet.mgmt_subnet_data : subnet.availability_zone => subnet.id })
-      sgr_id            = aws_security_group.fw_mgmt_sg.id
-      panorama_config   = aws_secretsmanager_secret.panorama_config_secret.arn
-      fw_delicense      = var.delicense_enabled
+      interfaces_config = length(var.additional_interfaces) == 0 ? jsonencode(local.mgmt_interface_subnets) : jsonencode(concat(
+        [{ index = 1, subnets = local.mgmt_interface_subnets, sg = aws_security_group.fw_mgmt_sg.id }],
+        var.additional_interfaces
+      ))
+      sgr_id             = aws_security_group.fw_mgmt_sg.id
+      panorama_config    = aws_secretsmanager_secret.panorama_config_secret.arn
+      fw_delicense       = var.delicense_enabled
+      batch_max_workers  = var.lifecycle_events_batch_workers
+      eni_warm_pool_size = var.eni_warm_pool_size
+      api_rate_limits    = jsonencode(var.api_rate_limits)
+      lambda_concurrency = local.lambda_concurrency
+      api_call_budgets   = jsonencode(var.api_call_budgets)
+      asg_profiles       = jsonencode(var.asg_profiles)
+      metrics_namespace  = var.metrics_namespace
+      asg_name           = local.asg_name
+      mgmt_subnet_cidrs  = jsonencode([for subnet in data.aws_subnet.mgmt_subnet_data : subnet.cidr_block])
+      idempotency_table  = var.lifecycle_idempotency_table ? aws_dynamodb_table.lifecycle_idempotency[0].name : ""
+      # De-licensing deferred while Panorama is unreachable
+      delicense_retry_queue_url = var.delicense_retry_queue ? aws_sqs_queue.delicense_retry[0].url : ""
+      # Each batch worker can run several EC2 calls at once (concurrent ENI creation)
+      boto_max_pool_connections = var.lifecycle_events_batch_workers * 4
     }
   }
 
@@ -203,9 +327,7 @@ resource "aws_cloudwatch_event_rule" "instance_launch_event_rule" {
     "EC2 Instance-launch Lifecycle Action"
   ],
   "detail": {
-    "AutoScalingGroupName": [
-      "${var.name_prefix}-asg-${random_id.deployment_id.hex}"
-    ]
+    "AutoScalingGroupName": ${jsonencode(concat([local.asg_name], local.profile_asg_names))}
   }
 }
 EOF
@@ -222,9 +344,7 @@ resource "aws_cloudwatch_event_rule" "instance_terminate_event_rule" {
     "EC2 Instance-terminate Lifecycle Action"
   ],
   "detail": {
-    "AutoScalingGroupName": [
-      "${var.name_prefix}-asg-${random_id.deployment_id.hex}"
-    ]
+    "AutoScalingGroupName": ${jsonencode(concat([local.asg_name], local.profile_asg_names))}
   }
 }
 EOF
@@ -233,11 +353,217 @@ EOF
 resource "aws_cloudwatch_event_target" "instance_launch_event" {
   rule      = aws_cloudwatch_event_rule.instance_launch_event_rule.name
   target_id = "${var.name_prefix}-asg-launch-${random_id.deployment_id.hex}"
-  arn       = aws_lambda_function.pa_lambda.arn
+  arn       = var.lifecycle_events_batching ? aws_sqs_queue.lifecycle_events[0].arn : aws_lambda_function.pa_lambda.arn
 }
 
 resource "aws_cloudwatch_event_target" "instance_terminate_event" {
   rule      = aws_cloudwatch_event_rule.instance_terminate_event_rule.name
   target_id = "${var.name_prefix}-asg-terminate-${random_id.deployment_id.hex}"
+  arn       = var.lifecycle_events_batching ? aws_sqs_queue.lifecycle_events[0].arn : aws_lambda_function.pa_lambda.arn
+}
+
+# Optional buffering of lifecycle events in SQS, so Lambda can handle them in batches
+# (e.g. de-license many firewalls with a single Panorama commit)
+resource "aws_sqs_queue" "lifecycle_events" {
+  count                      = var.lifecycle_events_batching ? 1 : 0
+  name                       = "${var.name_prefix}-asg-lifecycle-events-${random_id.deployment_id.hex}"
+  visibility_timeout_seconds = 180
+  message_retention_seconds  = 86400
+  # Events whose lifecycle action could not be completed are retried a few times, then kept for inspection
+  redrive_policy             = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.lifecycle_events_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sqs_queue" "lifecycle_events_dlq" {
+  count                     = var.lifecycle_events_batching ? 1 : 0
+  name                      = "${var.name_prefix}-asg-lifecycle-events-dlq-${random_id.deployment_id.hex}"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue_policy" "lifecycle_events" {
+  count     = var.lifecycle_events_batching ? 1 : 0
+  queue_url = aws_sqs_queue.lifecycle_events[0].id
+  policy    = <<-EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Effect": "Allow",
+      "Principal": {
+        "Service": "events.amazonaws.com"
+      },
+      "Action": "sqs:SendMessage",
+      "Resource": "${aws_sqs_queue.lifecycle_events[0].arn}",
+      "Condition": {
+        "ArnEquals": {
+          "aws:SourceArn": [
+            "${aws_cloudwatch_event_rule.instance_launch_event_rule.arn}",
+            "${aws_cloudwatch_event_rule.instance_terminate_event_rule.arn}"
+          ]
+        }
+      }
+    }
+  ]
+}
+EOF
+}
+
+resource "aws_iam_role_policy" "lambda_iam_policy_sqs" {
+  count  = var.lifecycle_events_batching ? 1 : 0
+  name   = "${var.name_prefix}-lambda-policy-sqs-${random_id.deployment_id.hex}"
+  role   = aws_iam_role.pa_lambda_iam_role.id
+  policy = <<-EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Sid": "SQSLifecycleEvents",
+      "Effect": "Allow",
+      "Action": [
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes"
+      ],
+      "Resource": "${aws_sqs_queue.lifecycle_events[0].arn}"
+    }
+  ]
+}
+EOF
+}
+
+resource "aws_lambda_event_source_mapping" "lifecycle_events" {
+  count                              = var.lifecycle_events_batching ? 1 : 0
+  event_source_arn                   = aws_sqs_queue.lifecycle_events[0].arn
+  function_name                      = aws_lambda_function.pa_lambda.arn
+  batch_size                         = var.lifecycle_events_batch_size
+  maximum_batching_window_in_seconds = var.lifecycle_events_batching_window
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy.lambda_iam_policy_sqs]
+}
+
+# Optional queue of de-licensing deferred while Panorama is unreachable, drained by Lambda in batches:
+# messages are delivered again every visibility timeout until Panorama is back, then moved to dead-letter queue
+resource "aws_sqs_queue" "delicense_retry_dlq" {
+  count                     = var.delicense_retry_queue ? 1 : 0
+  name                      = "${var.name_prefix}-delicense-retry-dlq-${random_id.deployment_id.hex}"
+  message_retention_seconds = 1209600
+}
+
+resource "aws_sqs_queue" "delicense_retry" {
+  count                      = var.delicense_retry_queue ? 1 : 0
+  name                       = "${var.name_prefix}-delicense-retry-${random_id.deployment_id.hex}"
+  visibility_timeout_seconds = var.delicense_retry_interval
+  message_retention_seconds  = 1209600
+  redrive_policy             = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.delicense_retry_dlq[0].arn
+    maxReceiveCount     = var.delicense_retry_max_attempts
+  })
+}
+
+resource "aws_iam_role_policy" "lambda_iam_policy_delicense_retry" {
+  count  = var.delicense_retry_queue ? 1 : 0
+  name   = "${var.name_prefix}-lambda-policy-delicense-retry-${random_id.deployment_id.hex}"
+  role   = aws_iam_role.pa_lambda_iam_role.id
+  policy = <<-EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Sid": "SQSDelicenseRetry",
+      "Effect": "Allow",
+      "Action": [
+        "sqs:SendMessage",
+        "sqs:ReceiveMessage",
+        "sqs:DeleteMessage",
+        "sqs:GetQueueAttributes"
+      ],
+      "Resource": "${aws_sqs_queue.delicense_retry[0].arn}"
+    }
+  ]
+}
+EOF
+}
+
+resource "aws_lambda_event_source_mapping" "delicense_retry" {
+  count                              = var.delicense_retry_queue ? 1 : 0
+  event_source_arn                   = aws_sqs_queue.delicense_retry[0].arn
+  function_name                      = aws_lambda_function.pa_lambda.arn
+  batch_size                         = var.lifecycle_events_batch_size
+  maximum_batching_window_in_seconds = var.lifecycle_events_batching_window
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  depends_on = [aws_iam_role_policy.lambda_iam_policy_delicense_retry]
+}
+
+# Outcomes of handled lifecycle events shared by Lambda containers, deduplicates repeated deliveries (optional)
+resource "aws_dynamodb_table" "lifecycle_idempotency" {
+  count        = var.lifecycle_idempotency_table ? 1 : 0
+  name         = "${var.name_prefix}-lifecycle-idempotency-${random_id.deployment_id.hex}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "IdempotencyKey"
+
+  attribute {
+    name = "IdempotencyKey"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "ExpiresAt"
+    enabled        = true
+  }
+}
+
+resource "aws_iam_role_policy" "lambda_iam_policy_idempotency" {
+  count  = var.lifecycle_idempotency_table ? 1 : 0
+  name   = "${var.name_prefix}-lambda-policy-idempotency-${random_id.deployment_id.hex}"
+  role   = aws_iam_role.pa_lambda_iam_role.id
+  policy = <<-EOF
+{
+  "Version": "2012-10-17",
+  "Statement": [
+    {
+      "Sid": "LifecycleIdempotency",
+      "Effect": "Allow",
+      "Action": [
+        "dynamodb:PutItem",
+        "dynamodb:DeleteItem"
+      ],
+      "Resource": "${aws_dynamodb_table.lifecycle_idempotency[0].arn}"
+    }
+  ]
+}
+EOF
+}
+
+# Periodic replenishment of warm pool of pre-created ENIs (optional)
+resource "aws_cloudwatch_event_rule" "eni_warm_pool_schedule" {
+  count               = var.eni_warm_pool_size > 0 ? 1 : 0
+  name                = "${var.name_prefix}-eni-warm-pool-${random_id.deployment_id.hex}"
+  schedule_expression = var.eni_warm_pool_schedule
+}
+
+resource "aws_cloudwatch_event_target" "eni_warm_pool" {
+  count     = var.eni_warm_pool_size > 0 ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.eni_warm_pool_schedule[0].name
+  target_id = "${var.name_prefix}-eni-warm-pool-${random_id.deployment_id.hex}"
+  arn       = aws_lambda_function.pa_lambda.arn
+  input     = jsonencode({ action = "replenish_eni_pool" })
+}
+
+# Periodic reconciliation of orphaned ENIs and stale licenses (optional)
+resource "aws_cloudwatch_event_rule" "reconcile_schedule" {
+  count               = var.reconcile_enabled ? 1 : 0
+  name                = "${var.name_prefix}-reconcile-${random_id.deployment_id.hex}"
+  schedule_expression = var.reconcile_schedule
+}
+
+resource "aws_cloudwatch_event_target" "reconcile" {
+  count     = var.reconcile_enabled ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.reconcile_schedule[0].name
+  target_id = "${var.name_prefix}-reconcile-${random_id.deployment_id.hex}"
   arn       = aws_lambda_function.pa_lambda.arn
+  input     = jsonencode({ action = "reconcile" })
 }
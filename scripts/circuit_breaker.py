@@ -0,0 +1,90 @@
+"""
+Circuit breaker failing Panorama API calls fast while Panorama is unreachable.
+"""
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of Panorama API calls shared by all threads and warm invocations of the Lambda container,
+    with one circuit per Panorama ("hostname:port"). After panorama_breaker_threshold (default 3) consecutive calls
+    fail to reach Panorama its circuit opens and calls fail fast for panorama_breaker_cooldown seconds (default 60)
+    instead of waiting for connection timeouts. Then a single trial call is let through (half-open): if it reaches
+    Panorama the circuit closes, otherwise it opens for another cooldown.
+    """
+
+    def __init__(self) -> None:
+        # endpoint -> {"failures": consecutive failures, "opened": time.monotonic() of opening, "trial": trial running}
+        self.circuits: dict[str, dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def threshold() -> int:
+        return max(1, int(os.getenv("panorama_breaker_threshold", "3")))
+
+    @staticmethod
+    def cooldown() -> float:
+        return float(os.getenv("panorama_breaker_cooldown", "60"))
+
+    def allow(self, endpoint: str) -> bool:
+        """
+        Check if call to endpoint can be made, i.e. its circuit is closed or the call is the half-open trial.
+
+        :param endpoint: Panorama "hostname:port"
+        :return: False if the call has to fail fast
+        """
+        with self.lock:
+            circuit = self.circuits.get(endpoint)
+            if circuit is None or circuit["opened"] is None:
+                return True
+            if circuit["trial"] or time.monotonic() - circuit["opened"] < self.cooldown():
+                return False
+            circuit["trial"] = True
+            return True
+
+    def cancel(self, endpoint: str) -> None:
+        """
+        Forget call allowed to endpoint which was not made, so half-open circuit lets the next trial call through.
+
+        :param endpoint: Panorama "hostname:port"
+        """
+        with self.lock:
+            circuit = self.circuits.get(endpoint)
+            if circuit is not None:
+                circuit["trial"] = False
+
+    def record(self, endpoint: str, reachable: bool) -> Optional[str]:
+        """
+        Record outcome of call to endpoint.
+
+        :param endpoint: Panorama "hostname:port"
+        :param reachable: True if Panorama answered (even with an error response)
+        :return: new state of the circuit ("open" or "closed") if the call changed it, None otherwise
+        """
+        with self.lock:
+            circuit = self.circuits.setdefault(endpoint, {"failures": 0, "opened": None, "trial": False})
+            was_open = circuit["opened"] is not None
+            if reachable:
+                circuit.update(failures=0, opened=None, trial=False)
+                return "closed" if was_open else None
+            circuit["failures"] += 1
+            if circuit["trial"] or circuit["failures"] >= self.threshold():
+                circuit.update(opened=time.monotonic(), trial=False)
+                return None if was_open else "open"
+            return None
+
+    def state(self) -> dict[str, dict[str, Any]]:
+        """
+        Return state of all circuits, e.g. for logging.
+        """
+        with self.lock:
+            return {
+                endpoint: {
+                    "state": "open" if circuit["opened"] is not None else "closed",
+                    "failures": circuit["failures"],
+                }
+                for endpoint, circuit in sorted(self.circuits.items())
+            }
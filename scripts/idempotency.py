@@ -0,0 +1,228 @@
+"""
+Deduplication of lifecycle events delivered more than once, per Lambda container and across containers
+through DynamoDB table.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from runtime import LIFECYCLE_RESERVE, ConfigureLogger, get_client, remaining_time
+
+
+def idempotency_key(asg_event: dict[str, Any]) -> Optional[str]:
+    """
+    Return key identifying delivery of lifecycle event: lifecycle action token, instance and resume count
+    (resumed invocation of the same lifecycle action is not a duplicate).
+
+    :param asg_event: dict data from Lambda handler
+    :return: idempotency key, None if event has no lifecycle action token
+    """
+    detail = asg_event.get("detail") or {}
+    if not detail.get("LifecycleActionToken"):
+        return None
+    return f"{detail['LifecycleActionToken']}:{detail.get('EC2InstanceId')}:{asg_event.get('resume_count', 0)}"
+
+
+class IdempotencyStore:
+    """
+    Outcomes of lifecycle events shared by all Lambda containers, kept in DynamoDB table (items expire
+    by ExpiresAt TTL attribute). Event is claimed by conditional write, the claim is leased until the claiming
+    invocation times out, so event of crashed invocation can be claimed again. DynamoDB Local can stand in
+    for the table using AWS_ENDPOINT_URL_DYNAMODB environment variable.
+    """
+
+    def __init__(self, table_name: str) -> None:
+        self.table_name = table_name
+
+    def claim(self, key: str, lease: float) -> tuple[str, Optional[str]]:
+        """
+        Claim lifecycle event unless it was handled or is being handled by another invocation.
+
+        :param key: idempotency key of the event
+        :param lease: seconds the claim is held
+        :return: ("CLAIMED", None), ("COMPLETED", recorded outcome) or ("IN_PROGRESS", None)
+        """
+        now = time.time()
+        try:
+            get_client("dynamodb").put_item(
+                TableName=self.table_name,
+                Item=self.item(key, "IN_PROGRESS", LeaseExpiresAt={"N": str(int(now + lease))}),
+                ConditionExpression=(
+                    "attribute_not_exists(IdempotencyKey) OR (#status = :in_progress AND LeaseExpiresAt < :now)"
+                ),
+                ExpressionAttributeNames={"#status": "Status"},
+                ExpressionAttributeValues={":in_progress": {"S": "IN_PROGRESS"}, ":now": {"N": str(int(now))}},
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            return "CLAIMED", None
+        except ClientError as e:
+            if e.response["Error"].get("Code") != "ConditionalCheckFailedException":
+                raise
+            item = e.response.get("Item") or {}
+            if item.get("Status", {}).get("S") == "COMPLETED":
+                return "COMPLETED", item["Outcome"]["S"]
+            return "IN_PROGRESS", None
+
+    def complete(self, key: str, outcome: str) -> None:
+        """
+        Record outcome of claimed lifecycle event.
+
+        :param key: idempotency key of the event
+        :param outcome: lifecycle result
+        """
+        get_client("dynamodb").put_item(
+            TableName=self.table_name, Item=self.item(key, "COMPLETED", Outcome={"S": outcome})
+        )
+
+    def release(self, key: str) -> None:
+        """
+        Drop claim of lifecycle event, so it can be handled again.
+
+        :param key: idempotency key of the event
+        """
+        get_client("dynamodb").delete_item(TableName=self.table_name, Key={"IdempotencyKey": {"S": key}})
+
+    @staticmethod
+    def item(key: str, status: str, **attributes: dict[str, str]) -> dict[str, dict[str, str]]:
+        ttl = int(os.getenv("idempotency_ttl", "86400"))
+        return {
+            "IdempotencyKey": {"S": key},
+            "Status": {"S": status},
+            "ExpiresAt": {"N": str(int(time.time()) + ttl)},
+            **attributes,
+        }
+
+
+class LifecycleIdempotency(ConfigureLogger):
+    """
+    Deduplication of lifecycle events delivered more than once (EventBridge at-least-once delivery, retried
+    asynchronous invocations, SQS redelivery). Outcomes are kept in LRU cache of the Lambda container
+    (idempotency_cache_size entries, default 1000) and, when idempotency_table is set, in IdempotencyStore shared
+    by all containers. Duplicate of handled event gets the recorded outcome, duplicate of event being handled
+    waits for its outcome. ABANDON is not recorded, so retries still attempt the event again.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lock = threading.Lock()
+        self.outcomes: OrderedDict[str, str] = OrderedDict()
+        self.in_flight: dict[str, Future] = {}
+
+    @staticmethod
+    def store() -> Optional[IdempotencyStore]:
+        table_name = os.getenv("idempotency_table")
+        return IdempotencyStore(table_name) if table_name else None
+
+    def claim(self, key: str, wait: bool = True) -> Optional[str]:
+        """
+        Claim lifecycle event for this invocation.
+
+        :param key: idempotency key of the event
+        :param wait: wait for outcome of event being handled, otherwise IN_PROGRESS is returned right away
+        :return: None if the event was claimed and finish() has to be called, else outcome of the duplicate
+            (IN_PROGRESS when the outcome did not come within the invocation's time)
+        """
+        with self.lock:
+            if key in self.outcomes:
+                self.outcomes.move_to_end(key)
+                return self.outcomes[key]
+            future = self.in_flight.get(key)
+            if future is None:
+                self.in_flight[key] = Future()
+
+        # Keep time for completing the lifecycle action if the outcome does not come
+        budget = min(remaining_time() - LIFECYCLE_RESERVE, float(os.getenv("idempotency_wait_timeout", "60")))
+        if future is not None:
+            # Same event is handled by another thread of this container
+            if not wait or (budget <= 0 and not future.done()):
+                return "IN_PROGRESS"
+            try:
+                return future.result(timeout=max(0.0, budget))
+            except FutureTimeoutError:
+                return "IN_PROGRESS"
+
+        store = self.store()
+        if store is None:
+            return None
+        deadline = time.monotonic() + budget
+        delay = 0.25
+        claimed = False
+        outcome: Optional[str] = "IN_PROGRESS"
+        try:
+            while True:
+                status, outcome = store.claim(key, lease=min(remaining_time(), 900.0))
+                if status == "CLAIMED":
+                    claimed = True
+                    return None
+                if status == "COMPLETED" or not wait or time.monotonic() + delay > deadline:
+                    # Event handled elsewhere, or still in progress and this invocation gives up on it
+                    outcome = outcome or "IN_PROGRESS"
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+        except (BotoCoreError, ClientError) as e:
+            # Deduplication is an optimization, the event is handled if the shared store is not available
+            self.logger.warning(f"Idempotency store {store.table_name} not available: {e}")
+            claimed = True
+            return None
+        finally:
+            if not claimed:
+                # Pass the outcome to duplicates waiting in this container, also when the store call failed
+                self.finish(key, outcome or "IN_PROGRESS", record=False)
+        return outcome
+
+    def finish(self, key: str, outcome: str, record: bool = True) -> None:
+        """
+        Record outcome of claimed lifecycle event and pass it to duplicates waiting for it.
+
+        :param key: idempotency key of the event
+        :param outcome: lifecycle result
+        :param record: write the outcome to shared store, False when it was not produced by this invocation
+        """
+        store = self.store()
+        if record and store is not None:
+            try:
+                if outcome == "ABANDON":
+                    store.release(key)
+                else:
+                    store.complete(key, outcome)
+            except (BotoCoreError, ClientError) as e:
+                self.logger.warning(f"Cannot record outcome of lifecycle event {key}: {e}")
+
+        with self.lock:
+            if outcome not in ("ABANDON", "IN_PROGRESS"):
+                self.outcomes[key] = outcome
+                self.outcomes.move_to_end(key)
+                while len(self.outcomes) > int(os.getenv("idempotency_cache_size", "1000")):
+                    self.outcomes.popitem(last=False)
+            future = self.in_flight.pop(key, None)
+        if future is not None:
+            future.set_result(outcome)
+
+    def run(self, key: Optional[str], handle: Callable[[], str]) -> tuple[str, bool]:
+        """
+        Handle lifecycle event once.
+
+        :param key: idempotency key of the event, None disables deduplication
+        :param handle: function handling the event and returning its outcome
+        :return: outcome and True if the event was a duplicate
+        """
+        if key is None:
+            return handle(), False
+        outcome = self.claim(key)
+        if outcome is not None:
+            return outcome, True
+        outcome = "ABANDON"
+        try:
+            outcome = handle()
+        finally:
+            self.finish(key, outcome)
+        return outcome, False
+
+
+IDEMPOTENCY = LifecycleIdempotency()
@@ -1,25 +1,462 @@
+import contextvars
+import hashlib
+import ipaddress
 import json
 import os
-from logging import getLogger, basicConfig, INFO, DEBUG
-from typing import Any, Optional
-from xml.etree import ElementTree as et
-from xml.etree.ElementTree import Element
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Any, Callable, Optional, TYPE_CHECKING, TypeVar
 
-from boto3 import client
 from botocore.exceptions import ClientError
 
-from panos.panorama import Panorama
+from circuit_breaker import CircuitBreaker
+from idempotency import IDEMPOTENCY, idempotency_key
+from metrics import event_metrics, propagate_context, record_count, record_panorama_call, timed
+from profiles import AsgProfile, asg_profiles, default_asg_profile, event_asg_profile, reset_asg_profiles
+from rate_limiter import RATE_LIMITER
+from runtime import (
+    LIFECYCLE_RESERVE,
+    ConfigureLogger,
+    clear_clients,
+    get_client,
+    remaining_time,
+    set_invocation_deadline,
+)
+from task_graph import run_task_graph
 
+T = TypeVar("T")
 
-class ConfigureLogger:
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        self.logger = getLogger(self.__class__.__name__)
-        basicConfig(format="%(asctime)s %(message)s")
-        level = os.getenv("logger_level", "INFO").upper()
-        self.logger.setLevel(DEBUG if level == "DEBUG" else INFO)
+# panos and XML parsing are only needed on the terminate (delicense) path, so they are imported
+# lazily there to keep them off the launch hook cold start.
+if TYPE_CHECKING:
+    from xml.etree.ElementTree import Element
+
+    from panos.panorama import Panorama
+
+
+# Circuit breaker shared by all Panorama calls of the container
+PANORAMA_BREAKER = CircuitBreaker()
+
+
+# Error codes of AttachNetworkInterface when ENI is attached (or being attached) to another instance already
+ENI_IN_USE_ERROR_CODES = {"InvalidNetworkInterface.InUse", "IncorrectState"}
+
+
+def reset_clients() -> None:
+    """
+    Drop all cached boto3 clients, handlers and Auto Scaling group profiles (used by tests and local tooling).
+    """
+    clear_clients()
+    with _HANDLERS_LOCK:
+        _HANDLERS.clear()
+    reset_asg_profiles()
+
+
+# Panorama configuration secrets cached per (secret ARN, version stage): (expires_at, version_id, value)
+_SECRET_CACHE: dict[tuple[str, str], tuple[float, str, dict[str, Any]]] = {}
+_SECRET_CACHE_LOCK = threading.Lock()
+
+
+def invalidate_secret_config(secret_arn: Optional[str] = None) -> None:
+    """
+    Remove cached secret values, for one secret or all of them.
+
+    :param secret_arn: Secret ARN, None to drop the whole cache
+    """
+    with _SECRET_CACHE_LOCK:
+        for key in list(_SECRET_CACHE):
+            if secret_arn is None or key[0] == secret_arn:
+                del _SECRET_CACHE[key]
+
+
+# Active peer of Panorama HA pairs, cached per (panorama1, panorama2): (expires_at, active_hostname)
+_HA_ACTIVE_CACHE: dict[tuple[str, str], tuple[float, str]] = {}
+_HA_ACTIVE_CACHE_LOCK = threading.Lock()
+
+
+def invalidate_active_panorama(panorama_hostname: Optional[str] = None, panorama_hostname2: Optional[str] = None) -> None:
+    """
+    Forget cached active peer of a Panorama HA pair, or of all pairs when called without arguments.
+
+    :param panorama_hostname: Hostname of the first Panorama server
+    :param panorama_hostname2: Hostname of the second Panorama server
+    """
+    with _HA_ACTIVE_CACHE_LOCK:
+        if panorama_hostname is None:
+            _HA_ACTIVE_CACHE.clear()
+        else:
+            _HA_ACTIVE_CACHE.pop((panorama_hostname, panorama_hostname2 or ""), None)
+
+
+# Panorama connections (holding generated API keys) cached per (hostname, username, password digest)
+_PANORAMA_SESSIONS: dict[tuple[str, str, str], "Panorama"] = {}
+_PANORAMA_SESSIONS_LOCK = threading.Lock()
+# Default socket timeout (seconds) of Panorama API calls, well below the Lambda timeout (30 s), so an unreachable
+# Panorama fails the call while there is still time to defer de-licensing
+DEFAULT_PANORAMA_API_TIMEOUT = "10"
+
+# API calls (including key generation) are serialized per Panorama object (keyed by id, objects are kept
+# in _PANORAMA_SESSIONS): panos keeps the last response on the API client shared by all users of the session
+_PANORAMA_SESSION_LOCKS: dict[int, threading.RLock] = {}
+_PANORAMA_SESSION_LOCKS_LOCK = threading.Lock()
+
+
+def get_panorama_session(panorama_hostname: str, panorama_username: str, panorama_password: str) -> "Panorama":
+    """
+    Return Panorama object for given hostname and credentials, shared by all calls in the Lambda container,
+    so API key is generated only once instead of for every Panorama connection.
+
+    :param panorama_hostname: Hostname of the Panorama server, optionally with port ("hostname:port")
+    :param panorama_username: Account's name
+    :param panorama_password: Account's password
+    :return: Panorama object
+    """
+    from panos.panorama import Panorama
+
+    key = (
+        panorama_hostname,
+        panorama_username,
+        hashlib.sha256(panorama_password.encode()).hexdigest(),
+    )
+    with _PANORAMA_SESSIONS_LOCK:
+        panorama = _PANORAMA_SESSIONS.get(key)
+        if panorama is None:
+            # Hostname can include non-default API port, e.g. "panorama.example.com:8443"
+            hostname, separator, port = panorama_hostname.rpartition(":")
+            if not separator or ":" in hostname or not port.isdigit():
+                hostname, port = panorama_hostname, "443"
+            panorama = Panorama(
+                hostname=hostname,
+                api_username=panorama_username,
+                api_password=panorama_password,
+                port=int(port),
+                # Socket timeout of API calls (panos default is 1200 s), cut to remaining invocation time per call
+                timeout=int(os.getenv("panorama_api_timeout", DEFAULT_PANORAMA_API_TIMEOUT)),
+            )
+            _PANORAMA_SESSIONS[key] = panorama
+    return panorama
+
+
+def set_panorama_timeout(panorama: "Panorama", timeout: int) -> None:
+    """
+    Set socket timeout of the next API calls of Panorama object (caller holds the session lock).
+
+    :param panorama: Panorama object
+    :param timeout: timeout in whole seconds (pan-python accepts only positive integers)
+    """
+    panorama.timeout = timeout
+    # panos API client copies the timeout when it is created, the cached client is not regenerated (that needs a key)
+    if panorama._xapi_private is not None:
+        panorama._xapi_private.timeout = timeout
+
+
+def panorama_session_lock(panorama: "Panorama") -> threading.RLock:
+    """
+    Return lock serializing API calls of Panorama object, so concurrent batches (or Auto Scaling groups)
+    sharing the session never interleave requests and responses on its API client.
+
+    :param panorama: Panorama object
+    :return: reentrant lock of the session
+    """
+    with _PANORAMA_SESSION_LOCKS_LOCK:
+        return _PANORAMA_SESSION_LOCKS.setdefault(id(panorama), threading.RLock())
+
+
+def rekey_panorama_session(panorama: "Panorama", rejected_key: Optional[str] = None) -> None:
+    """
+    Generate new API key for cached Panorama object, e.g. when previous key expired or was revoked.
+
+    :param panorama: Panorama object
+    :param rejected_key: key rejected by Panorama, calls rejected with the same key generate only one new key
+    """
+    generate_panorama_key(panorama, rejected_key or panorama._api_key)
+
+
+def generate_panorama_key(panorama: "Panorama", rejected_key: Optional[str] = None) -> None:
+    """
+    Generate API key of Panorama object unless it already has one (other than rejected_key), accounted as
+    panorama.Keygen call (panos would generate it implicitly on the first API call).
+
+    :param panorama: Panorama object
+    :param rejected_key: key to be replaced
+    """
+    # panos does not expose a way to drop the generated key, so the cached one is read and cleared directly
+    if panorama._api_key is not None and panorama._api_key != rejected_key:
+        return
+    # Concurrent calls sharing the session wait for one key instead of each generating its own
+    with panorama_session_lock(panorama):
+        if panorama._api_key is not None and panorama._api_key != rejected_key:
+            return
+        panorama._api_key = None
+        started = time.monotonic()
+        failed = True
+        try:
+            panorama.api_key
+            failed = False
+        finally:
+            record_panorama_call("Keygen", time.monotonic() - started, failed=failed)
+        # panos API client holds the key it was created with
+        panorama.update_connection_method()
+
+
+def reset_panorama_sessions() -> None:
+    """
+    Drop all cached Panorama connections and circuit breaker state.
+    """
+    global PANORAMA_BREAKER
+    PANORAMA_BREAKER = CircuitBreaker()
+    with _PANORAMA_SESSIONS_LOCK:
+        _PANORAMA_SESSIONS.clear()
+    with _PANORAMA_SESSION_LOCKS_LOCK:
+        _PANORAMA_SESSION_LOCKS.clear()
+
+
+# License manager device lists cached per (Panorama hostname, license manager): (expires_at, {ip: serial})
+_DEVICE_INDEX_CACHE: dict[tuple[str, str], tuple[float, dict[str, str]]] = {}
+_DEVICE_INDEX_CACHE_LOCK = threading.Lock()
+
+# Warm pool ENIs reserved by launches of this container (oldest dropped after 1000): pool tags are eventually
+# consistent, a reserved ENI can still be listed as available to concurrent launches
+_RESERVED_POOL_ENIS: OrderedDict[str, None] = OrderedDict()
+_RESERVED_POOL_ENIS_LOCK = threading.Lock()
+
+
+def invalidate_device_index(panorama_hostname: Optional[str] = None, panorama_lm_name: Optional[str] = None) -> None:
+    """
+    Forget cached license manager device list, or all of them when called without arguments.
+
+    :param panorama_hostname: Hostname of the Panorama server
+    :param panorama_lm_name: License manager name
+    """
+    with _DEVICE_INDEX_CACHE_LOCK:
+        if panorama_hostname is None:
+            _DEVICE_INDEX_CACHE.clear()
+        else:
+            _DEVICE_INDEX_CACHE.pop((panorama_hostname, panorama_lm_name or ""), None)
+
+
+def stream_license_manager_devices(panorama: "Panorama", cmd: str) -> dict[str, str]:
+    """
+    Run operational command listing license manager devices and build management IP -> serial index
+    while the response is downloaded. Response is parsed incrementally and every device element is dropped
+    right after it is indexed, so even lists with thousands of devices are never held in memory as a whole.
+
+    :param panorama: Panorama object (provides hostname and API key)
+    :param cmd: operational command, e.g. show plugins sw_fw_license devices license-manager "name"
+    :return: dict management IP -> serial number
+    """
+    import ssl
+    import urllib.parse
+    import urllib.request
+    from xml.etree import ElementTree as et
+
+    import panos
+
+    data = urllib.parse.urlencode(
+        {"type": "op", "cmd": panos.string_to_xml(cmd), "key": panorama.api_key}
+    ).encode()
+    request = urllib.request.Request(f"https://{panorama.hostname}:{panorama.port}/api/", data=data)
+
+    # Same as pan-python used by panos: Panorama certificates are usually self-signed
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    devices: dict[str, str] = {}
+    stack: list["Element"] = []
+    with urllib.request.urlopen(request, context=context, timeout=panorama.timeout) as response:
+        for event, element in et.iterparse(response, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            # Devices are children of response/result/<list>, i.e. the 4th level of the document
+            if len(stack) == 3:
+                ip, serial = element.findtext("ip"), element.findtext("serial")
+                if ip and serial:
+                    devices[ip] = serial
+                stack[-1].remove(element)
+
+    root = element
+    if root.attrib.get("status") != "success":
+        raise RuntimeError(f"Command '{cmd}' failed: {' '.join(root.itertext()).strip()}")
+    return devices
+
+
+class PanoramaAuthError(Exception):
+    """Raised when Panorama rejects the configured credentials."""
+
+
+def is_panorama_auth_error(error: Exception) -> bool:
+    """
+    Check if exception raised by panos means that Panorama rejected credentials or API key.
+
+    :param error: exception raised while talking to Panorama
+    :return: True for authentication/authorization failures
+    """
+    message = str(error).lower()
+    return any(
+        marker in message
+        for marker in ("invalid credential", "403", "unauthorized", "invalid key", "api key")
+    )
+
+
+class PanoramaUnavailableError(Exception):
+    """Raised when Panorama cannot be reached or its circuit breaker is open."""
+
+
+# HTTP statuses of proxies and load balancers in front of Panorama which mean that Panorama is not serving
+UNAVAILABLE_HTTP_CODES = ("502", "503", "504")
+
+
+def is_panorama_unreachable(error: Exception) -> bool:
+    """
+    Check if exception raised while talking to Panorama means that Panorama could not be reached (connection
+    refused or reset, timeout, name resolution) rather than that it answered with an error.
+
+    :param error: exception raised while talking to Panorama
+    :return: True for connectivity failures
+    """
+    import urllib.error
+
+    if isinstance(error, PanoramaUnavailableError):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return str(error.code) in UNAVAILABLE_HTTP_CODES
+    if isinstance(error, OSError):
+        # URLError, socket timeouts, connection and TLS handshake errors of device list download
+        return True
+    # panos reports failed requests as "URLError: reason: <reason>" or "URLError: code: <HTTP status> reason: ..."
+    message = str(error)
+    if message.startswith("URLError: code: "):
+        return message[len("URLError: code: "):].startswith(UNAVAILABLE_HTTP_CODES)
+    return message.startswith("URLError:") or "timed out" in message.lower()
+
+
+# Steps of lifecycle flows: step -> steps it depends on, independent steps run concurrently
+LIFECYCLE_STEPS: dict[str, dict[str, tuple[str, ...]]] = {
+    "EC2 Instance-launch Lifecycle Action": {
+        "source_dest_check": (),
+        "network_interfaces": (),
+        "license_identity": ("network_interfaces",),
+    },
+    "EC2 Instance-terminate Lifecycle Action": {"delicense": ()},
+}
+
+# Seconds of invocation time a step (or a phase checked inside of a step) may need, overridden
+# by lifecycle_step_budgets environment variable (JSON)
+DEFAULT_STEP_BUDGETS = {
+    "source_dest_check": 3.0,
+    "network_interfaces": 15.0,
+    "license_identity": 3.0,
+    "delicense": 15.0,
+    # Phases inside of steps: preparing one ENI, Panorama HA probe, device list and deactivation of devices
+    "eni": 5.0,
+    "panorama_ha_probe": 5.0,
+    "panorama_device_list": 5.0,
+    "panorama_deactivate": 3.0,
+}
+
+
+class LifecycleStepDeferred(Exception):
+    """
+    Raised inside of a lifecycle step when its next phase does not fit into the invocation. Steps are idempotent,
+    work done so far (prepared and attached ENIs, deactivated licenses) is kept and the step is run again
+    by the resumed invocation.
+    """
+
+
+# Lifecycle action handled by the current thread ({"detail": ASG event details, "heartbeat_pending": bool}),
+# None outside of lifecycle flow
+_CURRENT_LIFECYCLE_ACTION: contextvars.ContextVar[Optional[dict[str, Any]]] = contextvars.ContextVar(
+    "current_lifecycle_action", default=None
+)
+
+# Instance tag with progress of lifecycle flow: "<lifecycle action token>:<completed step>,<completed step>"
+CHECKPOINT_TAG = "VMSeriesLifecycleCheckpoint"
+
+# Instance tags with identity of VM-Series in license manager, so terminate can de-license it without looking
+# up the management interface and scanning device list. IP is recorded at launch, serial by reconcile sweep
+# once the firewall registered in license manager.
+MANAGEMENT_IP_TAG = "VMSeriesManagementIp"
+SERIAL_TAG = "VMSeriesSerial"
+
+# ENI tag with Auto Scaling group of the instance the ENI was created for, so reconciliation of one group
+# does not treat ENIs of other groups in the same region as orphaned
+ASG_NAME_TAG = "VMSeriesAutoScalingGroup"
+
+
+class InstanceSnapshot:
+    """
+    EC2 instance data from a single describe_instances call, answering questions about placement
+    and attached network interfaces without further EC2 API calls.
+    """
+
+    def __init__(self, instance_info: dict[str, Any]) -> None:
+        self.instance_id: str = instance_info.get("InstanceId", "")
+        self.availability_zone: Optional[str] = instance_info.get("Placement", {}).get("AvailabilityZone")
+        self.subnet_id: Optional[str] = instance_info.get("SubnetId")
+        self.network_interfaces: list[dict[str, Any]] = instance_info.get("NetworkInterfaces", [])
+        self.tags: dict[str, str] = {tag["Key"]: tag["Value"] for tag in instance_info.get("Tags", [])}
+
+    def interface(self, device_index: int) -> Optional[dict[str, Any]]:
+        """
+        Return network interface attached with given device index.
+
+        :param device_index: ENI device index
+        :return: network interface description or None
+        """
+        for ni in self.network_interfaces:
+            if (ni.get("Attachment") or {}).get("DeviceIndex") == int(device_index):
+                return ni
+        return None
+
+    def attached_eni(self, device_index: int) -> tuple[Optional[str], Optional[str]]:
+        """
+        Return (eni_id, attachment_id) for a given device index if attached, else (None, None).
+
+        :param device_index: ENI device index
+        """
+        ni = self.interface(device_index)
+        if ni is None:
+            return None, None
+        return ni.get("NetworkInterfaceId"), ni["Attachment"].get("AttachmentId")
+
+    def delete_on_termination(self, device_index: int) -> bool:
+        """
+        Check if interface with given device index is deleted together with the instance.
+
+        :param device_index: ENI device index
+        """
+        ni = self.interface(device_index)
+        return bool(ni and ni["Attachment"].get("DeleteOnTermination"))
+
+    def private_ip(self, device_index: int) -> Optional[str]:
+        """
+        Return primary private IP address of interface with given device index.
+
+        :param device_index: ENI device index
+        """
+        ni = self.interface(device_index)
+        return ni.get("PrivateIpAddress") if ni else None
+
+
+class NetworkInterfaceClaimLost(Exception):
+    """
+    Raised when reserved warm pool ENI was attached by a concurrent launch: it belongs to that launch now
+    and must not be deleted.
+    """
+
+
+class LifecycleAbandonedError(RuntimeError):
+    """Raised after lifecycle action was completed with ABANDON result, the event must not be handled again."""
 
 
 class VMSeriesInterfaceScaling(ConfigureLogger):
+    @timed("find_reusable_eni")
     def get_available_tagged_eni(self, instance_id: str, device_index: int) -> Optional[str]:
         """
         Look for an available (not attached) ENI created by this Lambda using tags.
@@ -48,15 +485,16 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
                 f"Error searching for reusable ENI for instance {instance_id} device {device_index}: {e.response['Error'].get('Code')}"
             )
             return None
-    def __init__(self) -> None:
+
+    def __init__(self, profile: Optional[AsgProfile] = None) -> None:
         super().__init__()
+        # Auto Scaling group served by this handler
+        self.profile = profile or default_asg_profile()
 
-        # Prepare boto3 clients for required services
-        self.ec2_client = client("ec2", region_name=os.environ["AWS_REGION"])
-        self.asg_client = client("autoscaling", region_name=os.environ["AWS_REGION"])
-        self.secret_client = client(
-            "secretsmanager", region_name=os.environ["AWS_REGION"]
-        )
+        # Reuse boto3 clients cached for the lifetime of the Lambda container, shared by handlers of the same region
+        self.ec2_client = get_client("ec2", self.profile.region)
+        self.asg_client = get_client("autoscaling", self.profile.region)
+        self.secret_client = get_client("secretsmanager")
 
     def run(self, asg_event: dict[str, Any]) -> None:
         """
@@ -70,43 +508,428 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
 
         # Depending on event type, take appropriate actions
         event = asg_event.get("detail-type", "")
-        lifecycle_result = "CONTINUE"
-
-        try:
-            instance_id = asg_event["detail"]["EC2InstanceId"]
-            instance_zone, subnet_id, network_interfaces = self.inspect_ec2_instance(
-                instance_id
+        lifecycle_event = {
+            "EC2 Instance-launch Lifecycle Action": "launch",
+            "EC2 Instance-terminate Lifecycle Action": "terminate",
+        }.get(event, "unknown")
+        detail = asg_event.get("detail", {})
+        with event_metrics(
+            lifecycle_event,
+            InstanceId=detail.get("EC2InstanceId"),
+            AutoScalingGroupName=detail.get("AutoScalingGroupName"),
+        ) as metrics:
+            # Duplicate deliveries get the outcome of the first one instead of handling the event again
+            lifecycle_result, duplicate = IDEMPOTENCY.run(
+                idempotency_key(asg_event), lambda: self.handle_lifecycle_event(asg_event)
             )
-            if event == "EC2 Instance-launch Lifecycle Action":
+            if duplicate:
+                self.logger.info(f"Duplicate lifecycle event, already handled with result {lifecycle_result}")
+                metrics.count("DuplicateEvents")
+            metrics.outcome = lifecycle_result
 
-                self.logger.info("Run launch mode.")
+        # If we abandoned, raise to surface failure in Lambda logs/metrics
+        if lifecycle_result == "ABANDON":
+            raise LifecycleAbandonedError(f"Lifecycle action abandoned due to error handling event: {event}")
 
-                # Disable source-destination check for first dataplane interface
-                self.disable_source_dest_check(network_interfaces[0]["NetworkInterfaceId"])
+    def handle_lifecycle_event(self, asg_event: dict[str, Any]) -> str:
+        """
+        Run steps of lifecycle flow and complete the lifecycle action. Steps run as soon as steps they depend on
+        are completed, independent steps concurrently. Before each step remaining invocation time is checked
+        against the step budget: if the step would not fit, it is not started, progress is checkpointed
+        in instance tag, lifecycle action heartbeat is recorded and the flow is re-invoked asynchronously,
+        resuming with steps not completed yet. Each invocation starts at least one step, so the flow always progresses.
+        Long steps check their phases the same way (see checkpoint()), a step deferred in the middle is run again
+        by the resumed invocation, reusing work done so far.
 
-                # Create/attach additional network interface(s) (idempotent)
-                self.setup_network_interfaces(instance_zone, subnet_id, instance_id)
+        :param asg_event: dict data from Lambda handler
+        :return: lifecycle action result, CONTINUE or ABANDON, DEFERRED if the flow continues in new invocation
+        """
+        event = asg_event.get("detail-type", "")
+        lifecycle_result = "CONTINUE"
+        action = _CURRENT_LIFECYCLE_ACTION.set({"detail": asg_event.get("detail", {}), "heartbeat_pending": True})
 
-            elif event == "EC2 Instance-terminate Lifecycle Action":
-                self.logger.info("Run cleanup mode.")
-                if os.environ.get("fw_delicense"):
-                    # Delicense firewall using plugin sw_fw_license in Panorama (optional)
-                    self.delicense_fw(instance_id)
-            else:
+        try:
+            steps = LIFECYCLE_STEPS.get(event)
+            if steps is None:
                 raise ValueError(f"Event type cannot be handled! {event}")
 
+            instance_id = asg_event["detail"]["EC2InstanceId"]
+            snapshot = self.inspect_ec2_instance(instance_id)
+            completed = self.load_checkpoint(asg_event, snapshot)
+            for step in completed:
+                self.logger.info(f"Step {step} of instance {instance_id} already completed, skipping it")
+            started: list[str] = []
+            deferred: set[str] = set()
+
+            def run_step(step: str) -> None:
+                try:
+                    self.run_lifecycle_step(step, snapshot)
+                except LifecycleStepDeferred as e:
+                    self.logger.info(f"Step {step} of instance {instance_id} deferred: {e}")
+                    deferred.add(step)
+
+            remaining = {
+                step: (
+                    lambda step=step: run_step(step),
+                    tuple(dependency for dependency in dependencies if dependency not in completed),
+                )
+                for step, dependencies in steps.items()
+                if step not in completed
+            }
+
+            def can_start(step: str) -> bool:
+                # Steps depending on deferred step wait for the resumed invocation
+                if deferred.intersection(steps[step]):
+                    return False
+                # Each invocation starts at least one step, so the flow always progresses
+                if started and not self.has_budget(step):
+                    return False
+                started.append(step)
+                return True
+
+            finished = run_task_graph(remaining, max_workers=len(steps), can_start=can_start)
+            completed.extend(step for step in remaining if step in finished and step not in deferred)
+            if any(step not in completed for step in remaining):
+                self.defer_lifecycle_event(asg_event, completed)
+                return "DEFERRED"
+
+            if CHECKPOINT_TAG in snapshot.tags:
+                self.ec2_client.delete_tags(Resources=[instance_id], Tags=[{"Key": CHECKPOINT_TAG}])
+
         except Exception as e:
             # In launch hook, ABANDON causes the instance to be terminated and replaced.
             # In terminate hook, ABANDON allows termination to proceed.
             lifecycle_result = "ABANDON"
             self.logger.exception(f"Error during lifecycle handling ({event}): {e}")
+        finally:
+            _CURRENT_LIFECYCLE_ACTION.reset(action)
 
-        # Complete the lifecycle action with the appropriate result
-        self.complete_lifecycle(asg_event["detail"], result=lifecycle_result)
+        # Complete the lifecycle action with the appropriate result, event is handled again if it stays pending
+        if not self.complete_lifecycle(asg_event["detail"], result=lifecycle_result):
+            raise RuntimeError(f"Lifecycle action of instance {asg_event['detail'].get('EC2InstanceId')} not completed")
+        return lifecycle_result
 
-        # If we abandoned, raise to surface failure in Lambda logs/metrics
-        if lifecycle_result != "CONTINUE":
-            raise RuntimeError(f"Lifecycle action abandoned due to error handling event: {event}")
+    def run_lifecycle_step(self, step: str, snapshot: InstanceSnapshot) -> None:
+        """
+        Run one step of lifecycle flow.
+
+        :param step: step name from LIFECYCLE_STEPS
+        :param snapshot: instance data described at the beginning of the invocation
+        :return: none
+        """
+        instance_id = snapshot.instance_id
+        if step == "source_dest_check":
+            self.logger.info("Run launch mode.")
+            # Disable source-destination check for first dataplane interface
+            primary_eni_id, _ = snapshot.attached_eni(0)
+            self.disable_source_dest_check(primary_eni_id or snapshot.network_interfaces[0]["NetworkInterfaceId"])
+
+        elif step == "network_interfaces":
+            # Create/attach additional network interface(s) (idempotent)
+            self.setup_network_interfaces(
+                snapshot.availability_zone, snapshot.subnet_id, instance_id, snapshot=snapshot
+            )
+
+        elif step == "license_identity":
+            if self.profile.get("fw_delicense"):
+                # Remember management IP, so de-licensing does not depend on the ENI at terminate
+                self.record_license_identity(snapshot)
+
+        elif step == "delicense":
+            self.logger.info("Run cleanup mode.")
+            if self.profile.get("fw_delicense"):
+                # Delicense firewall using plugin sw_fw_license in Panorama (optional),
+                # each Panorama call can wait up to panorama_api_timeout
+                self.heartbeat_before_long_wait()
+                self.delicense_fw(instance_id, snapshot=snapshot)
+
+    @staticmethod
+    def has_budget(step: str) -> bool:
+        """
+        Check if there is enough time left in the invocation to run the step.
+
+        :param step: step name from LIFECYCLE_STEPS
+        :return: True if step fits into remaining time
+        """
+        budgets = {**DEFAULT_STEP_BUDGETS, **json.loads(os.getenv("lifecycle_step_budgets", "{}"))}
+        return remaining_time() - LIFECYCLE_RESERVE >= float(budgets.get(step, 0))
+
+    @classmethod
+    def checkpoint(cls, phase: str) -> None:
+        """
+        Check inside of a lifecycle step that its next phase fits into remaining invocation time,
+        LifecycleStepDeferred is raised otherwise (no-op outside of lifecycle flow).
+
+        :param phase: phase name from DEFAULT_STEP_BUDGETS
+        :return: none
+        """
+        if _CURRENT_LIFECYCLE_ACTION.get() is not None and not cls.has_budget(phase):
+            raise LifecycleStepDeferred(f"not enough time left for {phase}")
+
+    def heartbeat_before_long_wait(self) -> None:
+        """
+        Restart timeout of the lifecycle action handled by the current invocation before a wait which can take
+        long, at most once per invocation (no-op outside of lifecycle flow).
+
+        :return: none
+        """
+        action = _CURRENT_LIFECYCLE_ACTION.get()
+        if action is None or not action.pop("heartbeat_pending", False):
+            return
+        try:
+            self.record_lifecycle_heartbeat(action["detail"])
+        except ClientError as e:
+            self.logger.warning(f"Cannot record lifecycle action heartbeat: {e}")
+
+    @staticmethod
+    def load_checkpoint(asg_event: dict[str, Any], snapshot: InstanceSnapshot) -> list[str]:
+        """
+        Return steps of lifecycle flow completed by previous invocations, from instance tag and resumed event.
+
+        :param asg_event: dict data from Lambda handler
+        :param snapshot: instance data described at the beginning of the invocation
+        :return: list of completed steps
+        """
+        token, _, steps = snapshot.tags.get(CHECKPOINT_TAG, "").partition(":")
+        completed = steps.split(",") if steps and token == asg_event["detail"].get("LifecycleActionToken") else []
+        # Tags are eventually consistent, progress is carried in the resumed event as well
+        completed.extend(step for step in asg_event.get("completed_steps", []) if step not in completed)
+        return completed
+
+    def defer_lifecycle_event(self, asg_event: dict[str, Any], completed: list[str]) -> None:
+        """
+        Checkpoint progress of lifecycle flow, extend lifecycle action timeout and re-invoke the Lambda
+        asynchronously to resume the flow (at most lifecycle_max_resumes times, default 3).
+
+        :param asg_event: dict data from Lambda handler
+        :param completed: steps completed so far
+        :return: none
+        """
+        detail = asg_event["detail"]
+        resumes = int(asg_event.get("resume_count", 0))
+        if resumes >= int(os.getenv("lifecycle_max_resumes", "3")):
+            raise RuntimeError(f"Lifecycle flow not finished after {resumes} resumed invocations")
+
+        self.logger.info(
+            f"Not enough time left for next step of instance {detail['EC2InstanceId']}, "
+            f"resuming after steps {completed} in new invocation"
+        )
+        self.ec2_client.create_tags(
+            Resources=[detail["EC2InstanceId"]],
+            Tags=[{"Key": CHECKPOINT_TAG, "Value": f"{detail['LifecycleActionToken']}:{','.join(completed)}"}],
+        )
+        self.record_lifecycle_heartbeat(detail)
+        get_client("lambda").invoke(
+            FunctionName=os.environ["AWS_LAMBDA_FUNCTION_NAME"],
+            InvocationType="Event",
+            Payload=json.dumps({**asg_event, "completed_steps": completed, "resume_count": resumes + 1}).encode(),
+        )
+
+    @timed("lifecycle_heartbeat")
+    def record_lifecycle_heartbeat(self, asg_event: dict[str, Any]) -> None:
+        """
+        Restart timeout of the lifecycle action, so the instance waits for the resumed flow.
+
+        :param asg_event: ASG event details
+        :return: none
+        """
+        self.asg_client.record_lifecycle_action_heartbeat(
+            LifecycleHookName=asg_event["LifecycleHookName"],
+            AutoScalingGroupName=asg_event["AutoScalingGroupName"],
+            LifecycleActionToken=asg_event["LifecycleActionToken"],
+            InstanceId=asg_event["EC2InstanceId"],
+        )
+
+    def run_batch(self, records: list[dict[str, Any]]) -> list[str]:
+        """
+        Handle batch of lifecycle events buffered in SQS. Events are processed concurrently on a bounded
+        thread pool (batch_max_workers, default 10): terminate events are de-licensed together (one device list
+        and one Panorama commit per batch), other events are handled by run(), one task per instance.
+
+        De-licensing deferred during Panorama outage (messages of the retry queue) is retried for the whole batch.
+
+        :param records: SQS records, message body is EventBridge lifecycle event or deferred de-licensing
+        :return: message ids of records which failed and should be retried
+        """
+        failures = []
+        terminate_events: dict[str, dict[str, Any]] = {}
+        instance_events: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+        deferred: dict[str, dict[str, Any]] = {}
+        for record in records:
+            message_id = record.get("messageId", "")
+            try:
+                asg_event = json.loads(record["body"])
+                instance_id = asg_event["detail"]["EC2InstanceId"]
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error(f"Cannot parse lifecycle event from SQS message {message_id}: {e}")
+                failures.append(message_id)
+                continue
+
+            if asg_event.get("action") == "delicense":
+                deferred[message_id] = asg_event
+            elif asg_event.get("detail-type") == "EC2 Instance-terminate Lifecycle Action":
+                terminate_events[message_id] = asg_event
+            else:
+                # Events of the same instance are handled in order by one task, so they never race each other
+                instance_events.setdefault(instance_id, []).append((message_id, asg_event))
+
+        max_workers = max(1, min(len(records), int(os.getenv("batch_max_workers", "10"))))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            delicense_future = (
+                pool.submit(self.run_delicense_batches, terminate_events, deferred)
+                if terminate_events or deferred
+                else None
+            )
+            instance_futures = [pool.submit(self.run_instance_events, events) for events in instance_events.values()]
+            for future in instance_futures:
+                failures.extend(future.result())
+            if delicense_future is not None:
+                failures.extend(delicense_future.result())
+        return failures
+
+    def run_delicense_batches(
+        self, terminate_events: dict[str, dict[str, Any]], deferred: dict[str, dict[str, Any]]
+    ) -> list[str]:
+        """
+        Handle terminate events and deferred de-licensing of the batch one after another, as both talk to
+        the same Panorama.
+
+        :param terminate_events: dict SQS message id -> terminate lifecycle event
+        :param deferred: dict SQS message id -> deferred de-licensing message
+        :return: message ids to be retried
+        """
+        failures = self.run_terminate_batch(terminate_events) if terminate_events else []
+        if deferred:
+            failures.extend(self.run_deferred_delicense(deferred))
+        return failures
+
+    def run_instance_events(self, events: list[tuple[str, dict[str, Any]]]) -> list[str]:
+        """
+        Handle lifecycle events of one instance one by one.
+
+        :param events: list of (SQS message id, lifecycle event)
+        :return: message ids of events which failed
+        """
+        failures = []
+        for message_id, asg_event in events:
+            try:
+                self.run(asg_event)
+            except LifecycleAbandonedError as e:
+                # Lifecycle action is completed already, redelivered message could only fail again
+                self.logger.error(f"Lifecycle event from SQS message {message_id} abandoned: {e}")
+            except Exception as e:
+                self.logger.error(f"Failed to handle lifecycle event from SQS message {message_id}: {e}")
+                failures.append(message_id)
+        return failures
+
+    def run_terminate_batch(self, terminate_events: dict[str, dict[str, Any]]) -> list[str]:
+        """
+        Handle many terminate lifecycle events at once, de-licensing all firewalls with a single Panorama commit.
+
+        :param terminate_events: dict SQS message id -> terminate lifecycle event
+        :return: message ids of events whose lifecycle action was not completed or which are being handled
+            by another invocation
+        """
+        self.logger.info(f"Run cleanup mode for {len(terminate_events)} instances.")
+        lifecycle_result = "CONTINUE"
+
+        # Each lifecycle action is handled once: duplicate messages in the batch share its outcome, events
+        # handled before are skipped and events being handled elsewhere are retried later
+        message_keys = {
+            message_id: idempotency_key(asg_event) or message_id for message_id, asg_event in terminate_events.items()
+        }
+        claimed: dict[str, dict[str, Any]] = {}
+        recorded: dict[str, str] = {}
+        for message_id, key in message_keys.items():
+            if key in claimed or key in recorded:
+                continue
+            outcome = IDEMPOTENCY.claim(key, wait=False)
+            if outcome is None:
+                claimed[key] = terminate_events[message_id]
+            else:
+                recorded[key] = outcome
+
+        with event_metrics("terminate_batch") as metrics:
+            metrics.count("BatchSize", len(terminate_events))
+            metrics.count("DuplicateEvents", len(terminate_events) - len(claimed))
+            try:
+                if self.profile.get("fw_delicense") and claimed:
+                    # Delicense firewalls using plugin sw_fw_license in Panorama (optional)
+                    instance_ids = list(
+                        dict.fromkeys(event["detail"]["EC2InstanceId"] for event in claimed.values())
+                    )
+                    for instance_id, delicensed in self.delicense_fw_batch(instance_ids).items():
+                        self.logger.info(f"De-licensing result for instance {instance_id}: {delicensed}")
+            except Exception as e:
+                # ABANDON allows termination to proceed, licenses left behind are released by reconciliation
+                lifecycle_result = "ABANDON"
+                self.logger.exception(f"Error during batch lifecycle handling: {e}")
+
+            # Complete the lifecycle action of each instance with the appropriate result, only events whose
+            # lifecycle action stays pending are retried
+            pending = set()
+            for key, asg_event in claimed.items():
+                completed = False
+                try:
+                    completed = self.complete_lifecycle(asg_event["detail"], result=lifecycle_result)
+                except Exception as e:
+                    self.logger.exception(f"Error completing lifecycle action of {key}: {e}")
+                finally:
+                    IDEMPOTENCY.finish(key, lifecycle_result if completed else "ABANDON")
+                if not completed:
+                    pending.add(key)
+            metrics.outcome = lifecycle_result
+
+        return [
+            message_id
+            for message_id, key in message_keys.items()
+            if key in pending or recorded.get(key) == "IN_PROGRESS"
+        ]
+
+    def run_deferred_delicense(self, deferred: dict[str, dict[str, Any]]) -> list[str]:
+        """
+        Retry de-licensing deferred while Panorama was unavailable (see defer_delicense), with a single Panorama commit
+        for the whole batch. Messages are kept in the retry queue while Panorama is still unavailable (or de-licensing
+        fails unexpectedly), so they are delivered again after visibility timeout.
+
+        :param deferred: dict SQS message id -> deferred de-licensing message
+        :return: message ids to be retried
+        """
+        ip_addresses: dict[str, str] = {}
+        serials: dict[str, str] = {}
+        failures = []
+        for message_id, message in deferred.items():
+            ip_address = message["detail"].get("ManagementIp")
+            if not ip_address:
+                self.logger.error(f"No management IP in deferred de-licensing message {message_id}")
+                failures.append(message_id)
+                continue
+            ip_addresses[message_id] = ip_address
+            if message["detail"].get("Serial"):
+                serials[ip_address] = message["detail"]["Serial"]
+
+        with event_metrics("delicense_retry") as metrics:
+            metrics.count("BatchSize", len(deferred))
+            try:
+                delicensed = self.delicense_ip_addresses(list(dict.fromkeys(ip_addresses.values())), serials)
+            except PanoramaUnavailableError as e:
+                self.logger.warning(f"{e}. Keeping {len(ip_addresses)} deferred de-licensing requests in queue.")
+                metrics.outcome = "DEFERRED"
+                return failures + list(ip_addresses)
+            except Exception as e:
+                self.logger.exception(f"Error during deferred de-licensing: {e}")
+                metrics.outcome = "ABANDON"
+                return failures + list(ip_addresses)
+
+            # Devices not de-licensed now (e.g. not registered in license manager anymore) are left to reconciliation
+            for message_id, ip_address in ip_addresses.items():
+                instance_id = deferred[message_id]["detail"].get("EC2InstanceId")
+                self.logger.info(
+                    f"Deferred de-licensing result for instance {instance_id}: {delicensed.get(ip_address, False)}"
+                )
+            metrics.count("DelicensedDevices", sum(delicensed.values()))
+            metrics.outcome = "CONTINUE"
+        return failures
 
     def get_attached_eni_for_device_index(self, instance_id: str, device_index: int) -> tuple[Optional[str], Optional[str]]:
         """Return (eni_id, attachment_id) for a given instance/device-index if attached, else (None, None)."""
@@ -131,24 +954,13 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             )
             return None, None
 
-    def ensure_delete_on_termination(self, interface_id: str, attachment_id: str) -> None:
-        """Ensure ENI is set to DeleteOnTermination=True (idempotent)."""
-        try:
-            self.ec2_client.modify_network_interface_attribute(
-                Attachment={"AttachmentId": attachment_id, "DeleteOnTermination": True},
-                NetworkInterfaceId=interface_id,
-            )
-            self.logger.info(
-                f"Ensured DeleteOnTermination=True for ENI={interface_id} attachment={attachment_id}"
-            )
-        except ClientError as e:
-            self.logger.error(
-                f"Error setting DeleteOnTermination for ENI {interface_id}: {e.response['Error'].get('Code')}"
-            )
-            raise
-
+    @timed("network_interfaces")
     def setup_network_interfaces(
-        self, instance_zone: str, subnet_id: str, instance_id: str
+        self,
+        instance_zone: str,
+        subnet_id: str,
+        instance_id: str,
+        snapshot: Optional[InstanceSnapshot] = None,
     ) -> None:
         """
         Main logic here is to set necessary parameters and call
@@ -157,70 +969,123 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         :param instance_id: EC2 Instance id
         :param subnet_id: Subnet id
         :param instance_zone: Availability zone for current instance
+        :param snapshot: instance data already described, used instead of describing attached ENIs again
         :return:
         """
         # Prepare interface in propriate structure
         self.logger.info(f"Instance ID: {instance_id}, Instance zone: {instance_zone}")
         self.logger.debug(f"Subnet ID of the first interface: {subnet_id}")
-        interface = self.create_interface_settings(instance_zone)
+        interfaces = self.create_interface_settings(instance_zone)
 
-        # For each interface in the list, create and configure ENI
-        self.logger.info(
-            f"Found new interface to create: id={interface['index']}, subnet={interface['subnet']}, "
-            f"security_group={interface['sg']}"
-        )
-        self.create_and_configure_new_network_interface(instance_id, interface)
+        for interface in interfaces:
+            self.logger.info(
+                f"Found new interface to create: id={interface['index']}, subnet={interface['subnet']}, "
+                f"security_group={interface['sg']}"
+            )
 
-    @staticmethod
-    def create_interface_settings(instance_zone: str) -> dict[str, Any]:
+        prepared: dict[int, Optional[str]] = {}
+        attached: set[int] = set()
+
+        def prepare(interface: dict[str, Any]) -> None:
+            self.checkpoint("eni")
+            prepared[interface["index"]] = self.prepare_network_interface(instance_id, interface, snapshot=snapshot)
+
+        def attach(interface: dict[str, Any]) -> None:
+            index = interface["index"]
+            attached.add(index)
+            if prepared[index]:
+                prepared[index] = self.attach_or_replace_network_interface(
+                    instance_id, interface, prepared[index], snapshot=snapshot
+                )
+
+        # Create (or reuse) ENIs concurrently, they do not depend on each other. ENIs are attached
+        # in device index order, each one as soon as it is prepared and the previous one is attached.
+        tasks: dict[str, tuple[Callable[[], Any], tuple[str, ...]]] = {}
+        previous: tuple[str, ...] = ()
+        for interface in interfaces:
+            tasks[f"prepare_{interface['index']}"] = (lambda interface=interface: prepare(interface), ())
+            tasks[f"attach_{interface['index']}"] = (
+                lambda interface=interface: attach(interface),
+                (f"prepare_{interface['index']}", *previous),
+            )
+            previous = (f"attach_{interface['index']}",)
+
+        try:
+            run_task_graph(tasks, max_workers=int(os.getenv("eni_max_workers", "4")))
+        except LifecycleStepDeferred:
+            # Prepared ENIs are tagged for the instance and reused by the resumed invocation
+            raise
+        except Exception:
+            # Launch is abandoned, do not leave behind ENIs which were prepared but never attached
+            for index, interface_id in prepared.items():
+                if interface_id and index not in attached:
+                    self.delete_interface(interface_id)
+            raise
+
+    def create_interface_settings(self, instance_zone: str) -> list[dict[str, Any]]:
         """
         This function normalize data with settings of each ENI.
 
+        Setting interfaces_config of the profile (environment variable by default) is either a dict availability zone -> subnet id
+        (single interface with device index 1 and security group from sgr_id) or a list of interfaces:
+        [{"index": 2, "subnets": {"<availability zone>": "<subnet id>"}, "sg": "<security group id>"}, ...],
+        where "sg" is optional and defaults to sgr_id.
+
         :param instance_zone: EC2 Instance availability zone
-        :return: list of dict with interface settings
+        :return: list of dict with interface settings, sorted by device index
         """
-        # Load network interfaces configuration from environment variable
-        subnets: dict[str, str] = json.loads(os.environ["interfaces_config"])
+        # Load network interfaces configuration of the Auto Scaling group
+        interfaces_config = json.loads(self.profile["interfaces_config"])
+        if isinstance(interfaces_config, dict):
+            interfaces_config = [{"index": 1, "subnets": interfaces_config}]
 
         # For each network interface, prepare settings in a propriate structure
-
-        return {
-            "index": 1,
-            "subnet": subnets[instance_zone],
-            "sg": os.environ["sgr_id"],
-        }
-
-    def inspect_ec2_instance(self, instance_id: str) -> tuple[Optional[str], Optional[str], Any]:
+        interfaces = [
+            {
+                "index": int(interface["index"]),
+                "subnet": interface["subnets"][instance_zone],
+                "sg": interface.get("sg") or self.profile["sgr_id"],
+            }
+            for interface in interfaces_config
+        ]
+        return sorted(interfaces, key=lambda interface: interface["index"])
+
+    @timed("inspect_instance")
+    def inspect_ec2_instance(self, instance_id: str) -> InstanceSnapshot:
         """
         Helper class used for return EC2 Instance data: AZ, subnets, network interfaces
 
         :param instance_id: EC2 Instance id.
-        :return: availability zone and subnet id of EC2 instance
+        :return: snapshot of EC2 instance with availability zone, subnet id and attached network interfaces
         """
 
         instance_info: dict = self.ec2_client.describe_instances(
             InstanceIds=[instance_id]
         )["Reservations"][0]["Instances"][0]
-        az = instance_info.get("Placement", {}).get("AvailabilityZone")
-        subnet_id = instance_info.get("SubnetId")
-        self.logger.info(f"Instance {instance_id} in AZ={az} Subnet={subnet_id}")
-        return (
-            az,
-            subnet_id,
-            instance_info.get("NetworkInterfaces"),
-        )
+        snapshot = InstanceSnapshot(instance_info)
+        self.logger.info(f"Instance {instance_id} in AZ={snapshot.availability_zone} Subnet={snapshot.subnet_id}")
+        return snapshot
 
+    def asg_name_tags(self, instance_id: Optional[str]) -> list[dict[str, str]]:
+        """
+        Return ENI tag with Auto Scaling group of the profile, none for warm pool ENIs (shared by groups).
+        """
+        if not instance_id or not self.profile.asg_name:
+            return []
+        return [{"Key": ASG_NAME_TAG, "Value": self.profile.asg_name}]
+
+    @timed("create_eni")
     def create_network_interface(
-        self, instance_id: str, subnet_id: str, sg_id: str, device_index: int
-    ) -> Optional[str]:
+        self, instance_id: Optional[str], subnet_id: str, sg_id: str, device_index: int
+    ) -> tuple[Optional[str], Optional[str]]:
         """
         As function name, it creates new ENI, if something wrong it catch error.
 
-        :param instance_id: EC2 Instance id
+        :param instance_id: EC2 Instance id, None to create ENI for warm pool
         :param subnet_id: Subnet id
         :param sg_id: Security group id
         :param device_index: ENI device index
-        :return: Network Interface id
+        :return: Network Interface id and its status reported on creation
         """
 
         self.logger.debug(
@@ -235,8 +1100,11 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
                         "ResourceType": "network-interface",
                         "Tags": [
                             {"Key": "ManagedBy", "Value": "vmseries-lambda"},
-                            {"Key": "InstanceId", "Value": instance_id},
                             {"Key": "DeviceIndex", "Value": str(device_index)},
+                            {"Key": "InstanceId", "Value": instance_id}
+                            if instance_id
+                            else {"Key": "WarmPool", "Value": "true"},
+                            *self.asg_name_tags(instance_id),
                         ],
                     }
                 ],
@@ -244,18 +1112,67 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             network_interface_id = network_interface["NetworkInterface"][
                 "NetworkInterfaceId"
             ]
-            self.logger.info(f"Created network interface: {network_interface_id}")
-            return network_interface_id
+            network_interface_status = network_interface["NetworkInterface"].get("Status")
+            self.logger.info(f"Created network interface: {network_interface_id} status={network_interface_status}")
+            return network_interface_id, network_interface_status
         except ClientError as e:
             self.logger.error(
                 f"Error creating network interface: {e.response['Error']['Code']}"
             )
         except Exception as e:
             self.logger.error(f"Unexpected error creating network interface: {e}")
-        return None
+        return None, None
+
+    @timed("eni_available_wait")
+    def wait_for_network_interface_available(self, interface_id: str) -> None:
+        """
+        Poll ENI status until it is available. Polling starts fast (eni_wait_initial_delay, default 0.25 s)
+        and backs off exponentially with jitter up to eni_wait_max_delay (default 2 s). Waiting is bounded
+        by eni_wait_timeout (default 20 s) and by the time left in the Lambda invocation. Lifecycle action heartbeat
+        is recorded once the wait takes longer than lifecycle_heartbeat_after (default 5 s).
+
+        :param interface_id: Network Interface id
+        :return: none, TimeoutError is raised if ENI is not available in time, LifecycleStepDeferred
+            if the invocation runs out of time first
+        """
+        delay = float(os.getenv("eni_wait_initial_delay", "0.25"))
+        max_delay = float(os.getenv("eni_wait_max_delay", "2"))
+        timeout = float(os.getenv("eni_wait_timeout", "20"))
+        # Keep a few seconds of the invocation for attaching the ENI and completing the lifecycle action
+        budget = min(timeout, remaining_time() - LIFECYCLE_RESERVE)
+        started = time.monotonic()
+        deadline = started + budget
+        heartbeat_after = started + float(os.getenv("lifecycle_heartbeat_after", "5"))
+        attempts = 0
+
+        while True:
+            time.sleep(max(0.0, min(random.uniform(delay / 2, delay), deadline - time.monotonic())))
+            attempts += 1
+            try:
+                status = self.ec2_client.describe_network_interfaces(
+                    NetworkInterfaceIds=[interface_id]
+                )["NetworkInterfaces"][0]["Status"]
+            except ClientError as e:
+                # Newly created ENI may not be visible yet (eventual consistency)
+                if e.response["Error"].get("Code") != "InvalidNetworkInterfaceID.NotFound":
+                    raise
+                status = "not-found"
+
+            if status == "available":
+                self.logger.debug(f"ENI {interface_id} is available after {attempts} polls.")
+                return
+            if time.monotonic() >= deadline:
+                if budget < timeout:
+                    self.checkpoint("eni")
+                raise TimeoutError(
+                    f"ENI {interface_id} not available after {attempts} polls in {budget:.1f}s (status={status})"
+                )
+            if time.monotonic() >= heartbeat_after:
+                self.heartbeat_before_long_wait()
+            delay = min(delay * 2, max_delay)
 
     def create_and_configure_new_network_interface(
-        self, instance_id: str, interface: dict[str, Any]
+        self, instance_id: str, interface: dict[str, Any], snapshot: Optional[InstanceSnapshot] = None
     ) -> None:
         """
         This function call create_network_interface for create new ENI and after that through att_network_interface
@@ -263,48 +1180,368 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
 
         :param instance_id: EC2 Instance id
         :param interface: Interface dict data
+        :param snapshot: instance data already described, used instead of describing attached ENIs again
         :return: none
         """
+        interface_id = self.prepare_network_interface(instance_id, interface, snapshot=snapshot)
+        if interface_id:
+            self.attach_or_replace_network_interface(instance_id, interface, interface_id, snapshot=snapshot)
+
+    def attach_or_replace_network_interface(
+        self,
+        instance_id: str,
+        interface: dict[str, Any],
+        interface_id: str,
+        snapshot: Optional[InstanceSnapshot] = None,
+    ) -> Optional[str]:
+        """
+        Attach prepared ENI to the instance. Warm pool ENI could have been reserved and attached by concurrent
+        launch as well, when attachment fails new ENI (not taken from warm pool) is prepared and attached once.
+
+        :param instance_id: EC2 Instance id
+        :param interface: Interface dict data
+        :param interface_id: prepared Network Interface id
+        :param snapshot: instance data already described, used instead of describing attached ENIs again
+        :return: id of the ENI prepared last, None if no ENI could be prepared
+        """
+        device_index = int(interface["index"])
+        if self.attach_prepared_network_interface(instance_id, interface_id, device_index):
+            return interface_id
+        interface_id = self.prepare_network_interface(instance_id, interface, snapshot=snapshot, use_warm_pool=False)
+        if interface_id:
+            self.attach_prepared_network_interface(instance_id, interface_id, device_index)
+        return interface_id
+
+    def prepare_network_interface(
+        self,
+        instance_id: str,
+        interface: dict[str, Any],
+        snapshot: Optional[InstanceSnapshot] = None,
+        use_warm_pool: bool = True,
+    ) -> Optional[str]:
+        """
+        Reuse, take from warm pool or create ENI for given interface settings and wait until it is available
+        for attachment.
+
+        :param instance_id: EC2 Instance id
+        :param interface: Interface dict data
+        :param snapshot: instance data already described, used instead of describing attached ENIs again
+        :param use_warm_pool: try to reserve pre-created ENI from warm pool before creating new one
+        :return: Network Interface id ready to attach, None if already attached or ENI could not be prepared
+        """
         # Idempotency: if the device index is already attached, do not create a duplicate ENI
         device_index = int(interface["index"])
-        existing_eni_id, existing_attachment_id = self.get_attached_eni_for_device_index(instance_id, device_index)
+        if snapshot is not None:
+            existing_eni_id, existing_attachment_id = snapshot.attached_eni(device_index)
+        else:
+            existing_eni_id, existing_attachment_id = self.get_attached_eni_for_device_index(instance_id, device_index)
         if existing_eni_id and existing_attachment_id:
             self.logger.info(
                 f"ENI already attached for instance {instance_id} device-index={device_index}: ENI={existing_eni_id} attachment={existing_attachment_id}. Skipping creation."
             )
-            self.ensure_delete_on_termination(existing_eni_id, existing_attachment_id)
-            return
+            if snapshot is not None and snapshot.delete_on_termination(device_index):
+                self.logger.debug(f"DeleteOnTermination already set for ENI={existing_eni_id}")
+            else:
+                self.modify_network_interface(existing_eni_id, existing_attachment_id)
+            return None
+
+        # Try to reuse previously created but unattached ENI (crash-safe idempotency)
+        interface_id = self.get_available_tagged_eni(instance_id, device_index)
+        interface_status = "available" if interface_id else None
+
+        # Try to take pre-created ENI from warm pool, it is available already
+        if not interface_id and use_warm_pool and int(self.profile.get("eni_warm_pool_size", "0")) > 0:
+            interface_id = self.claim_pooled_network_interface(instance_id, interface)
+            interface_status = "available" if interface_id else None
+
+        # If none found, create new ENI
+        if not interface_id:
+            interface_id, interface_status = self.create_network_interface(
+                instance_id,
+                interface["subnet"],
+                interface["sg"],
+                device_index=device_index,
+            )
+
+        if not interface_id:
+            self.logger.error(
+                f"Failed to obtain ENI for instance {instance_id} device-index={device_index}."
+            )
+            return None
+
+        # Wait until the ENI is available before attempting to attach
+        try:
+            if interface_status != "available":
+                self.wait_for_network_interface_available(interface_id)
+            self.logger.debug(f"ENI {interface_id} is now available.")
+        except LifecycleStepDeferred:
+            # ENI is tagged for the instance, resumed invocation waits for it again
+            raise
+        except Exception as e:
+            self.logger.error(
+                f"Error waiting for ENI {interface_id} to become available: {e}. Deleting ENI."
+            )
+            self.delete_interface(interface_id)
+            return None
+
+        return interface_id
+
+    @timed("warm_pool_claim")
+    def claim_pooled_network_interface(self, instance_id: str, interface: dict[str, Any]) -> Optional[str]:
+        """
+        Reserve available ENI from warm pool (matching subnet, security group and device index) for the instance:
+        it is re-tagged with InstanceId and removed from the pool, attaching is left to the attach step of the launch
+        flow (in device index order). Launches of one container never reserve the same ENI, but tags are no atomic
+        claim across containers: when several Lambdas reserve the same ENI, only one attachment succeeds, it re-tags
+        the ENI with its instance and the others attach a new ENI instead (see attach_or_replace_network_interface).
+
+        :param instance_id: EC2 Instance id
+        :param interface: Interface dict data
+        :return: reserved Network Interface id, None if warm pool has no usable ENI
+        """
+        device_index = int(interface["index"])
+        try:
+            resp = self.ec2_client.describe_network_interfaces(
+                Filters=[
+                    {"Name": "tag:ManagedBy", "Values": ["vmseries-lambda"]},
+                    {"Name": "tag:WarmPool", "Values": ["true"]},
+                    {"Name": "tag:DeviceIndex", "Values": [str(device_index)]},
+                    {"Name": "subnet-id", "Values": [interface["subnet"]]},
+                    {"Name": "group-id", "Values": [interface["sg"]]},
+                    {"Name": "status", "Values": ["available"]},
+                ]
+            )
+        except ClientError as e:
+            self.logger.error(f"Error searching warm pool ENIs: {e.response['Error'].get('Code')}")
+            return None
+
+        # Random order spreads concurrent claims of other containers over different ENIs
+        with _RESERVED_POOL_ENIS_LOCK:
+            candidates = [
+                ni["NetworkInterfaceId"]
+                for ni in resp.get("NetworkInterfaces", [])
+                if ni["NetworkInterfaceId"] not in _RESERVED_POOL_ENIS
+            ]
+        random.shuffle(candidates)
+        for interface_id in candidates[:3]:
+            with _RESERVED_POOL_ENIS_LOCK:
+                if interface_id in _RESERVED_POOL_ENIS:
+                    continue
+                _RESERVED_POOL_ENIS[interface_id] = None
+                while len(_RESERVED_POOL_ENIS) > 1000:
+                    _RESERVED_POOL_ENIS.popitem(last=False)
+            try:
+                self.ec2_client.create_tags(
+                    Resources=[interface_id],
+                    Tags=[{"Key": "InstanceId", "Value": instance_id}, *self.asg_name_tags(instance_id)],
+                )
+                self.ec2_client.delete_tags(Resources=[interface_id], Tags=[{"Key": "WarmPool"}])
+            except ClientError as e:
+                self.logger.info(
+                    f"Could not reserve warm pool ENI {interface_id}: {e.response['Error'].get('Code')}, trying next one"
+                )
+                continue
+
+            self.logger.info(
+                f"Reserved warm pool ENI {interface_id} for instance {instance_id} device-index={device_index}"
+            )
+            return interface_id
+
+        self.logger.info(f"No warm pool ENI available in subnet {interface['subnet']} for device-index={device_index}")
+        return None
+
+    def replenish_eni_pool(self) -> dict[str, int]:
+        """
+        Top up warm pool so every configured interface in every availability zone has eni_warm_pool_size
+        available ENIs. Missing ENIs are created concurrently. Invoked periodically by a scheduled event.
+
+        :return: dict subnet id -> number of ENIs created
+        """
+        target = int(self.profile.get("eni_warm_pool_size", "0"))
+        interfaces_config = json.loads(self.profile["interfaces_config"])
+        zones = interfaces_config if isinstance(interfaces_config, dict) else {
+            zone for interface in interfaces_config for zone in interface["subnets"]
+        }
+        wanted = [interface for zone in sorted(zones) for interface in self.create_interface_settings(zone)]
+
+        # Count available ENIs in the pool per (subnet, security group, device index)
+        pooled: dict[tuple[str, str, int], int] = {}
+        paginator = self.ec2_client.get_paginator("describe_network_interfaces")
+        pages = paginator.paginate(
+            Filters=[
+                {"Name": "tag:ManagedBy", "Values": ["vmseries-lambda"]},
+                {"Name": "tag:WarmPool", "Values": ["true"]},
+                {"Name": "status", "Values": ["available"]},
+            ]
+        )
+        for page in pages:
+            for ni in page.get("NetworkInterfaces", []):
+                tags = {tag["Key"]: tag["Value"] for tag in ni.get("TagSet", [])}
+                for group in ni.get("Groups", []):
+                    key = (ni["SubnetId"], group["GroupId"], int(tags.get("DeviceIndex", "0")))
+                    pooled[key] = pooled.get(key, 0) + 1
+
+        to_create = []
+        for interface in wanted:
+            missing = target - pooled.get((interface["subnet"], interface["sg"], interface["index"]), 0)
+            to_create.extend([interface] * max(0, missing))
+
+        created: dict[str, int] = {}
+        if to_create:
+            self.logger.info(f"Creating {len(to_create)} ENIs to replenish warm pool of size {target}")
+            max_workers = max(1, min(len(to_create), int(os.getenv("eni_max_workers", "4"))))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = pool.map(
+                    propagate_context(
+                        lambda interface: self.create_network_interface(
+                            None, interface["subnet"], interface["sg"], interface["index"]
+                        )[0]
+                    ),
+                    to_create,
+                )
+                for interface, interface_id in zip(to_create, results):
+                    if interface_id:
+                        created[interface["subnet"]] = created.get(interface["subnet"], 0) + 1
+        else:
+            self.logger.info(f"Warm pool is full (size {target})")
+        return created
+
+    def reconcile(self) -> dict[str, int]:
+        """
+        Bulk repair of state left behind by crashed invocations or lost lifecycle events, invoked periodically
+        by a scheduled event. In one pass:
+        - available ENIs managed by this Lambda (except warm pool) whose instance is not launching anymore
+          are deleted (concurrently),
+        - live instances are tagged with serial number registered in license manager for their management IP,
+        - license manager devices with management IP in mgmt_subnet_cidrs which is not used by any network
+          interface are de-licensed with a single Panorama commit (when fw_delicense is enabled).
+        De-licensing is skipped when more than reconcile_max_delicense (default 50) devices look dead,
+        as that points to misconfiguration rather than lost events.
+
+        :return: dict with numbers of deleted ENIs, de-licensed devices and tagged serials
+        """
+        result = {"OrphanedEnis": 0, "DeletedEnis": 0, "DeadDevices": 0, "DelicensedDevices": 0, "TaggedSerials": 0}
+
+        # Orphaned ENIs: not attached, not in warm pool and instance is gone or finished launching
+        live_instances = self.live_asg_instances()
+        orphans = []
+        for ni in self.describe_network_interfaces_paginated(
+            [
+                {"Name": "tag:ManagedBy", "Values": ["vmseries-lambda"]},
+                {"Name": "status", "Values": ["available"]},
+            ]
+        ):
+            tags = {tag["Key"]: tag["Value"] for tag in ni.get("TagSet", [])}
+            owner = tags.get(ASG_NAME_TAG)
+            if owner != self.profile.asg_name and (owner is not None or not self.profile.default):
+                # ENI of another group (ENIs without the tag predate profiles and belong to the default group)
+                continue
+            lifecycle_state = live_instances.get(tags.get("InstanceId", ""), "")
+            if tags.get("WarmPool") == "true" or lifecycle_state.startswith("Pending"):
+                continue
+            orphans.append(ni["NetworkInterfaceId"])
+        result["OrphanedEnis"] = len(orphans)
+
+        if orphans:
+            self.logger.info(f"Deleting {len(orphans)} orphaned ENIs: {orphans}")
+            max_workers = max(1, min(len(orphans), int(os.getenv("eni_max_workers", "4"))))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                result["DeletedEnis"] = sum(pool.map(propagate_context(self.delete_interface), orphans))
+
+        cidrs = [ipaddress.ip_network(cidr) for cidr in json.loads(self.profile.get("mgmt_subnet_cidrs", "[]"))]
+        panorama_config_secret_arn = self.profile.get("panorama_config")
+        if self.profile.get("fw_delicense") and panorama_config_secret_arn:
+            try:
+                panorama_config = self.get_secret_config(panorama_config_secret_arn)
+                devices = self.license_manager_devices(panorama_config)
+                # Serials of live firewalls, so their terminate skips device list lookup
+                result["TaggedSerials"] = self.record_serials(list(live_instances), devices)
+
+                # Stale licenses: devices whose management IP is not held by any network interface anymore
+                if cidrs:
+                    candidates = [ip for ip in devices if any(ipaddress.ip_address(ip) in cidr for cidr in cidrs)]
+                    in_use = {
+                        address["PrivateIpAddress"]
+                        for chunk_start in range(0, len(candidates), 200)
+                        for ni in self.describe_network_interfaces_paginated(
+                            [
+                                {
+                                    "Name": "addresses.private-ip-address",
+                                    "Values": candidates[chunk_start:chunk_start + 200],
+                                }
+                            ]
+                        )
+                        for address in ni.get("PrivateIpAddresses", [])
+                    }
+                    dead = [ip for ip in candidates if ip not in in_use]
+                    result["DeadDevices"] = len(dead)
 
-        # Try to reuse previously created but unattached ENI (crash-safe idempotency)
-        interface_id = self.get_available_tagged_eni(instance_id, device_index)
+                    max_delicense = int(os.getenv("reconcile_max_delicense", "50"))
+                    if len(dead) > max_delicense:
+                        self.logger.error(
+                            f"{len(dead)} licensed devices have no network interface, more than {max_delicense}. "
+                            f"Skipping de-licensing, check mgmt_subnet_cidrs: {dead}"
+                        )
+                    elif dead:
+                        self.logger.info(f"De-licensing {len(dead)} devices without network interface: {dead}")
+                        delicensed = self.delicense_fw_with_config(dead, panorama_config)
+                        result["DelicensedDevices"] = sum(delicensed.values())
+            except Exception as e:
+                if not is_panorama_unreachable(e):
+                    raise
+                # Licenses cannot be repaired while Panorama is down, next run picks them up
+                self.logger.warning(f"Panorama unavailable, skipping reconciliation of licenses: {e}")
 
-        # If none found, create new ENI
-        if not interface_id:
-            interface_id = self.create_network_interface(
-                instance_id,
-                interface["subnet"],
-                interface["sg"],
-                device_index=device_index,
-            )
+        self.logger.info(f"Reconciliation finished: {result}")
+        return result
 
-        if not interface_id:
-            self.logger.error(
-                f"Failed to obtain ENI for instance {instance_id} device-index={device_index}."
-            )
-            return
+    def live_asg_instances(self) -> dict[str, str]:
+        """
+        Return instances of Auto Scaling group of the profile (asg_name environment variable by default).
 
-        # Wait until the ENI is available before attempting to attach
-        try:
-            waiter = self.ec2_client.get_waiter("network_interface_available")
-            waiter.wait(NetworkInterfaceIds=[interface_id])
-            self.logger.debug(f"ENI {interface_id} is now available.")
-        except Exception as e:
-            self.logger.error(
-                f"Error waiting for ENI {interface_id} to become available: {e}. Deleting ENI."
-            )
-            self.delete_interface(interface_id)
-            return
+        :return: dict instance id -> lifecycle state, e.g. "Pending:Wait" or "InService"
+        """
+        asg_name = self.profile.asg_name
+        if not asg_name:
+            raise KeyError("asg_name")
+        instances: dict[str, str] = {}
+        groups = 0
+        paginator = self.asg_client.get_paginator("describe_auto_scaling_groups")
+        for page in paginator.paginate(AutoScalingGroupNames=[asg_name]):
+            for group in page.get("AutoScalingGroups", []):
+                groups += 1
+                for instance in group.get("Instances", []):
+                    instances[instance["InstanceId"]] = instance.get("LifecycleState", "")
+        if not groups:
+            # Without the group every managed ENI would look orphaned
+            raise RuntimeError(f"Auto Scaling group {asg_name} not found")
+        return instances
+
+    def describe_network_interfaces_paginated(self, filters: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Return all network interfaces matching server-side filters.
+
+        :param filters: describe_network_interfaces filters
+        :return: list of network interfaces
+        """
+        paginator = self.ec2_client.get_paginator("describe_network_interfaces")
+        return [
+            ni
+            for page in paginator.paginate(Filters=filters)
+            for ni in page.get("NetworkInterfaces", [])
+        ]
+
+    def attach_prepared_network_interface(self, instance_id: str, interface_id: str, device_index: int) -> bool:
+        """
+        Attach available ENI to the instance and set it to be deleted on instance termination.
+        ENI is deleted if it cannot be attached, unless it is attached to another instance already. Warm pool ENI
+        is re-tagged with the instance after attaching, as launches which lost the claim may have tagged it too.
 
+        :param instance_id: EC2 Instance id
+        :param interface_id: Network Interface id
+        :param device_index: ENI device index
+        :return: True if ENI was attached
+        """
         try:
             attachment_id = self.attach_network_interface(
                 instance_id, interface_id, device_index
@@ -313,10 +1550,29 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
                 self.modify_network_interface(interface_id, attachment_id)
             else:
                 raise RuntimeError("Attachment ID not returned.")
+        except NetworkInterfaceClaimLost:
+            return False
         except Exception as e:
             self.logger.error(f"Error attaching or modifying ENI: {e}")
             self.delete_interface(interface_id)
+            return False
+
+        with _RESERVED_POOL_ENIS_LOCK:
+            reserved = interface_id in _RESERVED_POOL_ENIS
+        if reserved:
+            try:
+                self.ec2_client.create_tags(
+                    Resources=[interface_id],
+                    Tags=[{"Key": "InstanceId", "Value": instance_id}, *self.asg_name_tags(instance_id)],
+                )
+            except ClientError as e:
+                self.logger.warning(
+                    f"Could not re-tag warm pool ENI {interface_id} for instance {instance_id}: "
+                    f"{e.response['Error'].get('Code')}"
+                )
+        return True
 
+    @timed("attach_eni")
     def attach_network_interface(
         self, instance_id: str, interface_id: str, index: int
     ) -> str:
@@ -326,7 +1582,8 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         :param instance_id: EC2 Instance id
         :param interface_id: Network Interface id
         :param index: ENI index number in EC2 instance
-        :return: none
+        :return: attachment id, empty string if ENI could not be attached (ENI is deleted)
+        :raises NetworkInterfaceClaimLost: ENI is attached to another instance, it is not deleted
         """
         attachment_id = ""
 
@@ -347,9 +1604,16 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
                 self.logger.info(f"Created network attachment: {attachment_id}")
                 return attachment_id
             except ClientError as e:
+                error_code = e.response["Error"]["Code"]
+                if error_code in ENI_IN_USE_ERROR_CODES:
+                    self.logger.warning(
+                        f"Network interface {interface_id} is attached to another instance ({error_code}),"
+                        f" claim lost. Keeping interface."
+                    )
+                    raise NetworkInterfaceClaimLost(interface_id) from e
                 self.delete_interface(interface_id)
                 self.logger.error(
-                    f"Error attaching network interface {interface_id}: {e.response['Error']['Code']}"
+                    f"Error attaching network interface {interface_id}: {error_code}"
                     f" Deleting interface."
                 )
             except Exception as e:
@@ -360,6 +1624,7 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
 
         return attachment_id
 
+    @timed("source_dest_check")
     def disable_source_dest_check(self, interface_id: str) -> None:
         """
         Network interfaces created by resource "aws_launch_template" by default have option
@@ -378,9 +1643,11 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             },
         )
 
+    @timed("modify_eni")
     def modify_network_interface(self, interface_id: str, attachment_id: str) -> None:
         """
-        This function modify ENI to be able to delete it on EC2 termination.
+        This function modify ENI to be able to delete it on EC2 termination (idempotent).
+        Used for both newly attached ENIs and ENIs found already attached, one call per ENI.
 
         :param interface_id: Network Interface id
         :param attachment_id: ENI attachment id
@@ -392,35 +1659,45 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         )
 
         # Modify ENI attribute in order to be able to delete it on EC2 terminations
-        self.ec2_client.modify_network_interface_attribute(
-            Attachment={"AttachmentId": attachment_id, "DeleteOnTermination": True},
-            NetworkInterfaceId=interface_id,
-        )
+        try:
+            self.ec2_client.modify_network_interface_attribute(
+                Attachment={"AttachmentId": attachment_id, "DeleteOnTermination": True},
+                NetworkInterfaceId=interface_id,
+            )
+        except ClientError as e:
+            self.logger.error(
+                f"Error setting DeleteOnTermination for ENI {interface_id}: {e.response['Error'].get('Code')}"
+            )
+            raise
 
-    def delete_interface(self, interface_id: str) -> None:
+    @timed("delete_eni")
+    def delete_interface(self, interface_id: str) -> bool:
         """
         This function is used when there was some problem with ENI attachment to EC2 Instance.
         Purpose of it is not creating unused resources.
 
         :param interface_id: Network Interface id
-        :return: none
+        :return: True if ENI was deleted
         """
 
         self.logger.info(f"Deleting interface with id={interface_id}")
         try:
             self.ec2_client.delete_network_interface(NetworkInterfaceId=interface_id)
+            return True
         except ClientError as e:
             self.logger.error(
                 f"Error deleting interface {interface_id}: {e.response['Error']['Code']}"
             )
+            return False
 
-    def complete_lifecycle(self, asg_event: dict[str, Any], result: str = "CONTINUE") -> None:
+    @timed("complete_lifecycle")
+    def complete_lifecycle(self, asg_event: dict[str, Any], result: str = "CONTINUE") -> bool:
         """
         Complete the ASG lifecycle action.
 
         :param asg_event: ASG event details
         :param result: CONTINUE or ABANDON
-        :return: none
+        :return: False if lifecycle action could not be completed and is still pending
         """
 
         self.logger.debug("DEBUG: complete")
@@ -434,10 +1711,13 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             self.logger.info(
                 f"Completed lifecycle action for ASG={asg_event.get('AutoScalingGroupName')} hook={asg_event.get('LifecycleHookName')} result={result}"
             )
+            return True
         except ClientError as e:
             self.logger.error(
                 f"Error completing life cycle hook for instance: {e.response['Error']['Code']}"
             )
+            # ValidationError: no active lifecycle action with the token, it was completed or timed out already
+            return e.response["Error"]["Code"] == "ValidationError"
 
     def ip_network_interface(self, instance_id: str, device_index: str) -> Optional[str]:
         """
@@ -448,48 +1728,260 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         :param instance_id: EC2 Instance id
         :return: none
         """
+        ip_address = self.ip_network_interfaces([instance_id], device_index).get(instance_id)
+        if not ip_address:
+            self.logger.warning(f"Could not find private IP for instance {instance_id} device {device_index}")
+        return ip_address
+
+    @timed("management_ip_lookup")
+    def ip_network_interfaces(self, instance_ids: list[str], device_index: str) -> dict[str, str]:
+        """
+        Get IP addresses of interfaces with given device index for many instances using one describe call
+        (per 200 instances, which is the limit of values in a single filter).
+
+        :param instance_ids: EC2 Instance ids
+        :param device_index: ENI device index
+        :return: dict instance id -> private IP address, instances without such interface are omitted
+        """
         self.logger.debug(
-            f"Looking up ENI for instance {instance_id} device-index={device_index}"
-        )
-        description = self.ec2_client.describe_network_interfaces(
-            Filters=[
-                {"Name": "attachment.instance-id", "Values": [instance_id]},
-                {"Name": "attachment.device-index", "Values": [device_index]},
-            ]
+            f"Looking up ENIs for instances {instance_ids} device-index={device_index}"
         )
-        try:
-            return description["NetworkInterfaces"][0]["PrivateIpAddress"]
-        except (IndexError, KeyError) as e:
-            self.logger.warning(f"Could not find private IP for instance {instance_id} device {device_index}: {e}")
-            return None
+        ip_addresses: dict[str, str] = {}
+        paginator = self.ec2_client.get_paginator("describe_network_interfaces")
+        for chunk_start in range(0, len(instance_ids), 200):
+            pages = paginator.paginate(
+                Filters=[
+                    {"Name": "attachment.instance-id", "Values": instance_ids[chunk_start:chunk_start + 200]},
+                    {"Name": "attachment.device-index", "Values": [device_index]},
+                ]
+            )
+            for page in pages:
+                for ni in page.get("NetworkInterfaces", []):
+                    instance_id = (ni.get("Attachment") or {}).get("InstanceId")
+                    if instance_id and ni.get("PrivateIpAddress"):
+                        ip_addresses[instance_id] = ni["PrivateIpAddress"]
+        return ip_addresses
+
+    @timed("license_identity")
+    def record_license_identity(self, snapshot: InstanceSnapshot) -> None:
+        """
+        Tag instance with management IP of VM-Series, so terminate finds it even when the ENI is already gone.
+        Serial number is not known at launch (firewall registers in license manager after boot),
+        it is tagged later by record_serials().
 
-    def panorama_cmd(
-        self, panorama: Panorama, cmd: str, xml: bool = True, cmd_xml: bool = True
-    ) -> Element:
+        :param snapshot: instance data described at the beginning of the invocation
+        :return: none
+        """
+        instance_id = snapshot.instance_id
+        # Snapshot was taken before interfaces were attached, so the IP is usually looked up
+        ip_address = snapshot.private_ip(1) or self.ip_network_interface(instance_id, "1")
+        if not ip_address or snapshot.tags.get(MANAGEMENT_IP_TAG) == ip_address:
+            return
+        self.logger.info(f"Recording management IP {ip_address} of instance {instance_id}")
+        self.ec2_client.create_tags(Resources=[instance_id], Tags=[{"Key": MANAGEMENT_IP_TAG, "Value": ip_address}])
+
+    def instance_identity_tags(self, instance_ids: list[str]) -> dict[str, dict[str, str]]:
+        """
+        Get license identity tags of many instances using one describe call (per 200 instances).
+
+        :param instance_ids: EC2 Instance ids
+        :return: dict instance id -> {tag key: value}, instances without identity tags are omitted
+        """
+        tags: dict[str, dict[str, str]] = {}
+        paginator = self.ec2_client.get_paginator("describe_tags")
+        for chunk_start in range(0, len(instance_ids), 200):
+            pages = paginator.paginate(
+                Filters=[
+                    {"Name": "resource-id", "Values": instance_ids[chunk_start:chunk_start + 200]},
+                    {"Name": "key", "Values": [MANAGEMENT_IP_TAG, SERIAL_TAG]},
+                ]
+            )
+            for page in pages:
+                for tag in page.get("Tags", []):
+                    tags.setdefault(tag["ResourceId"], {})[tag["Key"]] = tag["Value"]
+        return tags
+
+    def record_serials(self, instance_ids: list[str], devices: dict[str, str]) -> int:
+        """
+        Tag instances with serial number registered in license manager for their recorded management IP.
+
+        :param instance_ids: EC2 Instance ids
+        :param devices: license manager index, management IP -> serial number
+        :return: number of instances tagged
+        """
+        tagged = 0
+        for instance_id, tags in self.instance_identity_tags(instance_ids).items():
+            serial = devices.get(tags.get(MANAGEMENT_IP_TAG, ""))
+            if serial and tags.get(SERIAL_TAG) != serial:
+                self.logger.info(f"Recording serial {serial} of instance {instance_id}")
+                self.ec2_client.create_tags(Resources=[instance_id], Tags=[{"Key": SERIAL_TAG, "Value": serial}])
+                tagged += 1
+        return tagged
+
+    def panorama_cmd(self, panorama: "Panorama", cmd: str, cmd_xml: bool = True, operation: str = "Op") -> "Element":
         """
         Helper function used for call command to Panorama.
 
         :param panorama: Panorama object
         :param cmd: command send further to Panorama
-        :param xml: (bool) Return value should be a string
         :param cmd_xml: (bool) True: cmd is not XML, False: cmd is XML
+        :param operation: name the call is accounted under in event metrics
         :return: Output of executed command
         """
         self.logger.info(f"Call Panorama with: '{cmd}' command.")
-        request = panorama.op(cmd=cmd, xml=xml, cmd_xml=cmd_xml)
-        return et.fromstring(request)
+        # Response is already parsed by panos, request the element instead of serializing and parsing it again
+        return self.retry_on_expired_key(
+            panorama, lambda: panorama.op(cmd=cmd, xml=False, cmd_xml=cmd_xml), operation
+        )
+
+    @timed("panorama_device_list")
+    def get_license_manager_devices(
+        self, panorama: "Panorama", panorama_lm_name: str, refresh: bool = False
+    ) -> dict[str, str]:
+        """
+        Return index of devices registered in license manager: management IP -> serial number.
+        Index is cached in the Lambda container for panorama_device_index_ttl seconds (default 60, 0 disables cache).
+
+        :param panorama: Panorama object
+        :param panorama_lm_name: License manager name
+        :param refresh: ignore cached index
+        :return: dict management IP -> serial number
+        """
+        key = (panorama.hostname, panorama_lm_name)
+        cached = _DEVICE_INDEX_CACHE.get(key)
+        if cached and not refresh and cached[0] > time.monotonic():
+            self.logger.debug(f"Using cached device list of license manager '{panorama_lm_name}'")
+            return cached[1]
+
+        cmd = f'show plugins sw_fw_license devices license-manager "{panorama_lm_name}"'
+        self.logger.info(f"Call Panorama with: '{cmd}' command.")
+        devices = self.retry_on_expired_key(
+            panorama, lambda: stream_license_manager_devices(panorama, cmd), "ShowDevices"
+        )
+        self.logger.info(f"License manager '{panorama_lm_name}' has {len(devices)} devices")
+
+        ttl = float(os.getenv("panorama_device_index_ttl", "60"))
+        if ttl > 0:
+            with _DEVICE_INDEX_CACHE_LOCK:
+                _DEVICE_INDEX_CACHE[key] = (time.monotonic() + ttl, devices)
+        return devices
+
+    def retry_on_expired_key(self, panorama: "Panorama", call: Callable[[], T], operation: str = "Op") -> T:
+        """
+        Run Panorama API call, if API key is rejected generate new one and repeat the call once.
+        The call is accounted in event metrics as "panorama.<operation>", key generation as "panorama.Keygen".
+        Calls go through circuit breaker of the Panorama, while it is open they fail fast with PanoramaUnavailableError.
+        Calls sharing the Panorama session are serialized by its lock. Each call (and waiting for the lock) is limited
+        by panorama_api_timeout and by the time left in the invocation minus LIFECYCLE_RESERVE, so a hung Panorama
+        fails the call and counts for the circuit breaker before the Lambda times out.
+
+        :param panorama: Panorama object used by the call
+        :param call: function doing the API call
+        :param operation: name the call is accounted under
+        :return: result of the call
+        """
+        endpoint = f"{panorama.hostname}:{panorama.port}"
+        if not PANORAMA_BREAKER.allow(endpoint):
+            record_count("PanoramaCircuitOpen")
+            raise PanoramaUnavailableError(
+                f"Panorama {panorama.hostname} is unavailable (circuit breaker open after repeated failures)"
+            )
+        lock = panorama_session_lock(panorama)
+        budget = remaining_time() - LIFECYCLE_RESERVE
+        if not lock.acquire(timeout=-1 if budget == float("inf") else max(0.0, budget)):
+            # Session is held by a call hanging on unreachable Panorama, which records the failure itself
+            PANORAMA_BREAKER.cancel(endpoint)
+            raise PanoramaUnavailableError(f"Panorama {panorama.hostname} did not answer previous call in time")
+        try:
+            timeout = min(
+                float(os.getenv("panorama_api_timeout", DEFAULT_PANORAMA_API_TIMEOUT)),
+                remaining_time() - LIFECYCLE_RESERVE,
+            )
+            if timeout < 1:
+                # Not a failure of Panorama: the invocation has no time left for the call
+                PANORAMA_BREAKER.cancel(endpoint)
+                raise PanoramaUnavailableError(f"No time left in the invocation for call to Panorama {panorama.hostname}")
+            set_panorama_timeout(panorama, int(timeout))
+            try:
+                result = self.call_with_key(panorama, call, operation)
+            except Exception as e:
+                if PANORAMA_BREAKER.record(endpoint, not is_panorama_unreachable(e)) == "open":
+                    self.logger.warning(f"Panorama {panorama.hostname} unreachable, opening circuit breaker: {e}")
+                raise
+        finally:
+            lock.release()
+        if PANORAMA_BREAKER.record(endpoint, True) == "closed":
+            self.logger.info(f"Panorama {panorama.hostname} reachable again, closing circuit breaker")
+        return result
+
+    def call_with_key(self, panorama: "Panorama", call: Callable[[], T], operation: str) -> T:
+        """
+        Run Panorama API call with generated API key, on rejected key generate new one and repeat the call once.
 
-    def get_secret_config(self, secret_arn: str) -> dict[str, Any]:
+        :param panorama: Panorama object used by the call
+        :param call: function doing the API call
+        :param operation: name the call is accounted under
+        :return: result of the call
+        """
+        attempts, seconds, failed = 0, 0.0, True
+        try:
+            while True:
+                generate_panorama_key(panorama)
+                api_key = panorama._api_key
+                started = time.monotonic()
+                attempts += 1
+                try:
+                    result = call()
+                    failed = False
+                    return result
+                except Exception as e:
+                    if attempts > 1 or not is_panorama_auth_error(e):
+                        raise
+                    self.logger.info(f"API key rejected by Panorama {panorama.hostname}, generating new key: {e}")
+                    rekey_panorama_session(panorama, api_key)
+                finally:
+                    seconds += time.monotonic() - started
+        finally:
+            if attempts:
+                record_panorama_call(operation, seconds, attempts - 1, failed)
+
+    @timed("secret")
+    def get_secret_config(self, secret_arn: str, force_refresh: bool = False) -> dict[str, Any]:
         """
-        Helper function to check config parameter in Secrets Manager
+        Helper function to check config parameter in Secrets Manager.
+        Value is cached in the Lambda container for secret_cache_ttl seconds (default 300, 0 disables cache).
 
         :secret_name: Secret name
+        :param force_refresh: ignore cached value, e.g. after Panorama rejected credentials
         :return: dict
         """
-        secret_param_list = self.secret_client.get_secret_value(SecretId=secret_arn)
-        return json.loads(secret_param_list["SecretString"])
+        version_stage = os.getenv("secret_version_stage", "AWSCURRENT")
+        ttl = float(os.getenv("secret_cache_ttl", "300"))
+        key = (secret_arn, version_stage)
+
+        cached = _SECRET_CACHE.get(key)
+        if cached and not force_refresh and cached[0] > time.monotonic():
+            self.logger.debug(f"Using cached secret {secret_arn} version {cached[1]}")
+            return cached[2]
+
+        # Secret of a profile can live in another region than the Lambda, its ARN tells which one
+        arn_parts = secret_arn.split(":")
+        secret_client = get_client("secretsmanager", arn_parts[3]) if len(arn_parts) > 3 else self.secret_client
+        secret_param_list = secret_client.get_secret_value(
+            SecretId=secret_arn, VersionStage=version_stage
+        )
+        version_id = secret_param_list.get("VersionId", "")
+        if force_refresh and cached and cached[1] == version_id:
+            self.logger.warning(
+                f"Secret {secret_arn} refreshed, but {version_stage} version {version_id} did not change"
+            )
+        value = json.loads(secret_param_list["SecretString"])
+        if ttl > 0:
+            with _SECRET_CACHE_LOCK:
+                _SECRET_CACHE[key] = (time.monotonic() + ttl, version_id, value)
+        return value
 
-    def delicense_fw(self, instance_id: str) -> bool:
+    def delicense_fw(self, instance_id: str, snapshot: Optional[InstanceSnapshot] = None) -> bool:
         """
         Function used to de-license VM-Series using plugin sw_fw_license.
         In order to deactivate license used by VM-Series with specified IP address, below steps are done:
@@ -498,27 +1990,182 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         - de-license only this serial number, which is matching specified IP address
 
         :param instance_id: EC2 Instance id
+        :param snapshot: instance data already described, used to find management IP without another EC2 call
         :return: True if VM-Series was de-licensed correctly, False in other case
         """
-        delicensed = False
+        snapshots = {instance_id: snapshot} if snapshot is not None else None
+        return self.delicense_fw_batch([instance_id], snapshots=snapshots)[instance_id]
 
-        # Find IP address of VM-Series instance managed by Panorama
-        vmseries_ip_address = self.ip_network_interface(instance_id, "1")
-        # If IP address not found, quit
-        if not vmseries_ip_address:
-            self.logger.warning(f"No management IP found for instance {instance_id}, skipping delicensing.")
-            return False
+    @timed("delicense")
+    def delicense_fw_batch(
+        self, instance_ids: list[str], snapshots: Optional[dict[str, InstanceSnapshot]] = None
+    ) -> dict[str, bool]:
+        """
+        De-license many VM-Series at once: management IPs are looked up with one describe call,
+        license manager device list is fetched once and changes are committed in Panorama once.
 
-        self.logger.debug(
-            f"Found VM-Series ID: {instance_id} with IP: {vmseries_ip_address} "
-        )
+        :param instance_ids: EC2 Instance ids
+        :param snapshots: instance data already described, IPs of other instances are looked up in EC2
+        :return: dict instance id -> True if VM-Series was de-licensed correctly, False in other case
+        """
+        results = {instance_id: False for instance_id in instance_ids}
+
+        # Find IP addresses (and serials when known) of VM-Series instances from identity recorded in tags,
+        # management interface is looked up only for instances without them
+        snapshots = snapshots or {}
+        tags = {instance_id: snapshots[instance_id].tags for instance_id in instance_ids if instance_id in snapshots}
+        not_described = [instance_id for instance_id in instance_ids if instance_id not in snapshots]
+        if not_described:
+            tags.update(self.instance_identity_tags(not_described))
+        ip_addresses: dict[str, str] = {}
+        serials: dict[str, str] = {}
+        for instance_id in instance_ids:
+            instance_tags = tags.get(instance_id, {})
+            ip_address = instance_tags.get(MANAGEMENT_IP_TAG)
+            if not ip_address and instance_id in snapshots:
+                ip_address = snapshots[instance_id].private_ip(1)
+            if ip_address:
+                ip_addresses[instance_id] = ip_address
+                if instance_tags.get(SERIAL_TAG):
+                    serials[ip_address] = instance_tags[SERIAL_TAG]
+        not_found = [instance_id for instance_id in not_described if instance_id not in ip_addresses]
+        if not_found:
+            ip_addresses.update(self.ip_network_interfaces(not_found, "1"))
+        for instance_id in instance_ids:
+            if instance_id not in ip_addresses:
+                # If IP address not found, skip instance
+                self.logger.warning(f"No management IP found for instance {instance_id}, skipping delicensing.")
+            else:
+                self.logger.debug(
+                    f"Found VM-Series ID: {instance_id} with IP: {ip_addresses[instance_id]} "
+                )
+        if not ip_addresses:
+            return results
+
+        try:
+            delicensed = self.delicense_ip_addresses(list(ip_addresses.values()), serials)
+        except PanoramaUnavailableError as e:
+            # Lifecycle action is completed without waiting for Panorama, de-licensing is retried from queue
+            self.logger.warning(f"{e}. Deferring de-licensing of instances {list(ip_addresses)}.")
+            self.defer_delicense(ip_addresses, serials)
+            return results
+
+        for instance_id, ip_address in ip_addresses.items():
+            results[instance_id] = delicensed.get(ip_address, False)
+        return results
+
+    def delicense_ip_addresses(self, vmseries_ip_addresses: list[str], serials: dict[str, str]) -> dict[str, bool]:
+        """
+        De-license VM-Series with provided management IPs using Panorama config secret of the profile.
+        If Panorama rejects cached credentials, the secret is refreshed and de-licensing is retried once.
+
+        :param vmseries_ip_addresses: IP addresses of the MGMT interface for VM-Series
+        :param serials: known serial numbers, management IP -> serial
+        :return: dict IP address -> True if VM-Series was de-licensed correctly, False in other case
+        """
+        delicensed = {ip_address: False for ip_address in vmseries_ip_addresses}
 
         # Get setting required to connect to Panorama
-        panorama_config_secret_arn = os.getenv("panorama_config")
+        panorama_config_secret_arn = self.profile.get("panorama_config")
         if not panorama_config_secret_arn:
             self.logger.error("Panorama config not found. Please check configuration")
-            return False
-        panorama_config = self.get_secret_config(panorama_config_secret_arn)
+            return delicensed
+
+        try:
+            panorama_config = self.get_secret_config(panorama_config_secret_arn)
+            return self.delicense_fw_with_config(vmseries_ip_addresses, panorama_config, serials=serials)
+        except PanoramaAuthError as e:
+            # Credentials could have been rotated since they were cached, retry once with fresh secret
+            self.logger.warning(f"{e}. Refreshing Panorama config secret and retrying.")
+            panorama_config = self.get_secret_config(panorama_config_secret_arn, force_refresh=True)
+            try:
+                return self.delicense_fw_with_config(vmseries_ip_addresses, panorama_config, serials=serials)
+            except PanoramaAuthError as retry_error:
+                self.logger.error(f"{retry_error}. Giving up de-licensing of {vmseries_ip_addresses}.")
+                return delicensed
+
+    def defer_delicense(self, ip_addresses: dict[str, str], serials: dict[str, str]) -> None:
+        """
+        Park de-licensing of terminated VM-Series in retry queue (delicense_retry_queue_url environment variable)
+        while Panorama is unavailable. Queue is drained by the Lambda in batches (run_deferred_delicense),
+        messages stay in it until Panorama is reachable again.
+
+        :param ip_addresses: dict instance id -> management IP
+        :param serials: known serial numbers, management IP -> serial
+        :return: none
+        """
+        queue_url = os.getenv("delicense_retry_queue_url")
+        if not queue_url:
+            self.logger.error(
+                f"De-licensing retry queue not configured, licenses of instances {list(ip_addresses)} are not released"
+            )
+            return
+
+        entries = [
+            {
+                "Id": str(number),
+                "MessageBody": json.dumps(
+                    {
+                        "action": "delicense",
+                        "region": self.profile.region,
+                        "detail": {
+                            "AutoScalingGroupName": self.profile.asg_name,
+                            "EC2InstanceId": instance_id,
+                            "ManagementIp": ip_address,
+                            "Serial": serials.get(ip_address),
+                        },
+                    }
+                ),
+            }
+            for number, (instance_id, ip_address) in enumerate(ip_addresses.items())
+        ]
+        sqs_client = get_client("sqs")
+        # SendMessageBatch takes at most 10 messages
+        for start in range(0, len(entries), 10):
+            response = sqs_client.send_message_batch(QueueUrl=queue_url, Entries=entries[start:start + 10])
+            if response.get("Failed"):
+                raise RuntimeError(f"Failed to queue deferred de-licensing: {response['Failed']}")
+        record_count("DelicenseDeferred", len(entries))
+        self.logger.info(f"De-licensing of instances {list(ip_addresses)} queued for retry")
+
+    def license_manager_devices(self, panorama_config: dict[str, Any]) -> dict[str, str]:
+        """
+        Fetch device list of license manager from active Panorama. Index is refreshed in the container cache,
+        so following de-licensing of the same Panorama does not fetch it again.
+
+        :param panorama_config: Panorama settings (credentials, hostnames, license manager)
+        :return: dict management IP -> serial number
+        """
+        panorama_username = panorama_config.get("username")
+        panorama_password = panorama_config.get("password")
+        panorama_hostname = panorama_config.get("panorama1")
+        panorama_lm_name = panorama_config.get("license_manager")
+        if not (panorama_username and panorama_password and panorama_hostname and panorama_lm_name):
+            raise ValueError("Missing required Panorama configuration fields")
+
+        if panorama_config.get("panorama2"):
+            panorama_hostname, _ = self.get_active_panorama(
+                panorama_hostname, panorama_config["panorama2"], panorama_username, panorama_password
+            )
+        panorama = get_panorama_session(panorama_hostname, panorama_username, panorama_password)
+        return self.get_license_manager_devices(panorama, panorama_lm_name, refresh=True)
+
+    def delicense_fw_with_config(
+        self,
+        vmseries_ip_addresses: list[str],
+        panorama_config: dict[str, Any],
+        serials: Optional[dict[str, str]] = None,
+    ) -> dict[str, bool]:
+        """
+        De-license VM-Series with provided management IPs using Panorama settings from config secret.
+        PanoramaUnavailableError is raised when the (active) Panorama cannot be reached.
+
+        :param vmseries_ip_addresses: IP addresses of the MGMT interface for VM-Series
+        :param panorama_config: Panorama settings (credentials, hostnames, license manager)
+        :param serials: known serial numbers, management IP -> serial, other IPs are looked up in device list
+        :return: dict IP address -> True if VM-Series was de-licensed correctly, False in other case
+        """
+        delicensed = {ip_address: False for ip_address in vmseries_ip_addresses}
         panorama_username = panorama_config.get("username")
         panorama_password = panorama_config.get("password")
         panorama_hostname = panorama_config.get("panorama1")
@@ -538,43 +2185,166 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             self.logger.error(
                 f"Missing required Panorama configuration fields: {', '.join(missing_fields)}"
             )
-            return False
+            return delicensed
 
         # Check if there is defined 2 Panorama server
         if "panorama2" in panorama_config:
-            # Check if first Panorama is active - if not, the use second Panorama for de-licensing
-            if self.check_is_active_in_ha(
-                panorama_hostname, panorama_username, panorama_password
-            ):
-                # De-license using active, first Panorama instance from Active-Passive HA cluster
-                delicensed = self.request_panorama_delicense_fw(
-                    vmseries_ip_address,
-                    panorama_hostname,
+            # De-license using active Panorama instance from Active-Passive HA cluster
+            self.checkpoint("panorama_ha_probe")
+            active_hostname, from_cache = self.get_active_panorama(
+                panorama_hostname, panorama_hostname2, panorama_username, panorama_password
+            )
+            unavailable: Optional[PanoramaUnavailableError] = None
+            try:
+                delicensed = self.request_panorama_delicense_batch(
+                    vmseries_ip_addresses,
+                    active_hostname,
                     panorama_username,
                     panorama_password,
                     panorama_lm_name,
+                    serials=serials,
                 )
-            else:
-                # De-license using active, second Panorama instance from Active-Passive HA cluster
-                delicensed = self.request_panorama_delicense_fw(
-                    vmseries_ip_address,
-                    panorama_hostname2,
-                    panorama_username,
-                    panorama_password,
-                    panorama_lm_name,
+            except PanoramaUnavailableError as e:
+                # Cached active peer could have gone down while the other peer took over
+                if not from_cache:
+                    raise
+                unavailable = e
+            failed = [ip_address for ip_address, result in delicensed.items() if not result]
+            if failed and from_cache:
+                # Cached peer could be stale after failover or outage - probe again and retry if active peer changed
+                invalidate_active_panorama(panorama_hostname, panorama_hostname2)
+                new_active_hostname, _ = self.get_active_panorama(
+                    panorama_hostname, panorama_hostname2, panorama_username, panorama_password
                 )
+                if new_active_hostname == active_hostname and unavailable is not None:
+                    raise unavailable
+                if new_active_hostname != active_hostname:
+                    self.logger.info(
+                        f"Active Panorama changed from {active_hostname} to {new_active_hostname}, retrying"
+                    )
+                    delicensed.update(
+                        self.request_panorama_delicense_batch(
+                            failed,
+                            new_active_hostname,
+                            panorama_username,
+                            panorama_password,
+                            panorama_lm_name,
+                            serials=serials,
+                        )
+                    )
         else:
             # De-license using the only 1 Panorama instance
-            delicensed = self.request_panorama_delicense_fw(
-                vmseries_ip_address,
+            delicensed = self.request_panorama_delicense_batch(
+                vmseries_ip_addresses,
                 panorama_hostname,
                 panorama_username,
                 panorama_password,
                 panorama_lm_name,
+                serials=serials,
             )
 
         return delicensed
 
+    @timed("panorama_ha_probe")
+    def get_active_panorama(
+        self,
+        panorama_hostname: str,
+        panorama_hostname2: str,
+        panorama_username: str,
+        panorama_password: str,
+    ) -> tuple[str, bool]:
+        """
+        Return hostname of the active Panorama in HA pair. Peer which reported active state is cached in the Lambda
+        container for panorama_ha_cache_ttl seconds (default 300, 0 disables cache). Peer guessed when no peer
+        reported active state is cached only for panorama_ha_fallback_ttl seconds (default 5), so the pair is probed
+        again soon instead of sending de-licensing to a passive or dead peer for the whole cache period.
+
+        :param panorama_hostname: Hostname of the first Panorama server
+        :param panorama_hostname2: Hostname of the second Panorama server
+        :param panorama_username: Account's name
+        :param panorama_password: Account's password
+        :return: active Panorama hostname and True if it was taken from cache
+        """
+        key = (panorama_hostname, panorama_hostname2 or "")
+        cached = _HA_ACTIVE_CACHE.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.logger.info(f"Using cached active Panorama {cached[1]}")
+            return cached[1], True
+
+        active_hostname, verified = self.probe_active_panorama(
+            panorama_hostname, panorama_hostname2, panorama_username, panorama_password
+        )
+
+        if verified:
+            ttl = float(os.getenv("panorama_ha_cache_ttl", "300"))
+        else:
+            ttl = float(os.getenv("panorama_ha_fallback_ttl", "5"))
+        if ttl > 0:
+            with _HA_ACTIVE_CACHE_LOCK:
+                _HA_ACTIVE_CACHE[key] = (time.monotonic() + ttl, active_hostname)
+        return active_hostname, False
+
+    def probe_active_panorama(
+        self,
+        panorama_hostname: str,
+        panorama_hostname2: str,
+        panorama_username: str,
+        panorama_password: str,
+    ) -> tuple[str, bool]:
+        """
+        Probe HA state of both Panorama peers concurrently, first peer reporting active state wins.
+        Probing is bounded by panorama_ha_probe_timeout (default 10 s) and by the time left in the Lambda
+        invocation, so an unreachable peer costs at most the deadline instead of its connection timeout.
+        Probe still running when winner is known (or deadline passes) is not waited for, its result is dropped.
+
+        :param panorama_hostname: Hostname of the first Panorama server
+        :param panorama_hostname2: Hostname of the second Panorama server
+        :param panorama_username: Account's name
+        :param panorama_password: Account's password
+        :return: hostname of active Panorama and True if it reported active state, second Panorama and False
+            if no peer reported active state in time
+        """
+        # Keep a few seconds of the invocation for de-licensing and completing the lifecycle action
+        budget = max(
+            0.0, min(float(os.getenv("panorama_ha_probe_timeout", "10")), remaining_time() - LIFECYCLE_RESERVE)
+        )
+        hostnames = [hostname for hostname in (panorama_hostname, panorama_hostname2) if hostname]
+        active_hostname = None
+        auth_error: Optional[PanoramaAuthError] = None
+
+        pool = ThreadPoolExecutor(max_workers=len(hostnames))
+        futures = {
+            pool.submit(
+                propagate_context(self.check_is_active_in_ha), hostname, panorama_username, panorama_password
+            ): hostname
+            for hostname in hostnames
+        }
+        try:
+            for future in as_completed(futures, timeout=budget):
+                try:
+                    if future.result():
+                        active_hostname = futures[future]
+                        break
+                except PanoramaAuthError as e:
+                    auth_error = e
+        except FutureTimeoutError:
+            pending = [hostname for future, hostname in futures.items() if not future.done()]
+            self.logger.warning(f"Panorama {', '.join(pending)} did not report HA state in {budget:.1f}s")
+        finally:
+            # Do not wait for the late (or unreachable) peer, probes not started yet are dropped
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+        if active_hostname is None:
+            if auth_error is not None:
+                raise auth_error
+            active_hostname = panorama_hostname2 or panorama_hostname
+            self.logger.warning(f"No Panorama reported active HA state, using {active_hostname}")
+            return active_hostname, False
+        self.logger.info(f"Panorama {active_hostname} is active in HA cluster")
+        return active_hostname, True
+
     def check_is_active_in_ha(
         self, panorama_hostname: str, panorama_username: str, panorama_password: str
     ) -> bool:
@@ -594,15 +2364,13 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             self.logger.info(
                 f"Connecting to '{panorama_hostname}' using user '{panorama_username}'"
             )
-            panorama = Panorama(
-                hostname=panorama_hostname,
-                api_username=panorama_username,
-                api_password=panorama_password,
+            panorama = get_panorama_session(
+                panorama_hostname, panorama_username, panorama_password
             )
 
             # Check high-availability state
             cmd = "show high-availability state"
-            firewalls_parsed = self.panorama_cmd(panorama, cmd=cmd)
+            firewalls_parsed = self.panorama_cmd(panorama, cmd=cmd, operation="ShowHaState")
 
             # Check if in active state (robust XML parsing)
             state_element = firewalls_parsed.find(".//local-info/state")
@@ -616,11 +2384,48 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
             # Return high-availability state
             return active
         except Exception as e:
+            if is_panorama_auth_error(e):
+                raise PanoramaAuthError(f"Panorama {panorama_hostname} rejected credentials: {e}") from e
             self.logger.info(
                 f"Error while checking high-availability state for Panorama {panorama_hostname}: {e}"
             )
             return False
 
+    @timed("panorama_deactivate")
+    def deactivate_device(self, panorama: "Panorama", panorama_lm_name: str, ip_address: str, serial: str) -> bool:
+        """
+        Deactivate license of device in license manager, changes have to be committed.
+
+        :param panorama: Panorama object
+        :param panorama_lm_name: License manager name
+        :param ip_address: management IP of the device
+        :param serial: serial number of the device
+        :return: True if device was deactivated
+        """
+        self.logger.info(f"De-licensing firewall: {serial} ...")
+        cmd = f'request plugins sw_fw_license deactivate license-manager "{panorama_lm_name}" devices member "{serial}"'
+        try:
+            status = self.panorama_cmd(panorama, cmd, operation="Deactivate").attrib.get("status")
+        except Exception as e:
+            if is_panorama_auth_error(e) or is_panorama_unreachable(e):
+                raise
+            # Error response (e.g. serial not registered) fails only this device
+            self.logger.info(f"De-licensing firewall: {serial} rejected by Panorama: {e}")
+            status = "error"
+        if status != "success":
+            self.logger.info(f"De-licensing firewall: {serial} failed")
+            # Cached index could be stale, next request has to fetch device list again
+            invalidate_device_index(panorama.hostname, panorama_lm_name)
+            return False
+
+        self.logger.info(f"De-licensing firewall: {serial} succeeded")
+        # Management IP can be reused by a new VM-Series, drop it from cached index
+        with _DEVICE_INDEX_CACHE_LOCK:
+            cached = _DEVICE_INDEX_CACHE.get((panorama.hostname, panorama_lm_name))
+            if cached:
+                cached[1].pop(ip_address, None)
+        return True
+
     def request_panorama_delicense_fw(
         self,
         vmseries_ip_address: str,
@@ -638,80 +2443,230 @@ class VMSeriesInterfaceScaling(ConfigureLogger):
         :param panorama_password: Account's password
         :return: True if VM-Series was de-licensed correctly, False in other case
         """
-        try:
-            # Set status of delicensing
-            delicensed = False
+        return self.request_panorama_delicense_batch(
+            [vmseries_ip_address],
+            panorama_hostname,
+            panorama_username,
+            panorama_password,
+            panorama_lm_name,
+        )[vmseries_ip_address]
+
+    def request_panorama_delicense_batch(
+        self,
+        vmseries_ip_addresses: list[str],
+        panorama_hostname: str,
+        panorama_username: str,
+        panorama_password: str,
+        panorama_lm_name: str,
+        serials: Optional[dict[str, str]] = None,
+    ) -> dict[str, bool]:
+        """
+        Function used to de-license many VM-Series using plugin sw_fw_license running on Panorama server.
+        Device list is fetched at most once (not at all when all serials are known) and a single commit is done
+        for the whole batch. PanoramaUnavailableError is raised when Panorama cannot be reached, so the caller
+        can defer de-licensing instead of reporting the devices as failed.
 
+        :param vmseries_ip_addresses: IP addresses of the MGMT interface for VM-Series
+        :param panorama_hostname: Hostname of the Panorama server
+        :param panorama_username: Account's name
+        :param panorama_password: Account's password
+        :param serials: known serial numbers, management IP -> serial
+        :return: dict IP address -> True if VM-Series was de-licensed correctly, False in other case
+        """
+        # Set status of delicensing
+        delicensed = {ip_address: False for ip_address in vmseries_ip_addresses}
+        try:
             # Connect to selected Panorama instance
             self.logger.info(
                 f"Connecting to '{panorama_hostname}' using user '{panorama_username}' to license manager '{panorama_lm_name}'"
             )
-            panorama = Panorama(
-                hostname=panorama_hostname,
-                api_username=panorama_username,
-                api_password=panorama_password,
+            panorama = get_panorama_session(
+                panorama_hostname, panorama_username, panorama_password
             )
 
-            # List all devices under the configured license manager
-            cmd = f'show plugins sw_fw_license devices license-manager "{panorama_lm_name}"'
-            firewalls_parsed = self.panorama_cmd(panorama, cmd=cmd)
-
-            # If the command succeeded, start sweeping the list of FWs
-            if firewalls_parsed.attrib.get("status") == "success":
-                do_commit = False
-                self.logger.info("Parsing firewall list")
-                for fw in firewalls_parsed[0][0]:
-                    ip_obj = fw.find("ip")
-                    # For each firewall from the list, check if IP address is matching value of vmseries_ip_address
-                    if ip_obj is not None:
-                        ip = ip_obj.text
-                        self.logger.info(
-                            f"Working on VM-Series with management IP: {ip}"
+            # Serials recorded in instance tags are deactivated directly, index of all devices under the configured
+            # license manager is needed only for the other IPs (refreshed if any of them is not known yet)
+            known = serials or {}
+            serials = {ip_address: known[ip_address] for ip_address in vmseries_ip_addresses if ip_address in known}
+            unknown = [ip_address for ip_address in vmseries_ip_addresses if ip_address not in serials]
+            if unknown:
+                self.checkpoint("panorama_device_list")
+                devices = self.get_license_manager_devices(panorama, panorama_lm_name)
+                if any(ip_address not in devices for ip_address in unknown):
+                    devices = self.get_license_manager_devices(panorama, panorama_lm_name, refresh=True)
+                serials.update({ip_address: devices[ip_address] for ip_address in unknown if ip_address in devices})
+
+            # Deactivated devices are committed by this invocation, no checkpoints after the first deactivation
+            self.checkpoint("panorama_deactivate")
+            stale = []
+            for ip_address in vmseries_ip_addresses:
+                serial = serials.get(ip_address)
+                if serial is None:
+                    self.logger.info(f"VM-Series with management IP {ip_address} not found in license manager")
+                    continue
+                delicensed[ip_address] = self.deactivate_device(panorama, panorama_lm_name, ip_address, serial)
+                if not delicensed[ip_address] and ip_address not in unknown:
+                    stale.append(ip_address)
+
+            if stale:
+                # Recorded serial is not registered anymore, find device by management IP instead
+                devices = self.get_license_manager_devices(panorama, panorama_lm_name, refresh=True)
+                for ip_address in stale:
+                    serial = devices.get(ip_address)
+                    if serial is not None and serial != serials[ip_address]:
+                        delicensed[ip_address] = self.deactivate_device(panorama, panorama_lm_name, ip_address, serial)
+
+            # Commit changes once for the whole batch in case we did de-license a FW
+            if any(delicensed.values()):
+                self.logger.info("Committing changes in Panorama")
+                try:
+                    with timed("panorama_commit"):
+                        self.retry_on_expired_key(
+                            panorama, lambda: panorama.commit(sync=False, admins="__sw_fw_license"), "Commit"
                         )
-                        if ip is not None and ip == vmseries_ip_address:
-                            serial_obj = fw.find("serial")
-                            if serial_obj is not None:
-                                serial = serial_obj.text
-                                # If IP address is the same as destroyed VM and serial is not none, then delicense firewall
-                                if serial_obj.text is not None:
-                                    self.logger.info(
-                                        f"De-licensing firewall: {serial} ..."
-                                    )
-                                    cmd = f'request plugins sw_fw_license deactivate license-manager "{panorama_lm_name}" devices member "{serial}"'
-                                    resp_parsed = self.panorama_cmd(panorama, cmd)
-                                    if resp_parsed.attrib.get("status") == "success":
-                                        self.logger.info(
-                                            f"De-licensing firewall: {serial} succeeded"
-                                        )
-                                        do_commit = True
-                                        delicensed = True
-                                    else:
-                                        self.logger.info(
-                                            f"De-licensing firewall: {serial} failed"
-                                        )
-                # Commit changes in case we did de-license a FW
-                if do_commit:
-                    self.logger.info("Committing changes in Panorama")
-                    try:
-                        panorama.commit(sync=False, admins="__sw_fw_license")
-                        self.logger.info("Panorama commit completed successfully")
-                    except Exception as commit_error:
-                        self.logger.error(
-                            f"Panorama commit failed after de-licensing operation: {commit_error}"
-                        )
-                        return False
+                    self.logger.info("Panorama commit completed successfully")
+                except Exception as commit_error:
+                    if is_panorama_unreachable(commit_error):
+                        raise
+                    self.logger.error(
+                        f"Panorama commit failed after de-licensing operation: {commit_error}"
+                    )
+                    return {ip_address: False for ip_address in vmseries_ip_addresses}
 
             # Return final result of de-licensing
             return delicensed
+        except (PanoramaUnavailableError, LifecycleStepDeferred):
+            raise
         except Exception as e:
+            if is_panorama_auth_error(e):
+                raise PanoramaAuthError(f"Panorama {panorama_hostname} rejected credentials: {e}") from e
+            if is_panorama_unreachable(e):
+                raise PanoramaUnavailableError(f"Panorama {panorama_hostname} is unreachable: {e}") from e
             self.logger.info(
                 f"Error while de-licensing VM-Series using Panorama {panorama_hostname}: {e}"
             )
-            return False
+            return {ip_address: False for ip_address in vmseries_ip_addresses}
+
+
+# Handler instances shared by warm invocations of the same container, one per Auto Scaling group profile
+_HANDLERS: dict[str, VMSeriesInterfaceScaling] = {}
+_HANDLERS_LOCK = threading.Lock()
+
+
+def get_handler(profile: Optional[AsgProfile] = None) -> VMSeriesInterfaceScaling:
+    """
+    Return the handler instance of Auto Scaling group profile (default profile when not given) for this container,
+    creating it on first use.
+    """
+    profile = profile or default_asg_profile()
+    handler = _HANDLERS.get(profile.key)
+    if handler is None:
+        with _HANDLERS_LOCK:
+            handler = _HANDLERS.get(profile.key)
+            if handler is None:
+                handler = _HANDLERS[profile.key] = VMSeriesInterfaceScaling(profile)
+    return handler
+
+
+def maintained_profiles() -> list[AsgProfile]:
+    """
+    Return profiles of all Auto Scaling groups served by the Lambda: default one (if asg_name is set) and
+    profiles from asg_profiles.
+    """
+    default = default_asg_profile()
+    profiles = list(asg_profiles().values())
+    if default.asg_name and default.key not in asg_profiles():
+        profiles.insert(0, default)
+    return profiles
+
+
+def run_maintenance(action: str, task: Callable[[VMSeriesInterfaceScaling], dict[str, int]]) -> None:
+    """
+    Run scheduled maintenance action for every Auto Scaling group concurrently, each group with its own metrics.
+    All groups are maintained even if one of them fails, the first error is raised afterwards.
+
+    :param action: action name, LifecycleEvent dimension of metrics
+    :param task: function running the action with handler of one group, returns counters for metrics
+    """
+    def maintain(profile: AsgProfile) -> None:
+        with event_metrics(action, AutoScalingGroupName=profile.asg_name, Region=profile.region) as metrics:
+            for name, value in task(get_handler(profile)).items():
+                metrics.count(name, value)
+
+    profiles = maintained_profiles()
+    max_workers = max(1, min(len(profiles), int(os.getenv("batch_max_workers", "10"))))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(propagate_context(maintain), profile) for profile in profiles]
+    for future in futures:
+        future.result()
 
 
-def lambda_handler(asg_event: dict[str, Any], context: dict[str, Any]) -> None:
+def run_batch(records: list[dict[str, Any]]) -> list[str]:
+    """
+    Split batch of lifecycle events buffered in SQS by Auto Scaling group and handle each part by handler
+    of its group, concurrently. Messages which cannot be parsed are passed to the default handler, which reports
+    them as failed. Groups using the same Panorama share its session, their Panorama calls are serialized.
+
+    :param records: SQS records, message body is EventBridge lifecycle event
+    :return: message ids of records which failed and should be retried
+    """
+    failures = []
+    groups: dict[str, tuple[AsgProfile, list[dict[str, Any]]]] = {}
+    for record in records:
+        try:
+            profile = event_asg_profile(json.loads(record["body"]))
+        except (KeyError, TypeError, AttributeError, json.JSONDecodeError):
+            profile = default_asg_profile()
+        except ValueError as e:
+            get_handler().logger.error(f"Cannot handle lifecycle event from SQS message {record.get('messageId')}: {e}")
+            failures.append(record.get("messageId", ""))
+            continue
+        groups.setdefault(profile.key, (profile, []))[1].append(record)
+
+    if len(groups) == 1:
+        profile, group_records = next(iter(groups.values()))
+        return failures + get_handler(profile).run_batch(group_records)
+    with ThreadPoolExecutor(max_workers=max(1, len(groups))) as pool:
+        futures = [
+            pool.submit(propagate_context(get_handler(profile).run_batch), group_records)
+            for profile, group_records in groups.values()
+        ]
+        for future in futures:
+            failures.extend(future.result())
+    return failures
+
+
+def lambda_handler(asg_event: dict[str, Any], context: dict[str, Any]) -> Optional[dict[str, Any]]:
     """
     AWS Lambda handler for VM-Series interface scaling and licensing automation.
+    Accepts single EventBridge lifecycle event, batch of them buffered in SQS or scheduled maintenance action.
+    Lifecycle events are dispatched to handler of their Auto Scaling group profile (by group name and region),
+    maintenance actions run for all groups.
     """
-    VMSeriesInterfaceScaling().run(asg_event=asg_event)
+    set_invocation_deadline(context)
+
+    try:
+        if asg_event.get("action") == "replenish_eni_pool":
+            # Scheduled maintenance of pre-created ENIs
+            run_maintenance(
+                "replenish_eni_pool", lambda handler: {"EniCreated": sum(handler.replenish_eni_pool().values())}
+            )
+            return None
+
+        if asg_event.get("action") == "reconcile":
+            # Scheduled bulk cleanup of orphaned ENIs and stale licenses
+            run_maintenance("reconcile", lambda handler: handler.reconcile())
+            return None
+
+        if "Records" in asg_event:
+            # Report partial batch failures, so only failed messages are retried by SQS
+            failures = run_batch(asg_event["Records"])
+            return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+        get_handler(event_asg_profile(asg_event)).run(asg_event=asg_event)
+        return None
+    finally:
+        # Client-side rate limiting state: current rates, throttles and time spent waiting for tokens
+        get_handler().logger.info(f"API rate limiter state: {json.dumps(RATE_LIMITER.state())}")
+        if PANORAMA_BREAKER.circuits:
+            get_handler().logger.info(f"Panorama circuit breaker state: {json.dumps(PANORAMA_BREAKER.state())}")
@@ -0,0 +1,269 @@
+"""
+Metrics of lifecycle events printed as CloudWatch Embedded Metric Format log lines: phase durations, counters
+and AWS and Panorama API calls (counted by botocore hooks of the cached clients).
+"""
+import contextvars
+import fnmatch
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# Error codes returned by AWS APIs when requests are throttled
+THROTTLE_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "EC2ThrottledException",
+    "SlowDown",
+}
+
+
+# botocore events are named after service id ("auto-scaling"), operations are reported by service name ("autoscaling")
+_SERVICE_NAMES: dict[str, str] = {}
+
+
+def api_operation_name(event_name: str) -> str:
+    """
+    Return "service.Operation" name (e.g. "autoscaling.CompleteLifecycleAction") of botocore event
+    like "before-send.auto-scaling.CompleteLifecycleAction".
+    """
+    _, service_id, operation = event_name.split(".", 2)
+    return f"{_SERVICE_NAMES.get(service_id, service_id)}.{operation}"
+
+
+class EventMetrics:
+    """
+    Metrics of handling one lifecycle event (or batch of them): duration of each phase, API call counts,
+    retries and throttles, and lifecycle action result. Emitted as one CloudWatch Embedded Metric Format
+    log line, so CloudWatch extracts metrics from logs without PutMetricData calls.
+    Durations of phases running concurrently (e.g. ENI creation) are summed.
+
+    Every AWS and Panorama call is accounted per operation ("ec2.CreateNetworkInterface",
+    "panorama.Deactivate") with call count, retries and latency. Call counts can be checked against budgets
+    from api_call_budgets environment variable (JSON, per lifecycle event, operation patterns), e.g.
+    {"launch": {"ec2.ModifyNetworkInterfaceAttribute": 2, "*": 12}, "terminate": {"panorama.Commit": 1}},
+    calls over budget are reported in the log line and counted as ApiBudgetExceeded.
+    """
+
+    def __init__(self, lifecycle_event: str, **properties: Any) -> None:
+        self.lifecycle_event = lifecycle_event
+        self.properties = properties
+        self.outcome: Optional[str] = None
+        self.started = time.monotonic()
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, int] = {"ApiCalls": 0, "ApiRetries": 0, "ApiThrottles": 0, "ApiErrors": 0}
+        self.api_calls: dict[str, int] = {}
+        self.api_retries: dict[str, int] = {}
+        self.api_seconds: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def count(self, counter: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add_api_call(self, operation: str, retries: int, failed: bool, seconds: float = 0.0) -> None:
+        # Panorama calls are counted apart from AWS API calls, but listed with them per operation
+        prefix = "Panorama" if operation.startswith("panorama.") else "Api"
+        with self.lock:
+            self.api_calls[operation] = self.api_calls.get(operation, 0) + 1
+            self.api_seconds[operation] = self.api_seconds.get(operation, 0.0) + seconds
+            if retries:
+                self.api_retries[operation] = self.api_retries.get(operation, 0) + retries
+            for counter, value in ((f"{prefix}Calls", 1), (f"{prefix}Retries", retries), (f"{prefix}Errors", int(failed))):
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def budget_violations(self, budgets: Optional[dict[str, dict[str, int]]] = None) -> dict[str, dict[str, int]]:
+        """
+        Check API calls made so far against call budgets of this lifecycle event.
+
+        :param budgets: budgets per lifecycle event, read from api_call_budgets environment variable by default
+        :return: dict operation pattern -> {"Calls": calls matching the pattern, "Budget": allowed calls}
+        """
+        if budgets is None:
+            budgets = json.loads(os.getenv("api_call_budgets", "null")) or {}
+        with self.lock:
+            api_calls = dict(self.api_calls)
+        violations = {}
+        for pattern, budget in budgets.get(self.lifecycle_event, {}).items():
+            calls = sum(count for operation, count in api_calls.items() if fnmatch.fnmatchcase(operation, pattern))
+            if calls > budget:
+                violations[pattern] = {"Calls": calls, "Budget": budget}
+        return violations
+
+    def to_emf(self) -> dict[str, Any]:
+        """
+        Return metrics as CloudWatch Embedded Metric Format document.
+        """
+        with self.lock:
+            values: dict[str, Any] = {
+                f"{phase}_duration": round(seconds * 1000, 1) for phase, seconds in self.phases.items()
+            }
+            values["total_duration"] = round((time.monotonic() - self.started) * 1000, 1)
+            definitions = [{"Name": name, "Unit": "Milliseconds"} for name in values]
+            values.update(self.counters)
+            definitions += [{"Name": name, "Unit": "Count"} for name in self.counters]
+            api_calls = dict(sorted(self.api_calls.items()))
+            api_latency = {operation: round(seconds * 1000, 1) for operation, seconds in sorted(self.api_seconds.items())}
+            api_retries = dict(sorted(self.api_retries.items()))
+
+        dimensions = [["LifecycleEvent"]]
+        if self.outcome:
+            dimensions.append(["LifecycleEvent", "Outcome"])
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": os.getenv("metrics_namespace", "VMSeries/Lifecycle"),
+                        "Dimensions": dimensions,
+                        "Metrics": definitions,
+                    }
+                ],
+            },
+            "LifecycleEvent": self.lifecycle_event,
+            **({"Outcome": self.outcome} if self.outcome else {}),
+            **self.properties,
+            "ApiCallsByOperation": api_calls,
+            "ApiLatencyByOperation": api_latency,
+            **({"ApiRetriesByOperation": api_retries} if api_retries else {}),
+            **values,
+        }
+
+
+# Metrics of the event handled by current thread, copied to worker threads by propagate_context()
+_CURRENT_METRICS: contextvars.ContextVar[Optional[EventMetrics]] = contextvars.ContextVar(
+    "current_metrics", default=None
+)
+
+
+@contextmanager
+def event_metrics(lifecycle_event: str, **properties: Any) -> Iterator[EventMetrics]:
+    """
+    Collect metrics of code running in the block (and in threads started with propagate_context())
+    and print them as EMF log line at the end. Disabled by setting metrics_namespace to empty string.
+    API call budgets of the event are checked at the end of the block too.
+
+    :param lifecycle_event: value of LifecycleEvent dimension, e.g. "launch"
+    :param properties: additional properties logged with metrics (not dimensions), e.g. instance id
+    :return: metrics object, outcome can be set on it
+    """
+    metrics = EventMetrics(lifecycle_event, **properties)
+    token = _CURRENT_METRICS.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _CURRENT_METRICS.reset(token)
+        violations = metrics.budget_violations()
+        if violations:
+            metrics.count("ApiBudgetExceeded", len(violations))
+            metrics.properties["ApiBudgetViolations"] = violations
+        if os.getenv("metrics_namespace", "VMSeries/Lifecycle"):
+            # EMF document has to be the whole log line, so it is written at once instead of logged
+            sys.stdout.write(json.dumps(metrics.to_emf()) + "\n")
+            sys.stdout.flush()
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """
+    Add duration to phase of the current event (no-op outside of event_metrics block).
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.add_phase(phase, seconds)
+
+
+def record_count(counter: str, value: int = 1) -> None:
+    """
+    Increment counter of the current event (no-op outside of event_metrics block).
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.count(counter, value)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Measure duration of code block (or decorated function) as phase of the current event.
+
+    :param phase: phase name, metric is called <phase>_duration
+    """
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.monotonic() - started)
+
+
+def propagate_context(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap function submitted to thread pool, so it runs with context (current event metrics) of the caller.
+
+    :param func: function to run in worker thread
+    :return: wrapped function
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def start_api_call(context: dict[str, Any], **kwargs: Any) -> None:
+    """
+    botocore before-call hook remembering start of API call, so its latency (including retries) is known.
+    """
+    context["api_call_started"] = time.monotonic()
+
+
+def record_api_call(
+    event_name: str, parsed: Optional[dict[str, Any]] = None, context: Optional[dict[str, Any]] = None, **kwargs: Any
+) -> None:
+    """
+    botocore after-call/after-call-error hook counting API calls, retries and latency of the current event.
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is None:
+        return None
+    response_metadata = (parsed or {}).get("ResponseMetadata", {})
+    failed = parsed is None or "Error" in parsed
+    started = (context or {}).get("api_call_started")
+    metrics.add_api_call(
+        api_operation_name(event_name),
+        response_metadata.get("RetryAttempts", 0),
+        failed,
+        time.monotonic() - started if started is not None else 0.0,
+    )
+    return None
+
+
+def record_panorama_call(operation: str, seconds: float, retries: int = 0, failed: bool = False) -> None:
+    """
+    Count Panorama API call of the current event as "panorama.<operation>" (no-op outside of event_metrics block).
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.add_api_call(f"panorama.{operation}", retries, failed, seconds)
+
+
+def record_api_attempt(event_name: str, response: Any = None, **kwargs: Any) -> None:
+    """
+    botocore needs-retry hook counting throttled attempts of the current event.
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is not None and response is not None:
+        if response[1].get("Error", {}).get("Code") in THROTTLE_ERROR_CODES:
+            metrics.count("ApiThrottles")
+    return None
@@ -0,0 +1,114 @@
+"""
+Profiles of firewall Auto Scaling groups served by the Lambda.
+"""
+import json
+import os
+from typing import Any, Optional
+
+
+class AsgProfile:
+    """
+    Configuration of one firewall Auto Scaling group served by the Lambda.
+
+    The group deployed together with the Lambda is described by environment variables (asg_name, interfaces_config,
+    sgr_id, panorama_config, fw_delicense, mgmt_subnet_cidrs, eni_warm_pool_size) and served by the default profile.
+    More groups, also in other regions, are described by asg_profiles environment variable (JSON keyed by group name,
+    or "region/name" when the same name is used in several regions), e.g.
+    {"fw-asg-eu": {"region": "eu-west-1", "interfaces_config": {"eu-west-1a": "subnet-1"}, "sgr_id": "sg-1"}}.
+    Network settings (GROUP_SETTINGS) belong to the group, other settings missing in a profile are taken from
+    the environment variable of the same name, so e.g. Panorama settings can be shared by all groups.
+    """
+
+    # Never taken from environment for profiles: subnets and security groups of another group would be used,
+    # and CIDRs of another group would make its live firewalls look dead to reconciliation
+    GROUP_SETTINGS = ("interfaces_config", "sgr_id", "mgmt_subnet_cidrs")
+
+    def __init__(self, asg_name: Optional[str], region: str, settings: Optional[dict[str, Any]] = None) -> None:
+        self.asg_name = asg_name
+        self.region = region
+        self.settings = settings or {}
+        self.default = settings is None
+
+    @property
+    def key(self) -> str:
+        return f"{self.region}/{self.asg_name or ''}"
+
+    def get(self, setting: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Return setting of the profile in the form of environment variable value (JSON for lists and dicts).
+
+        :param setting: setting name, e.g. "interfaces_config"
+        :param default: value used when neither profile nor environment has the setting
+        :return: setting value
+        """
+        if setting not in self.settings:
+            return os.getenv(setting, default) if self.default or setting not in self.GROUP_SETTINGS else default
+        value = self.settings[setting]
+        if isinstance(value, bool):
+            return "true" if value else ""
+        return value if isinstance(value, str) else json.dumps(value)
+
+    def __getitem__(self, setting: str) -> str:
+        value = self.get(setting)
+        if value is None:
+            raise KeyError(setting)
+        return value
+
+
+# Profiles parsed from asg_profiles environment variable, keyed by "region/name"
+_ASG_PROFILES: Optional[dict[str, AsgProfile]] = None
+
+
+def asg_profiles() -> dict[str, AsgProfile]:
+    """
+    Return profiles of Auto Scaling groups configured in asg_profiles environment variable (without default one).
+    """
+    global _ASG_PROFILES
+    if _ASG_PROFILES is None:
+        profiles = {}
+        for key, settings in (json.loads(os.getenv("asg_profiles", "null")) or {}).items():
+            region, _, asg_name = key.rpartition("/")
+            profile = AsgProfile(asg_name, region or settings.get("region") or os.environ["AWS_REGION"], settings)
+            profiles[profile.key] = profile
+        _ASG_PROFILES = profiles
+    return _ASG_PROFILES
+
+
+def default_asg_profile() -> AsgProfile:
+    """
+    Return profile of Auto Scaling group deployed with the Lambda, configured by environment variables only.
+    """
+    return AsgProfile(os.getenv("asg_name"), os.environ["AWS_REGION"])
+
+
+def get_asg_profile(asg_name: Optional[str], region: Optional[str] = None) -> AsgProfile:
+    """
+    Find profile of Auto Scaling group the lifecycle event comes from. Events of groups without profile in
+    the Lambda's region are served by the default profile (as before profiles existed).
+
+    :param asg_name: AutoScalingGroupName of the event
+    :param region: region of the event, defaults to the Lambda's region
+    :return: profile
+    """
+    region = region or os.environ["AWS_REGION"]
+    profile = asg_profiles().get(f"{region}/{asg_name or ''}")
+    if profile is not None:
+        return profile
+    if region != os.environ["AWS_REGION"]:
+        raise ValueError(f"No profile for Auto Scaling group {asg_name} in region {region}, check asg_profiles")
+    return default_asg_profile()
+
+
+def event_asg_profile(asg_event: dict[str, Any]) -> AsgProfile:
+    """
+    Find profile of Auto Scaling group of EventBridge lifecycle event (by AutoScalingGroupName and region).
+    """
+    return get_asg_profile(asg_event.get("detail", {}).get("AutoScalingGroupName"), asg_event.get("region"))
+
+
+def reset_asg_profiles() -> None:
+    """
+    Drop profiles parsed from asg_profiles environment variable, so they are parsed again on next use.
+    """
+    global _ASG_PROFILES
+    _ASG_PROFILES = None
@@ -0,0 +1,164 @@
+"""
+Client-side rate limiting of EC2 and Auto Scaling API calls with token buckets adapting to throttling.
+"""
+import fnmatch
+import json
+import os
+import threading
+import time
+from functools import partial
+from typing import Any, Optional
+
+from metrics import THROTTLE_ERROR_CODES, api_operation_name, record_phase
+
+
+class TokenBucket:
+    """
+    Token bucket limiting rate of one API operation. Rate adapts to throttling: it is halved
+    on every throttle response and recovers gradually on successful calls, up to configured rate.
+    Bucket holds at least burst tokens, so a container with a low share of the rate is not slowed down
+    by the few calls of a single lifecycle event.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(burst, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.calls = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until it is available. Tokens can be reserved ahead (negative balance),
+        so concurrent callers are served in order without holding the lock while sleeping.
+
+        :return: number of seconds spent waiting for the token
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            self.calls += 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            self.throttled += 1
+            self.rate = max(self.max_rate * 0.1, self.rate * 0.5)
+
+    def on_success(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def state(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "rate": round(self.rate, 2),
+                "max_rate": self.max_rate,
+                "tokens": round(self.tokens, 2),
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "waited_seconds": round(self.waited, 3),
+            }
+
+
+class ApiRateLimiter:
+    """
+    Client-side rate limiter shared by all threads and warm invocations of the Lambda container.
+    Each API operation ("ec2.DescribeNetworkInterfaces") gets its own token bucket with rate (requests per second)
+    taken from the first matching pattern in api_rate_limits environment variable (JSON, most specific pattern wins),
+    e.g. {"ec2.Describe*": 20, "ec2.*": 10, "autoscaling.*": 5}. Clients of every region get their own buckets.
+
+    Buckets are not shared between containers: limits are rates of the whole function, every container gets
+    its share, limit divided by lambda_concurrency (reserved concurrency of the function), and starts with
+    at least api_rate_burst tokens (default 5).
+    """
+
+    DEFAULT_LIMITS = {"ec2.Describe*": 20.0, "ec2.*": 10.0, "autoscaling.*": 5.0}
+
+    def __init__(self) -> None:
+        self.buckets: dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def limits(self) -> dict[str, float]:
+        return json.loads(os.getenv("api_rate_limits", "null")) or self.DEFAULT_LIMITS
+
+    @staticmethod
+    def concurrency() -> int:
+        return max(1, int(os.getenv("lambda_concurrency") or "1"))
+
+    @staticmethod
+    def bucket_key(operation: str, region: Optional[str] = None) -> str:
+        # AWS throttles per region, buckets of regions other than the Lambda's own are keyed "region/operation"
+        return operation if region in (None, os.environ.get("AWS_REGION")) else f"{region}/{operation}"
+
+    def bucket(self, operation: str, region: Optional[str] = None) -> Optional[TokenBucket]:
+        key = self.bucket_key(operation, region)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    limits = self.limits()
+                    patterns = sorted(limits, key=lambda pattern: (pattern != operation, -len(pattern)))
+                    rate = next((limits[p] for p in patterns if fnmatch.fnmatchcase(operation, p)), None)
+                    if not rate or rate <= 0:
+                        return None
+                    burst = float(os.getenv("api_rate_burst", "5"))
+                    bucket = self.buckets[key] = TokenBucket(float(rate) / self.concurrency(), burst)
+        return bucket
+
+    def register(self, aws_client: Any) -> None:
+        """
+        Hook rate limiting into every request (including retries, waiters and paginators) made by boto3 client.
+
+        :param aws_client: boto3 client
+        """
+        service = aws_client.meta.service_model.service_name
+        region = aws_client.meta.region_name
+        aws_client.meta.events.register(f"before-send.{service}", partial(self.before_send, region=region))
+        aws_client.meta.events.register(f"needs-retry.{service}", partial(self.after_attempt, region=region))
+
+    def before_send(self, event_name: str, region: Optional[str] = None, **kwargs: Any) -> None:
+        bucket = self.bucket(api_operation_name(event_name), region)
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited > 0:
+                record_phase("rate_limit_wait", waited)
+
+    def after_attempt(self, event_name: str, response: Any = None, region: Optional[str] = None, **kwargs: Any) -> None:
+        bucket = self.buckets.get(self.bucket_key(api_operation_name(event_name), region))
+        if bucket is None or response is None:
+            return None
+        error_code = response[1].get("Error", {}).get("Code")
+        if error_code in THROTTLE_ERROR_CODES:
+            bucket.on_throttle()
+        elif not error_code:
+            bucket.on_success()
+        return None
+
+    def reset(self) -> None:
+        """
+        Drop all token buckets, they are created again with current limits on next call.
+        """
+        with self.lock:
+            self.buckets.clear()
+
+    def state(self) -> dict[str, dict[str, Any]]:
+        """
+        Return state of all token buckets, e.g. for logging.
+        """
+        return {operation: bucket.state() for operation, bucket in sorted(self.buckets.items())}
+
+
+# Rate limiter shared by EC2 and Auto Scaling clients
+RATE_LIMITER = ApiRateLimiter()
@@ -0,0 +1,109 @@
+"""
+Lambda container runtime shared by the lifecycle code: deadline of the current invocation, logger configuration
+and boto3 clients cached across warm invocations (with rate limiter and metrics hooks).
+"""
+import os
+import threading
+import time
+from logging import getLogger, basicConfig, INFO, DEBUG
+from typing import Any, Optional
+
+from boto3 import client
+from botocore.config import Config
+
+from metrics import _SERVICE_NAMES, record_api_attempt, record_api_call, start_api_call
+from rate_limiter import RATE_LIMITER
+
+
+# Deadline (time.monotonic) of the current Lambda invocation, shared by all threads serving it
+_INVOCATION_DEADLINE: Optional[float] = None
+
+
+def set_invocation_deadline(context: Any) -> None:
+    """
+    Remember when the current invocation times out, based on Lambda context.
+
+    :param context: Lambda context object, None when not running in Lambda
+    """
+    global _INVOCATION_DEADLINE
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    _INVOCATION_DEADLINE = time.monotonic() + get_remaining_time() / 1000 if get_remaining_time else None
+
+
+def remaining_time() -> float:
+    """
+    Return number of seconds left until the current invocation times out (infinity outside of Lambda).
+    """
+    if _INVOCATION_DEADLINE is None:
+        return float("inf")
+    return _INVOCATION_DEADLINE - time.monotonic()
+
+
+# Seconds kept for checkpointing, heartbeat and completing the lifecycle action
+LIFECYCLE_RESERVE = 5.0
+
+
+class ConfigureLogger:
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.logger = getLogger(self.__class__.__name__)
+        basicConfig(format="%(asctime)s %(message)s")
+        level = os.getenv("logger_level", "INFO").upper()
+        self.logger.setLevel(DEBUG if level == "DEBUG" else INFO)
+
+
+# boto3 clients are cached per (service, region) at module level, so warm Lambda containers
+# reuse endpoint resolution, credentials and the HTTP connection pool between invocations.
+_CLIENTS: dict[tuple[str, str], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(service: str, region: Optional[str] = None) -> Any:
+    """
+    Return a cached boto3 client for the given service and region, creating it on first use.
+
+    :param service: AWS service name, e.g. "ec2"
+    :param region: AWS region, defaults to AWS_REGION environment variable
+    :return: boto3 client
+    """
+    region = region or os.environ["AWS_REGION"]
+    key = (service, region)
+    aws_client = _CLIENTS.get(key)
+    if aws_client is None:
+        with _CLIENTS_LOCK:
+            aws_client = _CLIENTS.get(key)
+            if aws_client is None:
+                # EC2 and Auto Scaling calls are paced by RATE_LIMITER, botocore only retries them with standard
+                # backoff. Setting api_retry_mode to "adaptive" replaces the limiter with botocore's own one.
+                retry_mode = os.getenv("api_retry_mode", "")
+                rate_limited = service in ("ec2", "autoscaling") and retry_mode != "adaptive"
+                aws_client = client(
+                    service,
+                    region_name=region,
+                    config=Config(
+                        max_pool_connections=int(os.getenv("boto_max_pool_connections", "10")),
+                        tcp_keepalive=True,
+                        # Retries of throttled and transient errors with jittered exponential backoff
+                        retries={
+                            "mode": retry_mode or ("standard" if rate_limited else "adaptive"),
+                            "max_attempts": int(os.getenv("api_max_attempts", "8")),
+                        },
+                    ),
+                )
+                _SERVICE_NAMES[aws_client.meta.service_model.service_id.hyphenize()] = service
+                if rate_limited:
+                    RATE_LIMITER.register(aws_client)
+                aws_client.meta.events.register(f"before-call.{service}", start_api_call)
+                aws_client.meta.events.register(f"after-call.{service}", record_api_call)
+                aws_client.meta.events.register(f"after-call-error.{service}", record_api_call)
+                aws_client.meta.events.register(f"needs-retry.{service}", record_api_attempt)
+                _CLIENTS[key] = aws_client
+    return aws_client
+
+
+def clear_clients() -> None:
+    """
+    Drop all cached boto3 clients and state of the rate limiter.
+    """
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+        RATE_LIMITER.reset()
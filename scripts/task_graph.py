@@ -0,0 +1,47 @@
+"""
+Concurrent execution of dependent tasks (steps of lifecycle flows) on a bounded thread pool.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from metrics import propagate_context
+
+
+def run_task_graph(
+    tasks: dict[str, tuple[Callable[[], Any], tuple[str, ...]]],
+    max_workers: int,
+    can_start: Callable[[str], bool] = lambda name: True,
+) -> dict[str, Any]:
+    """
+    Run tasks on bounded thread pool, each as soon as all tasks it depends on are finished, so the whole graph
+    takes as long as its critical path. When a task fails no more tasks are started, the first error is raised
+    once running tasks are finished.
+
+    :param tasks: task name -> (function, names of tasks it depends on)
+    :param max_workers: maximum number of tasks running at once
+    :param can_start: called before starting a task, task (and its dependants) is left out if it returns False
+    :return: task name -> result of tasks which were run
+    """
+    results: dict[str, Any] = {}
+    pending = dict(tasks)
+    running: dict[Future, str] = {}
+    error: Optional[Exception] = None
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), max_workers))) as pool:
+        while True:
+            if error is None:
+                for name, (func, dependencies) in list(pending.items()):
+                    if len(running) < max_workers and all(d in results for d in dependencies) and can_start(name):
+                        del pending[name]
+                        running[pool.submit(propagate_context(func))] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,92 @@
+"""
+Shared fixtures: Lambda module loaded from scripts/lambda.py (its file name is not importable) with offline AWS
+settings, in-memory EC2 / Auto Scaling of tools/benchmark_lifecycle.py, and helpers reading EMF metrics the Lambda
+prints.
+
+Run from repository root: python3 -m pytest tests (requires pytest and scripts/requirements.txt).
+"""
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Iterator
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGETS_FILE = ROOT / "tools" / "api_call_budgets.json"
+
+# Benchmark tools are imported by tests of the tools and for FakeAws
+sys.path.insert(0, str(ROOT / "tools"))
+
+from benchmark_lifecycle import SECURITY_GROUP, ZONES, FakeAws, load_lambda  # noqa: E402
+
+
+def emf_records(output: str) -> list[dict[str, Any]]:
+    """
+    Return EMF documents printed by the Lambda.
+
+    :param output: captured stdout
+    :return: list of EMF records
+    """
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+@pytest.fixture
+def environment() -> Iterator[os._Environ]:
+    """
+    Environment of the Lambda, restored after the test (tools set environment variables and disable logging).
+    """
+    saved = dict(os.environ)
+    os.environ.update(
+        {
+            "AWS_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "test",
+            "AWS_SECRET_ACCESS_KEY": "test",
+            "api_call_budgets": BUDGETS_FILE.read_text(),
+        }
+    )
+    for name in ("fw_delicense", "eni_warm_pool_size", "idempotency_table", "metrics_namespace"):
+        os.environ.pop(name, None)
+    yield os.environ
+    os.environ.clear()
+    os.environ.update(saved)
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def vmlambda(environment: os._Environ) -> ModuleType:
+    """
+    Fresh Lambda module (and its sibling modules) for every test, so container caches (clients, handlers,
+    idempotency, circuit breaker) are not shared.
+    """
+    return load_lambda(ROOT / "scripts" / "lambda.py")
+
+
+@pytest.fixture
+def lambda_module(vmlambda: ModuleType) -> Callable[[str], ModuleType]:
+    """
+    Return sibling module of scripts/lambda.py (e.g. "idempotency") loaded with the Lambda module of the test.
+    """
+    return lambda name: sys.modules[name]
+
+
+@pytest.fixture
+def profile(environment: os._Environ) -> None:
+    """
+    Interfaces of the default Auto Scaling group profile, in availability zones of FakeAws.
+    """
+    environment.update({"interfaces_config": json.dumps(ZONES), "sgr_id": SECURITY_GROUP})
+
+
+@pytest.fixture
+def fake_aws(vmlambda: ModuleType, profile: None) -> FakeAws:
+    """
+    FakeAws answering EC2 and Auto Scaling calls of the Lambda module, without latency, throttling or delays.
+    """
+    fake = FakeAws(latency_ms=0, api_rate=0, eni_visibility_ms=0, eni_pending_ms=0, seed=1)
+    for service in ("ec2", "autoscaling"):
+        fake.install(vmlambda.get_client(service))
+    return fake
@@ -0,0 +1,149 @@
+"""
+API call budgets of lifecycle handler paths (tools/api_call_budgets.json, deployed as api_call_budgets variable).
+
+Every test handles lifecycle event end to end and fails when the event makes more API calls per operation than
+budgeted. Sequential paths run against botocore Stubber (an unexpected call fails the test on its own), paths with
+concurrent steps against FakeAws of tools/benchmark_lifecycle.py.
+"""
+import fnmatch
+import json
+from types import ModuleType
+from typing import Any
+
+import pytest
+from botocore.stub import Stubber
+
+from benchmark_lifecycle import FakeAws, lifecycle_event
+from conftest import BUDGETS_FILE, emf_records
+
+LAUNCH = "EC2 Instance-launch Lifecycle Action"
+TERMINATE = "EC2 Instance-terminate Lifecycle Action"
+BUDGETS = json.loads(BUDGETS_FILE.read_text())
+
+
+def assert_within_budget(record: dict[str, Any]) -> None:
+    """
+    Check API calls of EMF record against budgets of its lifecycle event, and that the Lambda found no violation.
+    """
+    calls = record["ApiCallsByOperation"]
+    for pattern, budget in BUDGETS[record["LifecycleEvent"]].items():
+        used = sum(count for operation, count in calls.items() if fnmatch.fnmatchcase(operation, pattern))
+        assert used <= budget, f"{record['LifecycleEvent']} made {used} {pattern} calls, budget is {budget}: {calls}"
+    assert "ApiBudgetViolations" not in record
+
+
+def describe_instance(instance_id: str, tags: tuple[dict[str, str], ...] = ()) -> dict[str, Any]:
+    return {
+        "Reservations": [
+            {
+                "Instances": [
+                    {
+                        "InstanceId": instance_id,
+                        "Placement": {"AvailabilityZone": "us-east-1a"},
+                        "SubnetId": "subnet-data-a",
+                        "Tags": list(tags),
+                        "NetworkInterfaces": [
+                            {
+                                "NetworkInterfaceId": "eni-data",
+                                "PrivateIpAddress": "10.0.0.10",
+                                "Attachment": {"DeviceIndex": 0, "AttachmentId": "eni-attach-0", "DeleteOnTermination": True},
+                            }
+                        ],
+                    }
+                ]
+            }
+        ]
+    }
+
+
+@pytest.mark.parametrize("warm_pool", [0, 1])
+def test_launch_within_budget(vmlambda: ModuleType, fake_aws: FakeAws, environment: Any, capsys: Any, warm_pool: int) -> None:
+    environment["eni_warm_pool_size"] = str(warm_pool)
+    fake_aws.add_warm_pool(warm_pool, [1])
+    event = lifecycle_event(LAUNCH, fake_aws.add_instance("us-east-1a"))
+
+    vmlambda.lambda_handler(event, None)
+
+    (record,) = emf_records(capsys.readouterr().out)
+    assert fake_aws.completed[event["detail"]["LifecycleActionToken"]] == "CONTINUE"
+    # ENI is taken from warm pool instead of created
+    assert ("ec2.CreateNetworkInterface" in record["ApiCallsByOperation"]) == (not warm_pool)
+    assert_within_budget(record)
+
+
+def test_duplicate_launch_makes_no_calls(vmlambda: ModuleType, fake_aws: FakeAws, capsys: Any) -> None:
+    event = lifecycle_event(LAUNCH, fake_aws.add_instance("us-east-1b"))
+
+    vmlambda.lambda_handler(event, None)
+    vmlambda.lambda_handler(event, None)
+
+    first, duplicate = emf_records(capsys.readouterr().out)
+    assert_within_budget(first)
+    assert duplicate["DuplicateEvents"] == 1
+    assert duplicate["ApiCalls"] == 0
+
+
+def test_terminate_batch_within_budget(vmlambda: ModuleType, fake_aws: FakeAws, capsys: Any) -> None:
+    events = [lifecycle_event(TERMINATE, fake_aws.add_instance("us-east-1a")) for _ in range(5)]
+    records = [{"messageId": str(number), "body": json.dumps(event)} for number, event in enumerate(events)]
+
+    assert vmlambda.lambda_handler({"Records": records}, None) == {"batchItemFailures": []}
+
+    for record in emf_records(capsys.readouterr().out):
+        if record["LifecycleEvent"] in BUDGETS:
+            assert_within_budget(record)
+    assert all(fake_aws.completed[event["detail"]["LifecycleActionToken"]] == "CONTINUE" for event in events)
+
+
+def test_terminate_within_budget(vmlambda: ModuleType, profile: None, capsys: Any) -> None:
+    handler = vmlambda.get_handler()
+    event = lifecycle_event(TERMINATE, "i-terminated")
+    ec2, autoscaling = Stubber(handler.ec2_client), Stubber(handler.asg_client)
+    ec2.add_response("describe_instances", describe_instance("i-terminated"))
+    autoscaling.add_response("complete_lifecycle_action", {})
+
+    with ec2, autoscaling:
+        vmlambda.lambda_handler(event, None)
+
+    ec2.assert_no_pending_responses()
+    autoscaling.assert_no_pending_responses()
+    (record,) = emf_records(capsys.readouterr().out)
+    assert record["Outcome"] == "CONTINUE"
+    assert_within_budget(record)
+
+
+def test_resumed_launch_within_budget(vmlambda: ModuleType, profile: None, capsys: Any) -> None:
+    handler = vmlambda.get_handler()
+    event = lifecycle_event(LAUNCH, "i-resumed")
+    token = event["detail"]["LifecycleActionToken"]
+    checkpoint = {"Key": vmlambda.CHECKPOINT_TAG, "Value": f"{token}:source_dest_check"}
+    ec2, autoscaling = Stubber(handler.ec2_client), Stubber(handler.asg_client)
+    ec2.add_response("describe_instances", describe_instance("i-resumed", tags=(checkpoint,)))
+    ec2.add_response("describe_network_interfaces", {"NetworkInterfaces": []})
+    ec2.add_response(
+        "create_network_interface", {"NetworkInterface": {"NetworkInterfaceId": "eni-mgmt", "Status": "available"}}
+    )
+    ec2.add_response("attach_network_interface", {"AttachmentId": "eni-attach-1"})
+    ec2.add_response("modify_network_interface_attribute", {})
+    ec2.add_response("delete_tags", {})
+    autoscaling.add_response("complete_lifecycle_action", {})
+
+    with ec2, autoscaling:
+        vmlambda.lambda_handler({**event, "completed_steps": ["source_dest_check"], "resume_count": 1}, None)
+
+    ec2.assert_no_pending_responses()
+    autoscaling.assert_no_pending_responses()
+    (record,) = emf_records(capsys.readouterr().out)
+    assert record["Outcome"] == "CONTINUE"
+    assert_within_budget(record)
+
+
+def test_call_over_budget_is_reported(vmlambda: ModuleType, fake_aws: FakeAws, environment: Any, capsys: Any) -> None:
+    environment["api_call_budgets"] = json.dumps({"launch": {"ec2.AttachNetworkInterface": 0, "ec2.Describe*": 10}})
+    event = lifecycle_event(LAUNCH, fake_aws.add_instance("us-east-1a"))
+
+    vmlambda.lambda_handler(event, None)
+
+    (record,) = emf_records(capsys.readouterr().out)
+    assert record["ApiBudgetViolations"] == {"ec2.AttachNetworkInterface": {"Calls": 1, "Budget": 0}}
+    assert record["ApiBudgetExceeded"] == 1
@@ -0,0 +1,143 @@
+"""
+Circuit breaker of Panorama calls (transitions driven by a fake clock) and de-licensing deferred to the retry queue
+while the circuit is open.
+"""
+import json
+from types import ModuleType, SimpleNamespace
+from typing import Any, Callable
+
+import pytest
+
+from conftest import emf_records
+
+ENDPOINT = "192.0.2.10:443"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def circuit_breaker(lambda_module: Callable[[str], ModuleType]) -> ModuleType:
+    return lambda_module("circuit_breaker")
+
+
+@pytest.fixture
+def clock(circuit_breaker: ModuleType, environment: Any, monkeypatch: Any) -> FakeClock:
+    environment.update({"panorama_breaker_threshold": "3", "panorama_breaker_cooldown": "60"})
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+def open_circuit(breaker: Any) -> None:
+    for _ in range(breaker.threshold()):
+        assert breaker.allow(ENDPOINT)
+        breaker.record(ENDPOINT, reachable=False)
+
+
+def test_opens_after_threshold_failures(circuit_breaker: ModuleType, clock: FakeClock) -> None:
+    breaker = circuit_breaker.CircuitBreaker()
+
+    assert breaker.record(ENDPOINT, reachable=False) is None
+    assert breaker.record(ENDPOINT, reachable=False) is None
+    assert breaker.allow(ENDPOINT)
+    assert breaker.record(ENDPOINT, reachable=False) == "open"
+
+    assert not breaker.allow(ENDPOINT)
+    clock.now += 59
+    assert not breaker.allow(ENDPOINT)
+    assert breaker.state() == {ENDPOINT: {"state": "open", "failures": 3}}
+
+
+def test_success_resets_failure_count(circuit_breaker: ModuleType, clock: FakeClock) -> None:
+    breaker = circuit_breaker.CircuitBreaker()
+
+    breaker.record(ENDPOINT, reachable=False)
+    breaker.record(ENDPOINT, reachable=False)
+    assert breaker.record(ENDPOINT, reachable=True) is None
+    breaker.record(ENDPOINT, reachable=False)
+
+    assert breaker.allow(ENDPOINT)
+    assert breaker.state() == {ENDPOINT: {"state": "closed", "failures": 1}}
+
+
+def test_half_open_trial_closes_circuit(circuit_breaker: ModuleType, clock: FakeClock) -> None:
+    breaker = circuit_breaker.CircuitBreaker()
+    open_circuit(breaker)
+
+    clock.now += 60
+    # Single trial call after cooldown, other calls still fail fast
+    assert breaker.allow(ENDPOINT)
+    assert not breaker.allow(ENDPOINT)
+    assert breaker.record(ENDPOINT, reachable=True) == "closed"
+
+    assert breaker.allow(ENDPOINT)
+    assert breaker.allow(ENDPOINT)
+    assert breaker.state() == {ENDPOINT: {"state": "closed", "failures": 0}}
+
+
+def test_failed_trial_opens_for_another_cooldown(circuit_breaker: ModuleType, clock: FakeClock) -> None:
+    breaker = circuit_breaker.CircuitBreaker()
+    open_circuit(breaker)
+
+    clock.now += 60
+    assert breaker.allow(ENDPOINT)
+    # Circuit was open already, state does not change
+    assert breaker.record(ENDPOINT, reachable=False) is None
+
+    assert not breaker.allow(ENDPOINT)
+    clock.now += 59
+    assert not breaker.allow(ENDPOINT)
+    clock.now += 1
+    assert breaker.allow(ENDPOINT)
+
+
+def test_cancelled_trial_lets_next_call_through(circuit_breaker: ModuleType, clock: FakeClock) -> None:
+    breaker = circuit_breaker.CircuitBreaker()
+    open_circuit(breaker)
+
+    clock.now += 60
+    assert breaker.allow(ENDPOINT)
+    breaker.cancel(ENDPOINT)
+    assert breaker.allow(ENDPOINT)
+
+
+def test_deferred_delicense_kept_while_circuit_open(vmlambda: ModuleType, environment: Any, capsys: Any) -> None:
+    environment.update(
+        {
+            "fw_delicense": "true",
+            "panorama_config": "arn:aws:secretsmanager:us-east-1:123456789012:secret:panorama",
+            "panorama_api_timeout": "1",
+        }
+    )
+    config = {"username": "admin", "password": "admin", "license_manager": "lm", "panorama1": ENDPOINT.split(":")[0]}
+    vmlambda.get_handler().get_secret_config = lambda arn, force_refresh=False: config
+    for _ in range(vmlambda.PANORAMA_BREAKER.threshold()):
+        vmlambda.PANORAMA_BREAKER.record(ENDPOINT, reachable=False)
+    records = [
+        {
+            "messageId": f"m{number}",
+            "body": json.dumps(
+                {
+                    "action": "delicense",
+                    "region": "us-east-1",
+                    "detail": {"EC2InstanceId": f"i-{number}", "ManagementIp": f"10.0.1.{number}", "Serial": None},
+                }
+            ),
+        }
+        for number in range(3)
+    ]
+
+    response = vmlambda.lambda_handler({"Records": records}, None)
+
+    # Messages stay in the queue, delivered again after visibility timeout
+    assert response == {"batchItemFailures": [{"itemIdentifier": f"m{number}"} for number in range(3)]}
+    (retry,) = [record for record in emf_records(capsys.readouterr().out) if record["LifecycleEvent"] == "delicense_retry"]
+    assert retry["Outcome"] == "DEFERRED"
+    assert retry["PanoramaCircuitOpen"] == 1
+    assert "panorama.Keygen" not in retry["ApiCallsByOperation"]
@@ -0,0 +1,144 @@
+"""
+Streaming parser of license manager device list (stream_license_manager_devices) against canned Panorama XML API
+responses, and retry of the request with a new API key when Panorama rejects the key.
+"""
+import io
+import urllib.error
+import urllib.parse
+from types import ModuleType
+from typing import Any, Optional
+
+import pytest
+
+CMD = 'show plugins sw_fw_license devices license-manager "lm"'
+
+
+class FakePanorama:
+    """
+    Attributes of panos Panorama object used by the Lambda, API keys are numbered as they are generated.
+    """
+
+    def __init__(self) -> None:
+        self.hostname = "192.0.2.10"
+        self.port = 443
+        self.timeout = 10
+        self._api_key: Optional[str] = None
+        self._xapi_private = None
+        self.keys = 0
+
+    @property
+    def api_key(self) -> str:
+        if self._api_key is None:
+            self.keys += 1
+            self._api_key = f"key-{self.keys}"
+        return self._api_key
+
+    def update_connection_method(self) -> None:
+        pass
+
+
+class FakeUrlopen:
+    """
+    Stand-in of urllib.request.urlopen answering requests with the given responses (bytes or exception) in order.
+    """
+
+    def __init__(self, *responses: Any) -> None:
+        self.responses = list(responses)
+        self.requests: list[dict[str, str]] = []
+
+    def __call__(self, request: Any, context: Any = None, timeout: Optional[float] = None) -> io.BytesIO:
+        self.requests.append(dict(urllib.parse.parse_qsl(request.data.decode())))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return io.BytesIO(response)
+
+
+def devices_response(*devices: tuple[str, str]) -> bytes:
+    entries = "".join(
+        f'<entry name="{serial}"><serial>{serial}</serial><ip>{ip}</ip><hostname>fw</hostname></entry>'
+        for ip, serial in devices
+    )
+    return f'<response status="success"><result><devices>{entries}</devices></result></response>'.encode()
+
+
+@pytest.fixture
+def urlopen(monkeypatch: Any) -> Any:
+    pytest.importorskip("panos")
+
+    def install(*responses: Any) -> FakeUrlopen:
+        fake = FakeUrlopen(*responses)
+        monkeypatch.setattr("urllib.request.urlopen", fake)
+        return fake
+
+    return install
+
+
+def test_empty_device_list(vmlambda: ModuleType, urlopen: Any) -> None:
+    urlopen(b'<response status="success"><result><devices/></result></response>')
+
+    assert vmlambda.stream_license_manager_devices(FakePanorama(), CMD) == {}
+
+
+def test_empty_result(vmlambda: ModuleType, urlopen: Any) -> None:
+    urlopen(b'<response status="success"><result/></response>')
+
+    assert vmlambda.stream_license_manager_devices(FakePanorama(), CMD) == {}
+
+
+def test_multiple_devices(vmlambda: ModuleType, urlopen: Any) -> None:
+    fake = urlopen(devices_response(("10.0.1.10", "0070001"), ("10.0.1.11", "0070002"), ("10.0.2.10", "0070003")))
+    panorama = FakePanorama()
+    panorama._api_key = "key-1"
+
+    devices = vmlambda.stream_license_manager_devices(panorama, CMD)
+
+    assert devices == {"10.0.1.10": "0070001", "10.0.1.11": "0070002", "10.0.2.10": "0070003"}
+    (request,) = fake.requests
+    assert request["type"] == "op" and request["key"] == "key-1"
+
+
+def test_device_without_ip_is_skipped(vmlambda: ModuleType, urlopen: Any) -> None:
+    urlopen(
+        b'<response status="success"><result><devices>'
+        b"<entry><serial>0070001</serial></entry><entry><serial>0070002</serial><ip>10.0.1.11</ip></entry>"
+        b"</devices></result></response>"
+    )
+
+    assert vmlambda.stream_license_manager_devices(FakePanorama(), CMD) == {"10.0.1.11": "0070002"}
+
+
+def test_error_response(vmlambda: ModuleType, urlopen: Any) -> None:
+    urlopen(b'<response status="error"><msg><line>License manager lm not found</line></msg></response>')
+
+    with pytest.raises(RuntimeError, match="License manager lm not found"):
+        vmlambda.stream_license_manager_devices(FakePanorama(), CMD)
+
+
+def test_rejected_key_is_regenerated(vmlambda: ModuleType, urlopen: Any) -> None:
+    forbidden = urllib.error.HTTPError("https://192.0.2.10/api/", 403, "Forbidden", {}, None)
+    fake = urlopen(forbidden, devices_response(("10.0.1.10", "0070001")))
+    panorama = FakePanorama()
+    handler = vmlambda.get_handler()
+
+    devices = handler.retry_on_expired_key(
+        panorama, lambda: vmlambda.stream_license_manager_devices(panorama, CMD), "ShowDevices"
+    )
+
+    assert devices == {"10.0.1.10": "0070001"}
+    assert [request["key"] for request in fake.requests] == ["key-1", "key-2"]
+    # Rejected key does not count as unreachable Panorama
+    assert vmlambda.PANORAMA_BREAKER.state()["192.0.2.10:443"] == {"state": "closed", "failures": 0}
+
+
+def test_key_rejected_twice_is_auth_error(vmlambda: ModuleType, urlopen: Any) -> None:
+    forbidden = urllib.error.HTTPError("https://192.0.2.10/api/", 403, "Forbidden", {}, None)
+    urlopen(forbidden, forbidden)
+    panorama = FakePanorama()
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        vmlambda.get_handler().retry_on_expired_key(
+            panorama, lambda: vmlambda.stream_license_manager_devices(panorama, CMD), "ShowDevices"
+        )
+    assert vmlambda.is_panorama_auth_error(error.value)
+    assert panorama.keys == 2
@@ -0,0 +1,127 @@
+"""
+Deduplication of lifecycle events: duplicates handled by threads of one container (LifecycleIdempotency) and by
+other containers through the DynamoDB table (IdempotencyStore, against moto).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Callable, Iterator
+
+import pytest
+
+TABLE = "lifecycle-idempotency"
+KEY = "token-1:i-1:0"
+
+
+@pytest.fixture
+def dynamodb(vmlambda: ModuleType, environment: Any) -> Iterator[Any]:
+    """
+    Idempotency table of the Lambda in moto, as deployed by lambda.tf.
+    """
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        dynamodb = vmlambda.get_client("dynamodb")
+        dynamodb.create_table(
+            TableName=TABLE,
+            KeySchema=[{"AttributeName": "IdempotencyKey", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "IdempotencyKey", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        environment["idempotency_table"] = TABLE
+        yield dynamodb
+
+
+@pytest.fixture
+def idempotency(lambda_module: Callable[[str], ModuleType]) -> ModuleType:
+    return lambda_module("idempotency")
+
+
+def stored_item(dynamodb: Any) -> dict[str, Any]:
+    return dynamodb.get_item(TableName=TABLE, Key={"IdempotencyKey": {"S": KEY}}).get("Item", {})
+
+
+def test_concurrent_duplicates_wait_for_outcome(idempotency: ModuleType) -> None:
+    container = idempotency.LifecycleIdempotency()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def handle() -> str:
+        calls.append(threading.get_ident())
+        started.set()
+        assert release.wait(5)
+        return "CONTINUE"
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        first = pool.submit(container.run, KEY, handle)
+        assert started.wait(5)
+        duplicates = [pool.submit(container.run, KEY, handle) for _ in range(2)]
+        # Duplicates wait for the in-flight event instead of handling it
+        assert not any(duplicate.done() for duplicate in duplicates)
+        release.set()
+        assert first.result(5) == ("CONTINUE", False)
+        assert [duplicate.result(5) for duplicate in duplicates] == [("CONTINUE", True)] * 2
+
+    assert len(calls) == 1
+    # Later duplicate gets the outcome from the container cache
+    assert container.run(KEY, handle) == ("CONTINUE", True)
+    assert len(calls) == 1
+
+
+def test_duplicate_gives_up_without_waiting(idempotency: ModuleType) -> None:
+    container = idempotency.LifecycleIdempotency()
+
+    assert container.claim(KEY) is None
+    assert container.claim(KEY, wait=False) == "IN_PROGRESS"
+    container.finish(KEY, "CONTINUE")
+    assert container.claim(KEY, wait=False) == "CONTINUE"
+
+
+def test_abandon_releases_claim(idempotency: ModuleType, dynamodb: Any) -> None:
+    container = idempotency.LifecycleIdempotency()
+
+    assert container.run(KEY, lambda: "ABANDON") == ("ABANDON", False)
+    assert stored_item(dynamodb) == {}
+    # Retried delivery is handled again, by this container and by others
+    assert idempotency.LifecycleIdempotency().run(KEY, lambda: "CONTINUE") == ("CONTINUE", False)
+    assert container.run(KEY, lambda: "CONTINUE") == ("CONTINUE", True)
+
+
+def test_handler_error_releases_claim(idempotency: ModuleType, dynamodb: Any) -> None:
+    container = idempotency.LifecycleIdempotency()
+
+    def handle() -> str:
+        raise RuntimeError("handler failed")
+
+    with pytest.raises(RuntimeError):
+        container.run(KEY, handle)
+    assert stored_item(dynamodb) == {}
+
+
+def test_other_container_sees_in_progress_then_outcome(idempotency: ModuleType, dynamodb: Any) -> None:
+    container, other_container = idempotency.LifecycleIdempotency(), idempotency.LifecycleIdempotency()
+
+    assert container.claim(KEY) is None
+    assert stored_item(dynamodb)["Status"] == {"S": "IN_PROGRESS"}
+    assert other_container.claim(KEY, wait=False) == "IN_PROGRESS"
+
+    container.finish(KEY, "CONTINUE")
+    assert stored_item(dynamodb)["Outcome"] == {"S": "CONTINUE"}
+    assert other_container.claim(KEY, wait=False) == "CONTINUE"
+
+
+def test_store_claim_returns_recorded_outcome(idempotency: ModuleType, dynamodb: Any) -> None:
+    store = idempotency.IdempotencyStore(TABLE)
+
+    assert store.claim(KEY, lease=60) == ("CLAIMED", None)
+    # Conditional write fails, item returned with the failure tells whether the event is done
+    assert store.claim(KEY, lease=60) == ("IN_PROGRESS", None)
+    store.complete(KEY, "CONTINUE")
+    assert store.claim(KEY, lease=60) == ("COMPLETED", "CONTINUE")
+
+
+def test_store_claim_of_crashed_invocation_expires(idempotency: ModuleType, dynamodb: Any) -> None:
+    store = idempotency.IdempotencyStore(TABLE)
+
+    assert store.claim(KEY, lease=-5) == ("CLAIMED", None)
+    assert store.claim(KEY, lease=60) == ("CLAIMED", None)
+    assert store.claim(KEY, lease=60) == ("IN_PROGRESS", None)
@@ -0,0 +1,46 @@
+"""
+Benchmark and load test tools run as quick checks: small bursts against FakeAws and de-licensing against
+Panorama simulator, both failing when an event goes over its API call budget (tools/api_call_budgets.json).
+"""
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import benchmark_lifecycle
+import load_test_delicense
+from conftest import BUDGETS_FILE
+
+
+def run_tool(monkeypatch: Any, module: Any, *args: str) -> int:
+    monkeypatch.setattr(sys, "argv", [module.__file__, *args])
+    return module.main()
+
+
+@pytest.mark.parametrize("mode", [[], ["--batch", "--duplicates", "2"], ["--interfaces", "1", "--warm-pool", "1"]])
+def test_benchmark_within_budget(environment: Any, monkeypatch: Any, tmp_path: Path, mode: list[str]) -> None:
+    output = tmp_path / "benchmark.json"
+    args = ["--bursts", "1,5", "--latency-ms", "1", "--eni-visibility-ms", "20", "--eni-pending-ms", "50"]
+
+    assert run_tool(monkeypatch, benchmark_lifecycle, *args, *mode, "--budgets", str(BUDGETS_FILE), "--json", str(output)) == 0
+
+    for result in json.loads(output.read_text()):
+        assert result["budget_violations"] == {}
+        assert result["abandoned"] == 0
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="Panorama simulator requires openssl")
+@pytest.mark.parametrize("mode", [[], ["--ha"], ["--serials"]])
+def test_delicense_load_test_within_budget(environment: Any, monkeypatch: Any, tmp_path: Path, mode: list[str]) -> None:
+    output = tmp_path / "load_test.json"
+    args = ["--devices", "500", "--terminations", "20", "--batch-size", "5", "--latency-ms", "1", "--commit-ms", "10"]
+
+    assert run_tool(monkeypatch, load_test_delicense, *args, *mode, "--budgets", str(BUDGETS_FILE), "--json", str(output)) == 0
+
+    result = json.loads(output.read_text())
+    assert result["delicensed"] == result["terminations"] == 20
+    # One Panorama commit per batch
+    assert result["panorama_calls"]["panorama.Commit"] == result["batches"]
@@ -0,0 +1,34 @@
+"""
+Warm pool ENI claimed by launches of different Lambda containers: tags are no atomic claim, so the launch whose
+attachment succeeds keeps the ENI and the others attach a new ENI instead.
+"""
+from types import ModuleType
+from typing import Any
+
+from benchmark_lifecycle import FakeAws
+
+
+def tags(eni: dict[str, Any]) -> dict[str, str]:
+    return {tag["Key"]: tag["Value"] for tag in eni["TagSet"]}
+
+
+def test_lost_claim_keeps_attached_eni(vmlambda: ModuleType, fake_aws: FakeAws, environment: Any) -> None:
+    environment["eni_warm_pool_size"] = "1"
+    fake_aws.add_warm_pool(1, [1])
+    winner, loser = fake_aws.add_instance("us-east-1a"), fake_aws.add_instance("us-east-1a")
+    handler = vmlambda.get_handler()
+    (interface,) = handler.create_interface_settings("us-east-1a")
+
+    pooled = handler.claim_pooled_network_interface(winner, interface)
+    # Launch in another container reserves the same ENI (its describe did not see the claim yet)
+    fake_aws.CreateTags(Resources=[pooled], Tags=[{"Key": "InstanceId", "Value": loser}])
+
+    assert handler.attach_or_replace_network_interface(winner, interface, pooled) == pooled
+    replacement = handler.attach_or_replace_network_interface(loser, interface, pooled)
+
+    eni = fake_aws.enis[pooled]
+    assert eni["Attachment"]["InstanceId"] == winner
+    assert tags(eni)["InstanceId"] == winner
+    assert replacement != pooled
+    assert fake_aws.enis[replacement]["Attachment"]["InstanceId"] == loser
+    assert tags(fake_aws.enis[replacement])["InstanceId"] == loser
@@ -0,0 +1,592 @@
+"""
+Benchmark launch and terminate lifecycle handling against an offline EC2 / Auto Scaling stand-in.
+
+The Lambda module runs unmodified with real boto3 clients (retries, rate limiter and metrics hooks included),
+but requests are answered in-process by FakeAws instead of AWS endpoints. The stand-in keeps instances and ENIs
+in memory and simulates:
+- latency of every API call (--latency-ms, jittered by +-50%),
+- throttling when an operation exceeds --api-rate requests per second (token bucket per operation, like EC2),
+- eventual consistency: new ENI is not visible for --eni-visibility-ms and stays pending for --eni-pending-ms.
+
+For every burst size (--bursts, default 1,10,100) new instances are launched and then terminated. Events of a
+burst are handled concurrently by threads of one process, or as one SQS batch with --batch. With --duplicates N
+every event is delivered N times (at-least-once delivery), duplicates are handled concurrently with the original.
+De-licensing is not part of the benchmark (fw_delicense is not set). Reported per burst: wall time, latency percentiles of events
+and phases (from EMF metrics printed by the Lambda), API calls per event, throttled and retried requests.
+
+With --budgets events are checked against API call budgets (api_call_budgets of the Lambda, e.g.
+tools/api_call_budgets.json) and the benchmark fails when any event makes more calls than budgeted, so
+redundant API calls introduced by a change show up as a failure.
+
+Usage:
+    python3 tools/benchmark_lifecycle.py [--bursts 1,10,100] [--latency-ms 30] [--api-rate 100] [--json out.json]
+        [--budgets tools/api_call_budgets.json]
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Optional
+from xml.sax.saxutils import escape
+
+from botocore.awsrequest import AWSResponse
+
+ZONES = {"us-east-1a": "subnet-mgmt-a", "us-east-1b": "subnet-mgmt-b"}
+DATA_SUBNETS = {"us-east-1a": "subnet-data-a", "us-east-1b": "subnet-data-b"}
+SECURITY_GROUP = "sg-benchmark"
+EC2_XMLNS = "http://ec2.amazonaws.com/doc/2016-11-15/"
+
+
+class FakeAwsError(Exception):
+    def __init__(self, code: str, status: int = 400) -> None:
+        super().__init__(code)
+        self.code = code
+        self.status = status
+
+
+class RawBody:
+    """
+    Minimal urllib3-like body accepted by botocore.awsrequest.AWSResponse.
+    """
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, **kwargs: Any) -> Any:
+        yield self.body
+
+
+def serialize(shape: Any, value: Any, tag: str) -> str:
+    """
+    Serialize response value as XML element following botocore shape model (ec2 and query protocols).
+
+    :param shape: botocore shape of the value
+    :param value: value in boto3 output format, keys not in the shape are ignored
+    :param tag: element name
+    :return: XML string
+    """
+    if shape.type_name == "structure":
+        inner = "".join(
+            serialize(member, value[name], member.serialization.get("name", name))
+            for name, member in shape.members.items()
+            if name in value
+        )
+    elif shape.type_name == "list":
+        item_tag = shape.member.serialization.get("name", "member")
+        inner = "".join(serialize(shape.member, item, item_tag) for item in value)
+    elif shape.type_name == "boolean":
+        inner = "true" if value else "false"
+    else:
+        inner = escape(str(value))
+    return f"<{tag}>{inner}</{tag}>"
+
+
+class FakeAws:
+    """
+    In-memory EC2 and Auto Scaling answering requests of boto3 clients made by the Lambda.
+    """
+
+    def __init__(
+        self, latency_ms: float, api_rate: float, eni_visibility_ms: float, eni_pending_ms: float, seed: int
+    ) -> None:
+        self.latency = latency_ms / 1000
+        self.api_rate = api_rate
+        self.eni_visibility = eni_visibility_ms / 1000
+        self.eni_pending = eni_pending_ms / 1000
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.instances: dict[str, dict[str, Any]] = {}
+        self.enis: dict[str, dict[str, Any]] = {}
+        self.completed: dict[str, str] = {}
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self.attempts: dict[str, int] = {}
+        self.throttled: dict[str, int] = {}
+        self.pending_params = threading.local()
+        self.models: dict[str, Any] = {}
+
+    # Client plumbing
+
+    def install(self, aws_client: Any) -> None:
+        """
+        Answer all requests of boto3 client. Rate limiter and metrics hooks registered earlier still run.
+        """
+        service_id = aws_client.meta.service_model.service_id.hyphenize()
+        self.models[service_id] = aws_client.meta.service_model
+        aws_client.meta.events.register(f"before-parameter-build.{service_id}", self.remember_params)
+        aws_client.meta.events.register(f"before-send.{service_id}", self.respond)
+
+    def remember_params(self, params: dict[str, Any], model: Any, **kwargs: Any) -> None:
+        # Requests are sent in the thread building them, retries included
+        self.pending_params.value = (model.name, dict(params))
+
+    def respond(self, request: Any, event_name: str, **kwargs: Any) -> AWSResponse:
+        operation, params = self.pending_params.value
+        with self.lock:
+            self.attempts[operation] = self.attempts.get(operation, 0) + 1
+        time.sleep(self.latency * self.random.uniform(0.5, 1.5))
+
+        model = self.models[event_name.split(".")[1]].operation_model(operation)
+        protocol = model.service_model.protocol
+        try:
+            if not self.take_token(operation):
+                with self.lock:
+                    self.throttled[operation] = self.throttled.get(operation, 0) + 1
+                raise FakeAwsError("RequestLimitExceeded" if protocol == "ec2" else "Throttling", 503)
+            with self.lock:
+                result = getattr(self, operation)(**params)
+        except FakeAwsError as e:
+            if protocol == "ec2":
+                body = (
+                    f"<Response><Errors><Error><Code>{e.code}</Code><Message>{e.code}</Message></Error></Errors>"
+                    f"<RequestID>{uuid.uuid4()}</RequestID></Response>"
+                )
+            else:
+                body = (
+                    f"<ErrorResponse><Error><Type>Sender</Type><Code>{e.code}</Code><Message>{e.code}</Message>"
+                    f"</Error><RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>"
+                )
+            return AWSResponse(request.url, e.status, {}, RawBody(body.encode()))
+
+        output_shape = model.output_shape
+        inner = serialize(output_shape, result, "Result")[len("<Result>"):-len("</Result>")] if output_shape else ""
+        if protocol == "ec2":
+            body = f'<{operation}Response xmlns="{EC2_XMLNS}"><requestId>{uuid.uuid4()}</requestId>{inner}</{operation}Response>'
+        else:
+            result_wrapper = output_shape.serialization.get("resultWrapper", f"{operation}Result") if output_shape else f"{operation}Result"
+            body = (
+                f"<{operation}Response><{result_wrapper}>{inner}</{result_wrapper}>"
+                f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></{operation}Response>"
+            )
+        return AWSResponse(request.url, 200, {}, RawBody(body.encode()))
+
+    def take_token(self, operation: str) -> bool:
+        """
+        Account-level token bucket of operation: bursts up to api_rate requests, refilled at api_rate per second.
+        """
+        if self.api_rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(operation, (self.api_rate, now))
+            tokens = min(self.api_rate, tokens + (now - updated) * self.api_rate)
+            allowed = tokens >= 1
+            self.buckets[operation] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+    # State helpers
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}-{next(self.ids):017x}"
+
+    def add_eni(
+        self, subnet_id: str, tags: list[dict[str, str]], created: Optional[float] = None
+    ) -> dict[str, Any]:
+        eni_id = self.new_id("eni")
+        zone = next(zone for subnets in (ZONES, DATA_SUBNETS) for zone, subnet in subnets.items() if subnet == subnet_id)
+        number = next(self.ids)
+        eni = {
+            "NetworkInterfaceId": eni_id,
+            "SubnetId": subnet_id,
+            "AvailabilityZone": zone,
+            "PrivateIpAddress": f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}",
+            "Groups": [{"GroupId": SECURITY_GROUP, "GroupName": SECURITY_GROUP}],
+            "TagSet": list(tags),
+            "Status": "available",
+            "SourceDestCheck": True,
+            "_visible_at": 0.0,
+            "_available_at": 0.0,
+        }
+        if created is not None:
+            eni["Status"] = "pending"
+            eni["_visible_at"] = created + self.eni_visibility
+            eni["_available_at"] = created + self.eni_pending
+        self.enis[eni_id] = eni
+        return eni
+
+    def add_instance(self, zone: str) -> str:
+        with self.lock:
+            instance_id = self.new_id("i")
+            self.instances[instance_id] = {"zone": zone, "subnet": DATA_SUBNETS[zone]}
+            eni = self.add_eni(DATA_SUBNETS[zone], [])
+            self.attach(eni, instance_id, 0, delete_on_termination=True)
+            return instance_id
+
+    def add_warm_pool(self, count: int, device_indexes: list[int]) -> None:
+        with self.lock:
+            for subnet_id in ZONES.values():
+                for device_index in device_indexes:
+                    for _ in range(count):
+                        self.add_eni(
+                            subnet_id,
+                            [
+                                {"Key": "ManagedBy", "Value": "vmseries-lambda"},
+                                {"Key": "DeviceIndex", "Value": str(device_index)},
+                                {"Key": "WarmPool", "Value": "true"},
+                            ],
+                        )
+
+    def attach(self, eni: dict[str, Any], instance_id: str, device_index: int, delete_on_termination: bool) -> str:
+        attachment_id = self.new_id("eni-attach")
+        eni["Status"] = "in-use"
+        eni["Attachment"] = {
+            "AttachmentId": attachment_id,
+            "InstanceId": instance_id,
+            "DeviceIndex": device_index,
+            "Status": "attached",
+            "DeleteOnTermination": delete_on_termination,
+        }
+        return attachment_id
+
+    def visible_eni(self, eni_id: str) -> dict[str, Any]:
+        eni = self.enis.get(eni_id)
+        if eni is None or eni["_visible_at"] > time.monotonic():
+            raise FakeAwsError("InvalidNetworkInterfaceID.NotFound")
+        if eni["Status"] == "pending" and eni["_available_at"] <= time.monotonic():
+            eni["Status"] = "available"
+        return eni
+
+    @staticmethod
+    def filter_values(eni: dict[str, Any], name: str) -> list[str]:
+        attachment = eni.get("Attachment") or {}
+        if name.startswith("tag:"):
+            return [tag["Value"] for tag in eni["TagSet"] if tag["Key"] == name[4:]]
+        return {
+            "attachment.instance-id": [attachment.get("InstanceId")],
+            "attachment.device-index": [str(attachment.get("DeviceIndex"))] if attachment else [],
+            "subnet-id": [eni["SubnetId"]],
+            "group-id": [group["GroupId"] for group in eni["Groups"]],
+            "status": [eni["Status"]],
+            "network-interface-id": [eni["NetworkInterfaceId"]],
+        }.get(name, [])
+
+    # EC2 and Auto Scaling operations (called with lock held)
+
+    def DescribeInstances(self, InstanceIds: list[str], **kwargs: Any) -> dict[str, Any]:
+        reservations = []
+        for instance_id in InstanceIds:
+            instance = self.instances.get(instance_id)
+            if instance is None:
+                raise FakeAwsError("InvalidInstanceID.NotFound")
+            enis = sorted(
+                (eni for eni in self.enis.values() if (eni.get("Attachment") or {}).get("InstanceId") == instance_id),
+                key=lambda eni: eni["Attachment"]["DeviceIndex"],
+            )
+            reservations.append(
+                {
+                    "Instances": [
+                        {
+                            "InstanceId": instance_id,
+                            "Placement": {"AvailabilityZone": instance["zone"]},
+                            "SubnetId": instance["subnet"],
+                            "NetworkInterfaces": enis,
+                            "Tags": [],
+                        }
+                    ]
+                }
+            )
+        return {"Reservations": reservations}
+
+    def DescribeNetworkInterfaces(
+        self, NetworkInterfaceIds: Optional[list[str]] = None, Filters: Optional[list[dict[str, Any]]] = None, **kwargs: Any
+    ) -> dict[str, Any]:
+        if NetworkInterfaceIds:
+            return {"NetworkInterfaces": [self.visible_eni(eni_id) for eni_id in NetworkInterfaceIds]}
+        now = time.monotonic()
+        result = []
+        for eni in self.enis.values():
+            if eni["_visible_at"] > now:
+                continue
+            self.visible_eni(eni["NetworkInterfaceId"])
+            if all(
+                set(self.filter_values(eni, eni_filter["Name"])) & set(eni_filter["Values"])
+                for eni_filter in Filters or []
+            ):
+                result.append(eni)
+        return {"NetworkInterfaces": result}
+
+    def CreateNetworkInterface(
+        self, SubnetId: str, Groups: list[str], TagSpecifications: Optional[list[dict[str, Any]]] = None, **kwargs: Any
+    ) -> dict[str, Any]:
+        tags = [tag for spec in TagSpecifications or [] for tag in spec.get("Tags", [])]
+        eni = self.add_eni(SubnetId, tags, created=time.monotonic())
+        eni["Groups"] = [{"GroupId": group, "GroupName": group} for group in Groups]
+        return {"NetworkInterface": eni}
+
+    def AttachNetworkInterface(self, NetworkInterfaceId: str, InstanceId: str, DeviceIndex: int, **kwargs: Any) -> dict[str, Any]:
+        eni = self.visible_eni(NetworkInterfaceId)
+        if eni["Status"] != "available":
+            raise FakeAwsError("IncorrectState")
+        if any(
+            (other.get("Attachment") or {}).get("InstanceId") == InstanceId
+            and other["Attachment"]["DeviceIndex"] == DeviceIndex
+            for other in self.enis.values()
+        ):
+            raise FakeAwsError("InvalidParameterValue")
+        return {"AttachmentId": self.attach(eni, InstanceId, DeviceIndex, delete_on_termination=False)}
+
+    def ModifyNetworkInterfaceAttribute(
+        self, NetworkInterfaceId: str, Attachment: Optional[dict[str, Any]] = None,
+        SourceDestCheck: Optional[dict[str, Any]] = None, **kwargs: Any
+    ) -> dict[str, Any]:
+        eni = self.visible_eni(NetworkInterfaceId)
+        if Attachment is not None:
+            if (eni.get("Attachment") or {}).get("AttachmentId") != Attachment["AttachmentId"]:
+                raise FakeAwsError("InvalidAttachmentID.NotFound")
+            eni["Attachment"]["DeleteOnTermination"] = Attachment["DeleteOnTermination"]
+        if SourceDestCheck is not None:
+            eni["SourceDestCheck"] = SourceDestCheck["Value"]
+        return {}
+
+    def DeleteNetworkInterface(self, NetworkInterfaceId: str, **kwargs: Any) -> dict[str, Any]:
+        eni = self.visible_eni(NetworkInterfaceId)
+        if eni.get("Attachment"):
+            raise FakeAwsError("InvalidNetworkInterface.InUse")
+        del self.enis[NetworkInterfaceId]
+        return {}
+
+    def CreateTags(self, Resources: list[str], Tags: list[dict[str, str]], **kwargs: Any) -> dict[str, Any]:
+        for eni_id in Resources:
+            eni = self.visible_eni(eni_id)
+            keys = {tag["Key"] for tag in Tags}
+            eni["TagSet"] = [tag for tag in eni["TagSet"] if tag["Key"] not in keys] + list(Tags)
+        return {}
+
+    def DeleteTags(self, Resources: list[str], Tags: list[dict[str, str]], **kwargs: Any) -> dict[str, Any]:
+        for eni_id in Resources:
+            eni = self.visible_eni(eni_id)
+            keys = {tag["Key"] for tag in Tags}
+            eni["TagSet"] = [tag for tag in eni["TagSet"] if tag["Key"] not in keys]
+        return {}
+
+    def CompleteLifecycleAction(self, LifecycleActionToken: str, LifecycleActionResult: str, **kwargs: Any) -> dict[str, Any]:
+        self.completed[LifecycleActionToken] = LifecycleActionResult
+        return {}
+
+
+class EmfCollector:
+    """
+    stdout replacement collecting EMF lines printed by the Lambda (every line is written at once).
+    """
+
+    def __init__(self) -> None:
+        self.records: list[dict[str, Any]] = []
+        self.other = sys.stdout
+
+    def write(self, text: str) -> int:
+        for line in text.splitlines():
+            if line.startswith('{"_aws"'):
+                self.records.append(json.loads(line))
+            elif line:
+                self.other.write(line + "\n")
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def load_lambda(path: Path) -> ModuleType:
+    """
+    Load Lambda module from file, its sibling modules are imported from the same directory (as the Lambda runtime
+    has it on sys.path). Siblings loaded before are dropped, so every loaded module starts like a new container.
+
+    :param path: path to lambda.py
+    :return: Lambda module
+    """
+    directory = str(path.resolve().parent)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    for sibling in path.resolve().parent.glob("*.py"):
+        sys.modules.pop(sibling.stem, None)
+    spec = importlib.util.spec_from_file_location("vmseries_lambda", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def budget_violations(records: list[dict[str, Any]]) -> dict[str, int]:
+    """
+    Count events exceeding each API call budget, from ApiBudgetViolations of EMF records.
+    """
+    violations: dict[str, int] = {}
+    for record in records:
+        for pattern in record.get("ApiBudgetViolations", {}):
+            key = f"{record['LifecycleEvent']}:{pattern}"
+            violations[key] = violations.get(key, 0) + 1
+    return violations
+
+
+def lifecycle_event(detail_type: str, instance_id: str) -> dict[str, Any]:
+    return {
+        "detail-type": detail_type,
+        "detail": {
+            "EC2InstanceId": instance_id,
+            "AutoScalingGroupName": "benchmark-asg",
+            "LifecycleHookName": "benchmark-hook",
+            "LifecycleActionToken": str(uuid.uuid4()),
+        },
+    }
+
+
+def run_burst(
+    module: ModuleType, fake: FakeAws, detail_type: str, instance_ids: list[str], batch: bool, duplicates: int = 1
+) -> dict[str, Any]:
+    """
+    Handle lifecycle events of given instances concurrently and summarize EMF metrics and fake AWS counters.
+    """
+    events = [lifecycle_event(detail_type, instance_id) for instance_id in instance_ids]
+    deliveries = [event for event in events for _ in range(duplicates)]
+    attempts_before, throttled_before = dict(fake.attempts), dict(fake.throttled)
+    collector = EmfCollector()
+
+    started = time.monotonic()
+    with redirect_stdout(collector):
+        if batch:
+            records = [{"messageId": str(n), "body": json.dumps(event)} for n, event in enumerate(deliveries)]
+            module.lambda_handler({"Records": records}, None)
+        else:
+            def invoke(event: dict[str, Any]) -> None:
+                try:
+                    module.lambda_handler(event, None)
+                except Exception:
+                    pass  # abandoned events are counted from lifecycle results
+
+            with ThreadPoolExecutor(max_workers=len(deliveries)) as pool:
+                list(pool.map(invoke, deliveries))
+    wall = time.monotonic() - started
+
+    tokens = [event["detail"]["LifecycleActionToken"] for event in events]
+    emf = collector.records
+    latencies = [record["total_duration"] for record in emf]
+    phases: dict[str, list[float]] = {}
+    for record in emf:
+        for name, value in record.items():
+            if name.endswith("_duration") and name != "total_duration":
+                phases.setdefault(name[: -len("_duration")], []).append(value)
+    attempts = {op: count - attempts_before.get(op, 0) for op, count in fake.attempts.items()}
+    calls: dict[str, int] = {}
+    for record in emf:
+        for operation, count in record["ApiCallsByOperation"].items():
+            calls[operation] = calls.get(operation, 0) + count
+    return {
+        "events": len(events),
+        "deliveries": len(deliveries),
+        "duplicates_detected": sum(record.get("DuplicateEvents", 0) for record in emf),
+        "wall_seconds": round(wall, 3),
+        "latency_ms": {pct: round(percentile(latencies, pct), 1) for pct in (50, 90, 99, 100)},
+        "phases_ms": {
+            phase: {"p50": round(percentile(values, 50), 1), "p99": round(percentile(values, 99), 1)}
+            for phase, values in sorted(phases.items())
+        },
+        "api_calls_per_event": round(sum(record["ApiCalls"] for record in emf) / len(events), 2),
+        "api_retries": sum(record["ApiRetries"] for record in emf),
+        "api_calls_by_operation": dict(sorted(calls.items())),
+        "budget_violations": budget_violations(emf),
+        "attempts_per_operation": {op: count for op, count in sorted(attempts.items()) if count},
+        "throttled": sum(fake.throttled.values()) - sum(throttled_before.values()),
+        "abandoned": sum(fake.completed.get(token) != "CONTINUE" for token in tokens),
+    }
+
+
+def print_result(size: int, kind: str, result: dict[str, Any]) -> None:
+    latency = result["latency_ms"]
+    print(
+        f"burst={size:<4} {kind:<9} wall={result['wall_seconds']:.2f}s "
+        f"p50={latency[50]:.0f}ms p90={latency[90]:.0f}ms p99={latency[99]:.0f}ms max={latency[100]:.0f}ms "
+        f"api/event={result['api_calls_per_event']:.1f} retries={result['api_retries']} "
+        f"throttled={result['throttled']} abandoned={result['abandoned']}"
+        + (f" duplicates={result['duplicates_detected']}" if result["deliveries"] > result["events"] else "")
+    )
+    for phase, values in result["phases_ms"].items():
+        print(f"    {phase:<22} p50={values['p50']:>8.1f}ms p99={values['p99']:>8.1f}ms")
+    for budget, events in result["budget_violations"].items():
+        print(f"    over API call budget {budget} in {events} events")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", type=Path, default=Path(__file__).resolve().parent.parent / "scripts" / "lambda.py")
+    parser.add_argument("--bursts", default="1,10,100", help="comma separated numbers of concurrent events")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--api-rate", type=float, default=100.0, help="requests per second per operation, 0 disables")
+    parser.add_argument("--eni-visibility-ms", type=float, default=200.0)
+    parser.add_argument("--eni-pending-ms", type=float, default=500.0)
+    parser.add_argument("--interfaces", type=int, default=1, help="number of additional interfaces per firewall")
+    parser.add_argument("--warm-pool", type=int, default=0, help="pre-created ENIs per subnet and device index")
+    parser.add_argument("--batch", action="store_true", help="send each burst as one SQS batch")
+    parser.add_argument("--duplicates", type=int, default=1, help="deliveries of every lifecycle event")
+    parser.add_argument("--budgets", type=Path, help="JSON file with API call budgets per lifecycle event")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="write results to JSON file")
+    args = parser.parse_args()
+
+    device_indexes = list(range(1, args.interfaces + 1))
+    os.environ.update(
+        {
+            "AWS_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "interfaces_config": json.dumps(
+                ZONES
+                if args.interfaces == 1
+                else [{"index": index, "subnets": ZONES} for index in device_indexes]
+            ),
+            "sgr_id": SECURITY_GROUP,
+            "eni_warm_pool_size": str(args.warm_pool),
+            "batch_max_workers": os.getenv("batch_max_workers", "100"),
+            "boto_max_pool_connections": os.getenv("boto_max_pool_connections", "100"),
+            "metrics_namespace": "Benchmark",
+        }
+    )
+    os.environ.pop("fw_delicense", None)
+    if args.budgets:
+        os.environ["api_call_budgets"] = args.budgets.read_text()
+    logging.disable(logging.INFO)
+
+    module = load_lambda(args.module)
+    results = []
+    for size in [int(size) for size in args.bursts.split(",")]:
+        fake = FakeAws(args.latency_ms, args.api_rate, args.eni_visibility_ms, args.eni_pending_ms, args.seed)
+        module.reset_clients()
+        for service in ("ec2", "autoscaling"):
+            fake.install(module.get_client(service))
+        if args.warm_pool:
+            fake.add_warm_pool(args.warm_pool, device_indexes)
+
+        zones = list(ZONES)
+        instance_ids = [fake.add_instance(zones[n % len(zones)]) for n in range(size)]
+        for kind, detail_type in (
+            ("launch", "EC2 Instance-launch Lifecycle Action"),
+            ("terminate", "EC2 Instance-terminate Lifecycle Action"),
+        ):
+            result = run_burst(module, fake, detail_type, instance_ids, args.batch, args.duplicates)
+            print_result(size, kind, result)
+            results.append({"burst": size, "kind": kind, **result})
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 1 if any(result["budget_violations"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
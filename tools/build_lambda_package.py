@@ -0,0 +1,161 @@
+"""
+Build an optimized Lambda deployment package.
+
+Compared to zipping the pip-installed scripts/ directory, the package built here:
+- contains only the Lambda source and its runtime dependencies,
+- skips dependencies already provided by the Lambda Python runtime (boto3 and friends),
+- drops files not needed at runtime (tests, console scripts, stale bytecode),
+- ships bytecode precompiled with unchecked-hash invalidation, so a cold start does not
+  have to compile modules (Lambda's filesystem is read-only, so .pyc files cannot be cached there).
+
+Dependencies are installed as binary wheels built for the Lambda runtime (--python-version, --platform),
+not for the interpreter running the build. Bytecode is only used when compiled with the same Python version
+as the Lambda runtime, use --python to point at a matching interpreter; with a different one the package
+is shipped without bytecode.
+
+Usage:
+    python3 tools/build_lambda_package.py --source scripts --output build/lambda \
+        [--python-version 3.12 --platform manylinux2014_x86_64] [--python python3.12]
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+# Packages available in the AWS Lambda Python runtime, not shipped with the optimized package
+RUNTIME_PROVIDED = {"boto3", "botocore", "s3transfer", "jmespath", "urllib3", "python-dateutil", "six"}
+
+# Wheel platform of x86_64 Lambda functions (manylinux2014_aarch64 for arm64)
+DEFAULT_PLATFORM = "manylinux2014_x86_64"
+
+# Directories not needed at runtime
+PRUNED_DIRS = {"__pycache__", "tests", "test", "bin"}
+
+
+def read_requirements(requirements: Path, keep_runtime_provided: bool) -> list[str]:
+    """
+    Return requirement lines, without the ones provided by the Lambda runtime.
+
+    :param requirements: path to requirements.txt
+    :param keep_runtime_provided: do not drop boto3 and other runtime provided packages
+    :return: list of requirement specifiers
+    """
+    result = []
+    for line in requirements.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name = line.split(";")[0]
+        for separator in ("==", ">=", "<=", "~=", "!=", ">", "<", "["):
+            name = name.split(separator)[0]
+        if not keep_runtime_provided and name.strip().lower() in RUNTIME_PROVIDED:
+            print(f"Skipping runtime provided dependency: {line}")
+            continue
+        result.append(line)
+    return result
+
+
+def prune(output: Path) -> None:
+    """
+    Remove directories and files which are not used at runtime.
+
+    :param output: package directory
+    """
+    for path in sorted(output.rglob("*"), reverse=True):
+        if path.is_dir() and path.name in PRUNED_DIRS:
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.is_file() and path.suffix in (".pyc", ".pyo"):
+            path.unlink()
+
+
+def interpreter_version(python: str) -> Optional[str]:
+    """
+    Return "major.minor" version of given interpreter.
+
+    :param python: interpreter command or path
+    :return: version, None if the interpreter cannot be run
+    """
+    try:
+        result = subprocess.run(
+            [python, "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def build(
+    source: Path,
+    output: Path,
+    python: str,
+    keep_runtime_provided: bool,
+    python_version: Optional[str] = None,
+    platform: str = DEFAULT_PLATFORM,
+) -> None:
+    """
+    Build package directory ready to be zipped as Lambda payload.
+
+    :param source: directory with lambda.py, its sibling modules and requirements.txt (other content is ignored)
+    :param output: package directory, recreated on every build
+    :param python: interpreter used for bytecode compilation, should match Lambda runtime
+    :param keep_runtime_provided: ship boto3 and other runtime provided packages
+    :param python_version: Python version of Lambda runtime (e.g. "3.12"), None builds for the running interpreter
+    :param platform: wheel platform tag of Lambda architecture, used with python_version
+    """
+    if output.exists():
+        shutil.rmtree(output)
+    output.mkdir(parents=True)
+
+    # lambda.py and its sibling modules
+    for module in source.glob("*.py"):
+        shutil.copy2(module, output / module.name)
+
+    requirements = read_requirements(source / "requirements.txt", keep_runtime_provided)
+    if requirements:
+        target_options = []
+        if python_version:
+            # Wheels matching Lambda runtime, source distributions would be built for the local interpreter
+            target_options = [
+                "--platform", platform,
+                "--implementation", "cp",
+                "--python-version", python_version,
+                "--only-binary=:all:",
+            ]
+        subprocess.run(
+            [
+                sys.executable, "-m", "pip", "install", "--quiet", "--no-compile", *target_options,
+                "--target", str(output), *requirements,
+            ],
+            check=True,
+        )
+
+    prune(output)
+    if python_version and interpreter_version(python) != python_version:
+        # Lambda ignores bytecode of other Python versions, the package is shipped as source only
+        print(f"Skipping bytecode: {python} is not Python {python_version}, pass matching interpreter with --python")
+        return
+    subprocess.run(
+        [python, "-m", "compileall", "-q", "-j", "0", "--invalidation-mode", "unchecked-hash", str(output)],
+        check=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, default=Path(__file__).resolve().parent.parent / "scripts")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--python", default=sys.executable, help="Interpreter used to precompile bytecode")
+    parser.add_argument("--python-version", help="Python version of Lambda runtime, e.g. 3.12")
+    parser.add_argument("--platform", default=DEFAULT_PLATFORM, help="Wheel platform of Lambda architecture")
+    parser.add_argument("--keep-runtime-provided", action="store_true", help="Ship boto3 with the package")
+    args = parser.parse_args()
+    build(args.source, args.output, args.python, args.keep_runtime_provided, args.python_version, args.platform)
+
+
+if __name__ == "__main__":
+    main()
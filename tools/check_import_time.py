@@ -0,0 +1,75 @@
+"""
+Measure cold-start import cost of the Lambda module on the launch path.
+
+The module is imported in a fresh interpreter, as it is on a Lambda cold start. The check fails when:
+- modules needed only on the terminate path (panos, pan) are imported at module load,
+- median import time is above --max-ms.
+
+Usage:
+    python3 tools/check_import_time.py [--module scripts/lambda.py] [--runs 5] [--max-ms 1000]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules which must not be loaded by importing the Lambda module.
+# xml.etree is not listed, because botocore itself imports it for response parsing.
+LAZY_MODULES = ["panos", "pan"]
+
+PROBE = """
+import importlib.util, json, os, sys, time
+# Lambda runtime has the package root (directory of lambda.py) on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[1])))
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("vmseries_lambda", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"elapsed_ms": elapsed_ms, "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+
+def measure(module: Path) -> dict:
+    """
+    Import Lambda module in a new interpreter and return its import time and eagerly loaded lazy modules.
+
+    :param module: path to lambda.py
+    :return: dict with elapsed_ms and loaded keys
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, str(module), json.dumps(LAZY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"AWS_REGION": "us-east-1", "PATH": ""},
+    )
+    return json.loads(result.stdout)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", type=Path, default=Path(__file__).resolve().parent.parent / "scripts" / "lambda.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    samples = [measure(args.module) for _ in range(args.runs)]
+    median_ms = statistics.median(sample["elapsed_ms"] for sample in samples)
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+    print(f"Import time of {args.module.name}: median={median_ms:.1f}ms over {args.runs} runs (limit {args.max_ms:.0f}ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: terminate-only modules imported at module load: {', '.join(loaded)}")
+        failed = True
+    if median_ms > args.max_ms:
+        print("FAIL: import time above limit")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
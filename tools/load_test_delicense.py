@@ -0,0 +1,154 @@
+"""
+Load test of the de-licensing path against local Panorama simulator(s) (tools/panorama_simulator.py).
+
+Lambda module runs unmodified: terminate batches call delicense_fw_with_config() with Panorama config pointing
+at the simulators, so HA probing, API key generation, device list download, deactivation and commit go over
+HTTPS to the simulators exactly as they go to Panorama. EC2 and Secrets Manager are not involved.
+
+--terminations firewalls are de-licensed in batches of --batch-size by --concurrency parallel workers
+(like concurrent Lambda invocations, sharing one container's caches). With --ha a passive panorama2 is started
+too; --primary-down makes panorama1 hang on every request (unreachable peer). With --serials serial numbers are
+passed like recorded in instance tags, so the device list is not fetched. Reported: terminate throughput,
+batch latency percentiles, per-phase Panorama time (from EMF metrics printed by the Lambda) and requests served
+by simulators. With --budgets batches are checked against Panorama call budgets (terminate_batch entry of
+e.g. tools/api_call_budgets.json) and the load test fails when a batch exceeds them.
+
+Usage:
+    python3 tools/load_test_delicense.py [--devices 20000] [--terminations 200] [--batch-size 10]
+        [--concurrency 4] [--latency-ms 20] [--commit-ms 500] [--ha [--primary-down]] [--serials]
+        [--fail commit=0.05] [--budgets tools/api_call_budgets.json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any
+
+from benchmark_lifecycle import EmfCollector, budget_violations, load_lambda, percentile
+from panorama_simulator import PanoramaSimulator, parse_probabilities
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", type=Path, default=Path(__file__).resolve().parent.parent / "scripts" / "lambda.py")
+    parser.add_argument("--devices", type=int, default=20000)
+    parser.add_argument("--terminations", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--commit-ms", type=float, default=500.0)
+    parser.add_argument("--key-ttl", type=float, default=0.0)
+    parser.add_argument("--ha", action="store_true", help="start passive panorama2 as well")
+    parser.add_argument("--primary-down", action="store_true", help="panorama1 does not respond (requires --ha)")
+    parser.add_argument("--serials", action="store_true", help="serials known from instance tags")
+    parser.add_argument("--fail", action="append", default=[], metavar="KIND=PROBABILITY")
+    parser.add_argument("--budgets", type=Path, help="JSON file with API call budgets per lifecycle event")
+    parser.add_argument("--json", type=Path, help="write results to JSON file")
+    args = parser.parse_args()
+
+    os.environ.update(
+        {"AWS_REGION": "us-east-1", "AWS_ACCESS_KEY_ID": "load-test", "AWS_SECRET_ACCESS_KEY": "load-test",
+         "metrics_namespace": "LoadTest"}
+    )
+    if args.budgets:
+        os.environ["api_call_budgets"] = args.budgets.read_text()
+    logging.disable(logging.INFO)
+
+    simulator_args = {
+        "devices": args.devices,
+        "latency_ms": args.latency_ms,
+        "commit_ms": args.commit_ms,
+        "key_ttl": args.key_ttl,
+        "failures": parse_probabilities(args.fail),
+    }
+    primary = PanoramaSimulator(
+        ha_state="active" if not args.primary_down else "passive",
+        hangs={kind: 1.0 for kind in ("keygen", "ha", "devices", "deactivate", "commit")} if args.primary_down else None,
+        **simulator_args,
+    )
+    simulators = {"panorama1": primary}
+    if args.ha:
+        simulators["panorama2"] = PanoramaSimulator(
+            ha_state="active" if args.primary_down else "passive", **simulator_args
+        )
+    config: dict[str, Any] = {"username": "admin", "password": "admin", "license_manager": "license-manager"}
+    for name, simulator in simulators.items():
+        config[name] = f"127.0.0.1:{simulator.start()}"
+
+    # The same firewalls are registered in every Panorama of HA pair
+    ip_addresses = primary.device_ips()[: args.terminations]
+    serials = {ip_address: serial for serial, ip_address in primary.devices.items()} if args.serials else None
+    batches = [ip_addresses[start:start + args.batch_size] for start in range(0, len(ip_addresses), args.batch_size)]
+
+    module = load_lambda(args.module)
+    handler = module.get_handler()
+
+    def delicense(batch: list[str]) -> int:
+        with module.event_metrics("terminate_batch") as metrics:
+            metrics.count("BatchSize", len(batch))
+            result = handler.delicense_fw_with_config(
+                batch, config, serials={ip_address: serials[ip_address] for ip_address in batch} if serials else None
+            )
+            metrics.outcome = "CONTINUE" if all(result.values()) else "ABANDON"
+        return sum(result.values())
+
+    collector = EmfCollector()
+    started = time.monotonic()
+    with redirect_stdout(collector), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        delicensed = sum(pool.map(delicense, batches))
+    wall = time.monotonic() - started
+    for simulator in simulators.values():
+        simulator.stop()
+
+    latencies = [record["total_duration"] for record in collector.records]
+    calls: dict[str, int] = {}
+    for record in collector.records:
+        for operation, count in record["ApiCallsByOperation"].items():
+            calls[operation] = calls.get(operation, 0) + count
+    phases: dict[str, list[float]] = {}
+    for record in collector.records:
+        for name, value in record.items():
+            if name.startswith("panorama_") and name.endswith("_duration"):
+                phases.setdefault(name[: -len("_duration")], []).append(value)
+    result = {
+        "terminations": len(ip_addresses),
+        "delicensed": delicensed,
+        "batches": len(batches),
+        "wall_seconds": round(wall, 3),
+        "terminations_per_second": round(len(ip_addresses) / wall, 2),
+        "batch_latency_ms": {pct: round(percentile(latencies, pct), 1) for pct in (50, 90, 99, 100)},
+        "phases_ms": {
+            phase: {"p50": round(percentile(values, 50), 1), "p99": round(percentile(values, 99), 1)}
+            for phase, values in sorted(phases.items())
+        },
+        "simulator_requests": {name: dict(sorted(simulator.requests.items())) for name, simulator in simulators.items()},
+        "panorama_calls": dict(sorted(calls.items())),
+        "budget_violations": budget_violations(collector.records),
+    }
+
+    latency = result["batch_latency_ms"]
+    print(
+        f"de-licensed {delicensed}/{len(ip_addresses)} firewalls of {args.devices} in {len(batches)} batches "
+        f"(size {args.batch_size}, concurrency {args.concurrency}) in {wall:.2f}s: "
+        f"{result['terminations_per_second']:.1f} terminations/s"
+    )
+    print(f"batch latency p50={latency[50]:.0f}ms p90={latency[90]:.0f}ms p99={latency[99]:.0f}ms max={latency[100]:.0f}ms")
+    for phase, values in result["phases_ms"].items():
+        print(f"    {phase:<22} p50={values['p50']:>8.1f}ms p99={values['p99']:>8.1f}ms")
+    for name, requests in result["simulator_requests"].items():
+        print(f"    {name} requests: {requests}")
+    for budget, batches_over in result["budget_violations"].items():
+        print(f"    over API call budget {budget} in {batches_over} batches")
+
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+    return 0 if delicensed == len(ip_addresses) and not result["budget_violations"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Local stand-in for the PAN-OS XML API of Panorama with sw_fw_license plugin, used to exercise and load test
+the de-licensing path without a real Panorama.
+
+Supported requests (HTTPS, GET or POST to /api/):
+- type=keygen - API key for configured username and password (403 Invalid Credential otherwise),
+- type=op <show><high-availability><state/> - HA state of this Panorama (--ha-state),
+- type=op <show><plugins><sw_fw_license><devices> - device list of license manager, streamed in chunks,
+  so tens of thousands of devices (--devices) can be served,
+- type=op <request><plugins><sw_fw_license><deactivate> - removes device from license manager,
+- type=commit - enqueues commit job, commits are serialized and take --commit-ms.
+
+Every request can be delayed (--latency-ms) and made to fail (--fail kind=probability, error response) or hang
+without responding (--hang kind=probability, like an unreachable peer). Kinds: keygen, ha, devices, deactivate,
+commit. API keys expire after --key-ttl seconds (403 Invalid key), so key regeneration can be exercised too.
+
+Certificate is self-signed and generated with openssl unless --cert and --key are given.
+
+Usage:
+    python3 tools/panorama_simulator.py [--port 8443] [--devices 20000] [--ha-state active] [--fail commit=0.1]
+"""
+import argparse
+import random
+import secrets
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator, Optional
+from xml.etree import ElementTree as et
+
+REQUEST_KINDS = ("keygen", "ha", "devices", "deactivate", "commit")
+
+# Devices are streamed in chunks of this many entries
+DEVICE_CHUNK = 500
+
+
+def device_ip(number: int) -> str:
+    """
+    Management IP of n-th simulated device.
+    """
+    return f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256 + 1}"
+
+
+def generate_certificate(directory: Path) -> tuple[Path, Path]:
+    """
+    Create self-signed certificate and key (like default Panorama management certificate).
+
+    :param directory: directory to write cert.pem and key.pem to
+    :return: paths of certificate and key
+    """
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=panorama-simulator", "-keyout", str(key), "-out", str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def parse_probabilities(values: list[str]) -> dict[str, float]:
+    """
+    Parse ["commit=0.1", "ha=1"] into {"commit": 0.1, "ha": 1.0}.
+    """
+    result = {}
+    for value in values:
+        kind, _, probability = value.partition("=")
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind '{kind}', use one of {', '.join(REQUEST_KINDS)}")
+        result[kind] = float(probability or 1)
+    return result
+
+
+class PanoramaSimulator:
+    """
+    State and behaviour of one simulated Panorama.
+    """
+
+    def __init__(
+        self,
+        devices: int = 1000,
+        license_manager: str = "license-manager",
+        username: str = "admin",
+        password: str = "admin",
+        ha_state: str = "active",
+        latency_ms: float = 0.0,
+        commit_ms: float = 0.0,
+        key_ttl: float = 0.0,
+        failures: Optional[dict[str, float]] = None,
+        hangs: Optional[dict[str, float]] = None,
+        seed: int = 1,
+    ) -> None:
+        self.license_manager = license_manager
+        self.username = username
+        self.password = password
+        self.ha_state = ha_state
+        self.latency = latency_ms / 1000
+        self.commit_duration = commit_ms / 1000
+        self.key_ttl = key_ttl
+        self.failures = failures or {}
+        self.hangs = hangs or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.stopped = threading.Event()
+        # serial -> management IP, insertion ordered like Panorama output
+        self.devices = {f"0070010{number:08d}": device_ip(number) for number in range(devices)}
+        self.keys: dict[str, float] = {}
+        self.jobs = 0
+        self.requests: dict[str, int] = {}
+        self.request_seconds: dict[str, float] = {}
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def device_ips(self) -> list[str]:
+        with self.lock:
+            return list(self.devices.values())
+
+    # HTTP server
+
+    def start(self, port: int = 0, host: str = "127.0.0.1", cert: Optional[Path] = None, key: Optional[Path] = None) -> int:
+        """
+        Start HTTPS server in background thread.
+
+        :param port: TCP port, 0 picks a free one
+        :param host: address to listen on
+        :param cert: certificate file, generated when not given
+        :param key: private key file
+        :return: port the server listens on
+        """
+        if cert is None or key is None:
+            cert, key = generate_certificate(Path(tempfile.mkdtemp(prefix="panorama-simulator-")))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                simulator.serve(self, urllib.parse.urlsplit(self.path).query)
+
+            def do_POST(self) -> None:
+                simulator.serve(self, self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def serve(self, http: BaseHTTPRequestHandler, query: str) -> None:
+        started = time.monotonic()
+        params = {name: values[0] for name, values in urllib.parse.parse_qs(query).items()}
+        kind, status, body = self.handle(params)
+        if status == 0:
+            # Hang like an unreachable peer, client gives up on its timeout
+            self.stopped.wait()
+            return
+        try:
+            http.send_response(status)
+            http.send_header("Content-Type", "application/xml")
+            http.end_headers()
+            for chunk in body:
+                http.wfile.write(chunk.encode())
+        except (BrokenPipeError, ConnectionResetError, ssl.SSLError):
+            pass
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.request_seconds[kind] = self.request_seconds.get(kind, 0.0) + time.monotonic() - started
+
+    # PAN-OS XML API
+
+    def handle(self, params: dict[str, str]) -> tuple[str, int, Iterator[str]]:
+        """
+        Handle API request.
+
+        :param params: request parameters
+        :return: request kind, HTTP status (0 to hang) and response body chunks
+        """
+        request_type = params.get("type")
+        if request_type == "keygen":
+            kind = "keygen"
+        elif request_type == "commit":
+            kind = "commit"
+        elif request_type == "op":
+            kind = self.op_kind(params.get("cmd", ""))
+        else:
+            return "unknown", 400, iter([error("Unsupported request type")])
+
+        if self.latency:
+            time.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.random.random() < self.hangs.get(kind, 0.0):
+            return kind, 0, iter([])
+        if self.random.random() < self.failures.get(kind, 0.0):
+            return kind, 200, iter([error(f"Simulated {kind} failure")])
+
+        if kind == "keygen":
+            if params.get("user") != self.username or params.get("password") != self.password:
+                return kind, 403, iter([error("Invalid Credential", code="403")])
+            api_key = secrets.token_urlsafe(24)
+            with self.lock:
+                self.keys[api_key] = time.monotonic() + self.key_ttl if self.key_ttl else float("inf")
+            return kind, 200, iter([success(f"<key>{api_key}</key>")])
+
+        with self.lock:
+            expires = self.keys.get(params.get("key", ""))
+        if expires is None or expires < time.monotonic():
+            return kind, 403, iter([error("Invalid key", code="403")])
+
+        if kind == "ha":
+            return kind, 200, iter([success(
+                f"<enabled>yes</enabled><group><mode>Active-Passive</mode></group>"
+                f"<local-info><state>{self.ha_state}</state></local-info>"
+            )])
+        if kind == "devices":
+            return kind, 200, self.device_list(params["cmd"])
+        if kind == "deactivate":
+            return kind, 200, iter([self.deactivate(params["cmd"])])
+        if kind == "commit":
+            return kind, 200, iter([self.commit()])
+        return kind, 200, iter([error("Unknown command")])
+
+    @staticmethod
+    def op_kind(cmd: str) -> str:
+        if "<high-availability>" in cmd:
+            return "ha"
+        if "<deactivate>" in cmd:
+            return "deactivate"
+        if "<sw_fw_license>" in cmd and "<devices>" in cmd:
+            return "devices"
+        return "unknown"
+
+    def device_list(self, cmd: str) -> Iterator[str]:
+        license_manager = et.fromstring(cmd).findtext(".//license-manager")
+        if license_manager != self.license_manager:
+            yield error(f"License manager {license_manager} not found")
+            return
+        with self.lock:
+            devices = list(self.devices.items())
+        yield '<response status="success"><result><devices>'
+        for start in range(0, len(devices), DEVICE_CHUNK):
+            yield "".join(
+                f'<entry name="{serial}"><serial>{serial}</serial><ip>{ip}</ip>'
+                f"<hostname>vmseries-{serial[-6:]}</hostname><licensed>yes</licensed></entry>"
+                for serial, ip in devices[start:start + DEVICE_CHUNK]
+            )
+        yield "</devices></result></response>"
+
+    def deactivate(self, cmd: str) -> str:
+        serial = et.fromstring(cmd).findtext(".//member")
+        with self.lock:
+            if self.devices.pop(serial or "", None) is None:
+                return error(f"Device {serial} not found in license manager")
+        return success(f"<msg>Successfully deactivated {serial}</msg>")
+
+    def commit(self) -> str:
+        # Panorama runs one commit at a time
+        with self.commit_lock:
+            time.sleep(self.commit_duration)
+            with self.lock:
+                self.jobs += 1
+                job = self.jobs
+        return success(f"<msg><line>Commit job enqueued with jobid {job}</line></msg><job>{job}</job>", code="19")
+
+
+def success(result: str, code: Optional[str] = None) -> str:
+    code_attribute = f' code="{code}"' if code else ""
+    return f'<response status="success"{code_attribute}><result>{result}</result></response>'
+
+
+def error(message: str, code: Optional[str] = None) -> str:
+    code_attribute = f' code="{code}"' if code else ""
+    return f'<response status="error"{code_attribute}><msg><line>{message}</line></msg></response>'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--license-manager", default="license-manager")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--ha-state", default="active", choices=["active", "passive", "suspended"])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--commit-ms", type=float, default=0.0)
+    parser.add_argument("--key-ttl", type=float, default=0.0, help="seconds, 0 means keys never expire")
+    parser.add_argument("--fail", action="append", default=[], metavar="KIND=PROBABILITY")
+    parser.add_argument("--hang", action="append", default=[], metavar="KIND=PROBABILITY")
+    parser.add_argument("--cert", type=Path)
+    parser.add_argument("--key", type=Path)
+    args = parser.parse_args()
+
+    simulator = PanoramaSimulator(
+        devices=args.devices,
+        license_manager=args.license_manager,
+        username=args.username,
+        password=args.password,
+        ha_state=args.ha_state,
+        latency_ms=args.latency_ms,
+        commit_ms=args.commit_ms,
+        key_ttl=args.key_ttl,
+        failures=parse_probabilities(args.fail),
+        hangs=parse_probabilities(args.hang),
+    )
+    port = simulator.start(args.port, args.host, args.cert, args.key)
+    print(f"Panorama simulator listening on https://{args.host}:{port}/api/ with {args.devices} devices", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        simulator.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -248,6 +248,179 @@ variable "lambda_execute_pip_install_once" {
   default     = false
 }
 
+variable "additional_interfaces" {
+  description = <<EOF
+  Additional network interfaces created by Lambda for each VM-Series, besides management interface (device index 1).
+  Interfaces are created concurrently and attached in device index order. Example:
+  ```
+  [
+    { index = 2, subnets = { "us-east-1a" = "subnet-aaa", "us-east-1b" = "subnet-bbb" }, sg = "sg-0123456789abcdef0" },
+    { index = 3, subnets = { "us-east-1a" = "subnet-ccc", "us-east-1b" = "subnet-ddd" } }
+  ]
+  ```
+  When sg is not provided, management security group is used.
+  EOF
+  type        = any
+  default     = []
+}
+
+variable "eni_warm_pool_size" {
+  description = <<EOF
+  Number of pre-created, available ENIs kept for each interface in each availability zone.
+  Launch hook attaches ENI from the pool instead of creating a new one and waiting until it is available.
+  Pool is replenished by scheduled Lambda invocation (see eni_warm_pool_schedule). 0 disables warm pool.
+  EOF
+  type        = number
+  default     = 0
+}
+
+variable "eni_warm_pool_schedule" {
+  description = "Schedule expression of warm pool replenishment, used when eni_warm_pool_size is greater than 0"
+  type        = string
+  default     = "rate(5 minutes)"
+}
+
+variable "reconcile_enabled" {
+  description = <<EOF
+  Periodically delete orphaned ENIs (managed by Lambda, not attached, instance gone) and de-license devices
+  in license manager whose management IP from management subnets is not used anymore (with delicense_enabled).
+  Repairs state left behind by crashed invocations or lost lifecycle events.
+  EOF
+  type        = bool
+  default     = false
+}
+
+variable "reconcile_schedule" {
+  description = "Schedule expression of reconciliation, used when reconcile_enabled is true"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+variable "metrics_namespace" {
+  description = <<EOF
+  CloudWatch namespace of Lambda metrics (per-phase durations, API call counts, retries, throttles and lifecycle
+  action outcome) published through Embedded Metric Format log lines. Empty string disables metrics.
+  EOF
+  type        = string
+  default     = "VMSeries/Lifecycle"
+}
+
+variable "api_rate_limits" {
+  description = <<EOF
+  Client-side rate limits (requests per second) of EC2 and Auto Scaling API calls made by the Lambda function,
+  keyed by "service.Operation" pattern, most specific pattern wins. Limiter state is kept per Lambda container,
+  so every container gets the rate divided by the reserved concurrency (100). Rates are halved when AWS throttles
+  requests and recover gradually. Empty map uses defaults: {"ec2.Describe*" = 20, "ec2.*" = 10, "autoscaling.*" = 5}
+  EOF
+  type        = map(number)
+  default     = {}
+}
+
+variable "api_call_budgets" {
+  description = <<EOF
+  Maximum number of AWS and Panorama API calls per lifecycle event type ("launch", "terminate", "terminate_batch"),
+  keyed by "service.Operation" pattern (e.g. "ec2.ModifyNetworkInterfaceAttribute", "panorama.*", "*").
+  Events exceeding a budget list the violations in their metrics log line and count ApiBudgetExceeded metric.
+  EOF
+  type        = map(map(number))
+  default     = {}
+}
+
+variable "asg_profiles" {
+  description = <<EOF
+  Additional firewall Auto Scaling groups served by the same Lambda, keyed by group name (or "region/name").
+  Each profile can set region (defaults to this one), interfaces_config, sgr_id, panorama_config (secret ARN),
+  fw_delicense, mgmt_subnet_cidrs and eni_warm_pool_size. Network settings (interfaces_config, sgr_id,
+  mgmt_subnet_cidrs) are never inherited, other missing settings are taken from this deployment.
+  Lifecycle events of the groups are matched by EventBridge rules of this deployment, events of groups in other
+  regions have to be forwarded to the default event bus of this region.
+  EOF
+  type        = any
+  default     = {}
+}
+
+variable "lifecycle_events_batching" {
+  description = <<EOF
+  Buffer launch and terminate lifecycle events in SQS queue and handle them by Lambda in batches.
+  Events from a batch are processed concurrently by one Lambda invocation (see lifecycle_events_batch_workers),
+  which reduces number of cold starts during large scale-out. All firewalls terminated in a batch are
+  de-licensed using one device list query and a single Panorama commit. Events whose lifecycle action could not
+  be completed are retried up to 5 times and then moved to a dead-letter queue.
+  EOF
+  type        = bool
+  default     = false
+}
+
+variable "lifecycle_idempotency_table" {
+  description = <<EOF
+  Record outcomes of handled lifecycle events in DynamoDB table shared by all Lambda containers, so events
+  delivered more than once (EventBridge, retried invocations, SQS) are handled once. Without the table
+  duplicates are detected only within one Lambda container.
+  EOF
+  type        = bool
+  default     = false
+}
+
+variable "lifecycle_events_batch_size" {
+  description = "Maximum number of lifecycle events delivered to Lambda in one batch when lifecycle_events_batching is enabled"
+  type        = number
+  default     = 20
+}
+
+variable "lifecycle_events_batch_workers" {
+  description = "Number of lifecycle events from one batch processed concurrently by Lambda"
+  type        = number
+  default     = 10
+}
+
+variable "lifecycle_events_batching_window" {
+  description = "Maximum time in seconds to gather lifecycle events into one batch when lifecycle_events_batching is enabled"
+  type        = number
+  default     = 10
+}
+
+variable "delicense_retry_queue" {
+  description = <<EOF
+  Create SQS queue for de-licensing deferred while Panorama is unreachable. When circuit breaker of Panorama
+  calls is open (after repeated connection failures or timeouts), terminate lifecycle actions are completed
+  without waiting for Panorama and de-licensing requests are queued, Lambda retries them in batches (single
+  Panorama commit per batch) once Panorama is reachable again. Without the queue such licenses are released
+  only by reconciliation (reconcile_enabled).
+  EOF
+  type        = bool
+  default     = false
+}
+
+variable "delicense_retry_interval" {
+  description = "Seconds between retries of deferred de-licensing while Panorama is unreachable (visibility timeout of the queue)"
+  type        = number
+  default     = 300
+
+  validation {
+    # Shorter visibility timeout would deliver the batch again while the Lambda still handles it
+    condition     = var.delicense_retry_interval >= 30
+    error_message = "The delicense_retry_interval must be at least the Lambda timeout (30 seconds)."
+  }
+}
+
+variable "delicense_retry_max_attempts" {
+  description = "Number of retries of deferred de-licensing before the request is moved to dead-letter queue"
+  type        = number
+  default     = 288
+}
+
+variable "lambda_optimized_package" {
+  description = <<EOF
+  Build Lambda payload using tools/build_lambda_package.py instead of zipping the whole scripts directory.
+  Optimized package skips dependencies provided by Lambda runtime (boto3) and ships precompiled bytecode,
+  which reduces payload size and cold start time. Requires python3 with pip on the machine running Terraform,
+  dependencies are installed as wheels built for Lambda runtime. Bytecode is precompiled only if interpreter
+  of Lambda runtime version (python3.12, see .python-version) is installed, otherwise the package ships source only.
+  EOF
+  type        = bool
+  default     = false
+}
+
 variable "panorama_config" {
   description = <<-EOF
   Panorama configuration for the lambda automation
@@ -255,6 +428,7 @@ variable "panorama_config" {
   ```
   {"username":"ACCOUNT","password":"PASSWORD","panorama1":"IP_ADDRESS1","panorama2":"IP_ADDRESS2","license_manager":"LICENSE_MANAGER_NAME"}"
   ```
+  Panorama address can include API port if it is not 443, e.g. "IP_ADDRESS1:8443".
   EOF
   type        = map(string)
   default     = null